@@ -1,7 +1,8 @@
 """
 ASGI config for NAIRA project.
 
-It exposes the ASGI callable as a module-level variable named ``application``.
+It exposes the ASGI callable as a module-level variable named ``application``:
+the async API (apps/api/app.py) under /api/, Django for every other path.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +14,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'NAIRA.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up, since the API uses the ORM
+from apps.api.app import create_app  # noqa: E402
+
+application = create_app(django_application)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.core.permissions.PermissionCacheMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -75,12 +77,82 @@ WSGI_APPLICATION = 'NAIRA.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# PostgreSQL (the pgvector service of docker-compose) when POSTGRES_HOST is set,
+# SQLite otherwise. Each worker process keeps its own psycopg pool; size it so
+# that workers * DB_POOL_MAX_SIZE stays within the connections reserved for
+# this application (the server also hosts Airflow and Sentry).
+POSTGRES_HOST = os.environ.get('POSTGRES_HOST')
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 4))
+DB_CONNECTION_BUDGET = int(os.environ.get('DB_CONNECTION_BUDGET', 100))
+DB_POOL_MAX_SIZE = int(os.environ.get(
+    'DB_POOL_MAX_SIZE', max(4, DB_CONNECTION_BUDGET // (2 * WEB_CONCURRENCY))
+))
+
+if POSTGRES_HOST:
+    _postgres = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'HOST': POSTGRES_HOST,
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'NAME': os.environ.get('POSTGRES_DB', 'naira'),
+        'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        # Pooled connections are reused by the pool, not by CONN_MAX_AGE
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False,
+    }
+    _pool = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': DB_POOL_MAX_SIZE,
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'max_idle': 300,
+        'max_lifetime': 3600,
+    }
+    DATABASES = {
+        'default': {
+            **_postgres,
+            'OPTIONS': {'pool': _pool},
+        },
+        # Same database for the hot retrieval queries (vector, full-text and
+        # chunk lookups). Server-side binding sends the SQL text without
+        # values, so psycopg prepares each query once it has run
+        # prepare_threshold times on a connection.
+        'retrieval': {
+            **_postgres,
+            'OPTIONS': {
+                'pool': _pool,
+                'server_side_binding': True,
+                'prepare_threshold': int(os.environ.get('DB_PREPARE_THRESHOLD', 2)),
+            },
+            'TEST': {'MIRROR': 'default'},
+        },
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Redis (the redis service of docker-compose) when REDIS_URL is set, a
+# per-process LocMemCache otherwise
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
-}
 
 
 # Password validation
@@ -120,3 +192,141 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Embeddings and vector stores
+# The 'backend' of each vector store type is a dotted path to a VectorStore class;
+# tests can point it at apps.knowledge_bases.vector_stores.NumpyVectorStore.
+
+EMBEDDING_CONFIG = {
+    'provider': 'ollama',
+    'host': os.environ.get('OLLAMA_HOST', 'http://localhost:11434'),
+    # Latency histograms: seconds between flushes, days of windows kept
+    'latency_flush_interval': 60,
+    'latency_retention_days': 7,
+    # Per-provider client settings (see apps/embeddings/clients.py). Point a
+    # provider's backend at apps.embeddings.clients.FakeProvider for tests.
+    'providers': {
+        'ollama': {
+            'backend': 'apps.embeddings.clients.OllamaProvider',
+            'host': os.environ.get('OLLAMA_HOST', 'http://localhost:11434'),
+            'max_concurrency': int(os.environ.get('OLLAMA_MAX_CONCURRENCY', 4)),
+            'max_batch_size': 64,
+            'batch_wait_ms': 5,
+        },
+        'openai': {
+            'backend': 'apps.embeddings.clients.OpenAIProvider',
+            'base_url': os.environ.get('OPENAI_BASE_URL', 'https://api.openai.com/v1'),
+            'api_key': os.environ.get('OPENAI_API_KEY'),
+            'max_concurrency': 8,
+            'requests_per_second': float(os.environ.get('OPENAI_REQUESTS_PER_SECOND', 50)),
+            'max_batch_size': 256,
+            'batch_wait_ms': 10,
+        },
+        'huggingface': {
+            'backend': 'apps.embeddings.clients.HuggingFaceProvider',
+            'url': os.environ.get('HF_TEI_URL', 'http://localhost:8080'),
+            'api_key': os.environ.get('HF_API_KEY'),
+            'max_concurrency': 4,
+            'max_batch_size': 32,
+        },
+        'sentence_transformers': {
+            'backend': 'apps.embeddings.clients.SentenceTransformersProvider',
+            'device': os.environ.get('SENTENCE_TRANSFORMERS_DEVICE'),
+            'max_concurrency': 1,
+            'max_batch_size': 64,
+            'max_retries': 0,
+        },
+    },
+}
+
+VECTOR_STORE_CONFIG = {
+    'pgvector': {
+        'backend': 'apps.knowledge_bases.vector_stores.PgVectorStore',
+    },
+    'qdrant': {
+        'backend': 'apps.knowledge_bases.vector_stores.QdrantVectorStore',
+        'url': os.environ.get('QDRANT_URL', 'http://localhost:6333'),
+        'api_key': os.environ.get('QDRANT_API_KEY'),
+        'timeout': 10,
+    },
+    # Memory-mapped snapshots (apps/knowledge_bases/snapshots.py); read-only
+    # deployments can point every type's backend at MmapVectorStore
+    'mmap': {
+        'backend': 'apps.knowledge_bases.vector_stores.MmapVectorStore',
+        'path': os.environ.get('VECTOR_SNAPSHOT_DIR', str(BASE_DIR / 'snapshots')),
+        'dtype': 'float32',
+        'keep': 2,
+    },
+}
+
+# Document processing queue (apps/documents/queue.py); run workers with
+# python manage.py shell -c "from apps.documents.queue import run_workers; run_workers()"
+TASK_QUEUE_CONFIG = {
+    'handlers': {
+        'extract_text': 'apps.documents.tasks.extract_text',
+        'chunk_text': 'apps.documents.tasks.chunk_text',
+        'generate_embeddings': 'apps.documents.tasks.generate_embeddings',
+        'quality_assessment': 'apps.documents.tasks.quality_assessment',
+    },
+    # Running tasks per type across all workers; unlisted types are unlimited
+    'concurrency': {
+        'generate_embeddings': int(os.environ.get('EMBEDDING_TASK_CONCURRENCY', 2)),
+    },
+    'lease_seconds': 300,
+    'heartbeat_interval': 30,
+    'poll_interval': 1.0,
+    'backoff_base': 5.0,
+    'backoff_max': 600.0,
+    'max_attempts': 5,
+}
+
+# In-process stage graph (apps/documents/pipeline.py): worker threads per stage
+# and the bounded queue size between stages
+DOCUMENT_PIPELINE_CONFIG = {
+    'workers': {
+        'extract_text': int(os.environ.get('PIPELINE_EXTRACT_WORKERS', os.cpu_count() or 1)),
+        'generate_embeddings': int(os.environ.get('PIPELINE_EMBED_WORKERS', 4)),
+    },
+    'default_workers': 1,
+    'queue_size': 8,
+}
+
+# Coalesced progress of jobs and tasks (apps/core/progress.py): database writes
+# at most every flush_interval seconds, live snapshots in CACHES[cache_alias]
+PROGRESS_CONFIG = {
+    'cache_alias': 'default',
+    'flush_interval': 5.0,
+    'publish_interval': 0.5,
+    'timeout': 60 * 60,
+}
+
+# Query embedding cache: per-process LRU, then CACHES[cache_alias], then the database
+QUERY_CACHE_CONFIG = {
+    'lru_size': 1024,
+    'cache_alias': 'default',
+    'timeout': 60 * 60 * 24,
+    'flush_interval': 30,
+}
+
+# Semantic cache of search results (apps/embeddings/semantic_cache.py): reuse the
+# results of an earlier query whose embedding is at least this similar
+SEMANTIC_CACHE_CONFIG = {
+    'enabled': os.environ.get('SEMANTIC_CACHE_ENABLED', 'true').lower() == 'true',
+    # Minimum score per distance metric (negated distance for l2)
+    'thresholds': {
+        'cosine': float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', 0.95)),
+        'inner_product': float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', 0.95)),
+        'l2': -float(os.environ.get('SEMANTIC_CACHE_MAX_L2_DISTANCE', 0.32)),
+    },
+    'ttl': 60 * 60 * 24,
+    'max_entries': 10000,
+    'flush_interval': 30,
+}
+
+# Async API (apps/api): threads available for database work off the event loop.
+# Each thread holds a pooled connection while it runs, so there are never more
+# threads than the pool can serve without waiting.
+API_CONFIG = {
+    'db_threads': min(int(os.environ.get('API_DB_THREADS', DB_POOL_MAX_SIZE)), DB_POOL_MAX_SIZE),
+}
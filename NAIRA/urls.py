@@ -16,7 +16,9 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
+from apps.core.views import health
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('health/', health, name='health'),
 ]
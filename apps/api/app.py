@@ -0,0 +1,258 @@
+"""
+Async HTTP API for retrieval and ingestion, served next to Django by NAIRA/asgi.py.
+
+    POST /api/knowledge-bases/{id}/search      vector or hybrid search
+    POST /api/knowledge-bases/{id}/documents   upload a document for ingestion
+    GET  /api/jobs/{id}                        embedding job status
+    GET  /api/embedding-models/latency         measured latency of embedding models
+    GET  /api/health                           database health and pool statistics
+
+Clients authenticate with their API key (``Authorization: Bearer <key>``).
+
+Simple lookups use Django's async ORM. Each request gets its own
+``ThreadSensitiveContext`` as under Django's ASGI handler, so those lookups do
+not queue behind other requests on one shared thread. Retrieval work runs in
+the event loop's default executor (sized by API_CONFIG['db_threads']) and the
+embedding provider is called with an async client, so a single worker keeps
+many requests in flight while they wait on I/O. Executor calls go through
+``db_sync_to_async()``, which returns the thread's connections to the pool
+when the call ends, and there are no more threads than pooled connections.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Literal
+from uuid import UUID
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.db import connections
+from fastapi import (
+    APIRouter, Depends, FastAPI, File, Form, Header,
+    HTTPException, Query, UploadFile
+)
+from apps.api.schemas import (
+    IngestResponse, JobStatus, LatencySummary, SearchHit, SearchRequest,
+    SearchResponseBody
+)
+from apps.core.db import db_sync_to_async
+
+router = APIRouter(prefix='/api')
+
+
+async def get_user(authorization: str = Header(default='')):
+    """Resolve the API key in the Authorization header to an active user."""
+    from apps.users.models import User
+
+    scheme, _, key = authorization.partition(' ')
+    if scheme.lower() != 'bearer' or not key:
+        raise HTTPException(status_code=401, detail='Missing API key')
+    try:
+        return await User.objects.aget(api_key=key, is_active=True)
+    except User.DoesNotExist:
+        raise HTTPException(status_code=401, detail='Invalid API key')
+
+
+async def get_knowledge_base(knowledge_base_id, user, edit=False):
+    """Fetch a knowledge base the user can access (or edit) in one query, or 404."""
+    from apps.knowledge_bases.models import KnowledgeBase
+
+    queryset = KnowledgeBase.objects.accessible_to(user)
+    if edit:
+        queryset = queryset.editable_by(user)
+    try:
+        return await queryset.aget(pk=knowledge_base_id)
+    except KnowledgeBase.DoesNotExist:
+        raise HTTPException(status_code=404, detail='Knowledge base not found')
+
+
+@router.post('/knowledge-bases/{knowledge_base_id}/search', response_model=SearchResponseBody)
+async def search(knowledge_base_id: UUID, body: SearchRequest, user=Depends(get_user)):
+    from apps.knowledge_bases.search import ahybrid_search, asearch
+
+    knowledge_base = await get_knowledge_base(knowledge_base_id, user)
+    try:
+        if body.mode == 'hybrid':
+            response = await ahybrid_search(
+                knowledge_base, body.query, k=body.k, filters=body.filters
+            )
+            results, timings = response.results, response.timings
+        else:
+            results = await asearch(knowledge_base, body.query, k=body.k, filters=body.filters)
+            timings = {}
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    return SearchResponseBody(
+        results=[
+            SearchHit(
+                document_id=result.chunk.document_id,
+                document_title=result.chunk.document.title,
+                chunk_index=result.chunk.chunk_index,
+                content=result.chunk.content,
+                score=result.score,
+                scores=result.scores,
+            )
+            for result in results
+        ],
+        timings=timings,
+    )
+
+
+def create_document(knowledge_base, user, upload, title):
+    """Store an uploaded file as a Document and queue its processing tasks."""
+    from django.core.files import File
+    from apps.documents.models import Document
+    from apps.documents.queue import enqueue
+    from apps.embeddings.models import EmbeddingJob
+
+    document = Document(
+        knowledge_base=knowledge_base,
+        title=title or upload.filename,
+        uploaded_by=user,
+        mime_type=upload.content_type or ''
+    )
+    document.file.save(upload.filename, File(upload.file), save=False)
+    document.save()
+
+    job = EmbeddingJob.objects.create(
+        job_type='document',
+        embedding_model=knowledge_base.get_embedding_model(),
+        parameters={
+            'knowledge_base_id': str(knowledge_base.pk),
+            'document_ids': [str(document.pk)],
+        }
+    )
+    # Processed by the worker pool (apps/documents/queue.py)
+    enqueue(document, 'extract_text', parameters={
+        'job_id': str(job.pk),
+        'next': ['generate_embeddings'],
+    })
+    return document, job
+
+
+@router.post(
+    '/knowledge-bases/{knowledge_base_id}/documents',
+    response_model=IngestResponse,
+    status_code=202
+)
+async def ingest(knowledge_base_id: UUID, file: UploadFile = File(...),
+                 title: str = Form(default=''), user=Depends(get_user)):
+    from apps.documents.extractors import EXTRACTORS
+
+    knowledge_base = await get_knowledge_base(knowledge_base_id, user, edit=True)
+    extension = os.path.splitext(file.filename or '')[1][1:].lower()
+    if extension not in EXTRACTORS:
+        raise HTTPException(status_code=415, detail=f"Unsupported file type '{extension}'")
+
+    document, job = await db_sync_to_async(create_document)(
+        knowledge_base, user, file, title
+    )
+    return IngestResponse(document_id=document.pk, job_id=job.pk, status=job.status)
+
+
+@router.get('/jobs/{job_id}', response_model=JobStatus)
+async def job_status(job_id: UUID, user=Depends(get_user)):
+    from apps.core.progress import aget_live_progress, live_snapshot
+    from apps.embeddings.models import EmbeddingJob
+
+    # Running jobs publish their progress to the cache; pollers skip the job row
+    job = await aget_live_progress(EmbeddingJob, job_id)
+    if job is None:
+        try:
+            job = live_snapshot(await EmbeddingJob.objects.aget(pk=job_id))
+        except EmbeddingJob.DoesNotExist:
+            raise HTTPException(status_code=404, detail='Job not found')
+
+    knowledge_base_id = job['parameters'].get('knowledge_base_id')
+    if knowledge_base_id:
+        await get_knowledge_base(knowledge_base_id, user)
+    elif not user.is_staff:
+        raise HTTPException(status_code=404, detail='Job not found')
+
+    total_items = job['total_items']
+    return JobStatus(
+        id=job_id,
+        job_type=job['job_type'],
+        status=job['status'],
+        status_message=job['status_message'],
+        total_items=total_items,
+        processed_items=job['processed_items'],
+        failed_items=job['failed_items'],
+        progress_percentage=job['processed_items'] / total_items * 100 if total_items else 0,
+        started_at=job['started_at'],
+        completed_at=job['completed_at'],
+        result_data=job['result_data'],
+    )
+
+
+def embedding_latency(minutes, order_by):
+    """Latency summaries of active embedding models, best first."""
+    from datetime import timedelta
+    from django.utils import timezone
+    from apps.embeddings.latency import latency_summary
+    from apps.embeddings.models import EmbeddingModel
+
+    models = {model.pk: model for model in EmbeddingModel.objects.filter(is_active=True)}
+    summaries = latency_summary(
+        list(models), since=timezone.now() - timedelta(minutes=minutes), order_by=order_by
+    )
+    return [
+        LatencySummary(
+            **summary,
+            name=models[summary['embedding_model_id']].name,
+            provider=models[summary['embedding_model_id']].provider,
+        )
+        for summary in summaries
+    ]
+
+
+@router.get('/embedding-models/latency', response_model=list[LatencySummary])
+async def embedding_models_latency(
+        minutes: int = Query(default=60, ge=1, le=60 * 24 * 30),
+        order_by: Literal[
+            'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'texts_per_second', 'tokens_per_second'
+        ] = 'p95_ms',
+        user=Depends(get_user)):
+    return await db_sync_to_async(embedding_latency)(minutes, order_by)
+
+
+@router.get('/health')
+async def health():
+    from fastapi.responses import JSONResponse
+    from apps.core.db import database_health
+
+    result = await db_sync_to_async(database_health)()
+    return JSONResponse(result, status_code=200 if result['ok'] else 503)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    import asyncio
+
+    config = getattr(settings, 'API_CONFIG', {})
+    executor = ThreadPoolExecutor(
+        max_workers=config.get('db_threads', getattr(settings, 'DB_POOL_MAX_SIZE', 4)),
+        thread_name_prefix='api-db'
+    )
+    asyncio.get_running_loop().set_default_executor(executor)
+    yield
+    executor.shutdown(wait=False)
+
+
+def create_app(django_application=None):
+    """Build the API application, serving every other path with Django."""
+    app = FastAPI(title='NAIRA API', lifespan=lifespan)
+
+    @app.middleware('http')
+    async def thread_sensitive_context(request, call_next):
+        async with ThreadSensitiveContext():
+            try:
+                return await call_next(request)
+            finally:
+                # Per-request ORM threads end with the request; close their connections
+                await sync_to_async(connections.close_all)()
+
+    app.include_router(router)
+    if django_application is not None:
+        app.mount('/', django_application)
+    return app
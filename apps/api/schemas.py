@@ -0,0 +1,65 @@
+"""
+Request and response bodies of the async API.
+"""
+from datetime import datetime
+from typing import Literal, Optional
+from uuid import UUID
+from pydantic import BaseModel, Field
+
+
+class SearchRequest(BaseModel):
+    query: str = Field(min_length=1)
+    k: int = Field(default=10, ge=1, le=100)
+    mode: Literal['vector', 'hybrid'] = 'hybrid'
+    filters: dict = Field(default_factory=dict)
+
+
+class SearchHit(BaseModel):
+    document_id: UUID
+    document_title: str
+    chunk_index: int
+    content: str
+    score: float
+    scores: dict = Field(default_factory=dict)
+
+
+class SearchResponseBody(BaseModel):
+    results: list[SearchHit]
+    timings: dict = Field(default_factory=dict)
+
+
+class IngestResponse(BaseModel):
+    document_id: UUID
+    job_id: UUID
+    status: str
+
+
+class JobStatus(BaseModel):
+    id: UUID
+    job_type: str
+    status: str
+    status_message: str
+    total_items: int
+    processed_items: int
+    failed_items: int
+    progress_percentage: float
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    result_data: dict = Field(default_factory=dict)
+
+
+class LatencySummary(BaseModel):
+    embedding_model_id: UUID
+    name: str = ''
+    provider: str = ''
+    calls: int
+    texts: int
+    tokens: int
+    mean_ms: Optional[float] = None
+    min_ms: Optional[float] = None
+    max_ms: Optional[float] = None
+    p50_ms: Optional[float] = None
+    p95_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
+    texts_per_second: Optional[float] = None
+    tokens_per_second: Optional[float] = None
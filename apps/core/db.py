@@ -0,0 +1,74 @@
+"""
+Database connection helpers: the retrieval alias, executor wrappers and
+health/pool statistics.
+"""
+import functools
+import time
+from django.db import connections
+
+RETRIEVAL_ALIAS = 'retrieval'
+
+
+def get_retrieval_alias():
+    """
+    Alias for hot retrieval queries: the 'retrieval' connection (server-side
+    binding with prepared statements) when configured, 'default' otherwise.
+    """
+    return RETRIEVAL_ALIAS if RETRIEVAL_ALIAS in connections.settings else 'default'
+
+
+def closing_connections(func):
+    """
+    Wrap a function run on an executor thread so the thread's connections are
+    closed (returned to the pool) when it finishes. Executor threads outlive
+    requests, and a connection they keep is one fewer for every other thread.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            connections.close_all()
+    return wrapper
+
+
+def db_sync_to_async(func):
+    """sync_to_async() on the event loop's executor, releasing connections afterwards."""
+    from asgiref.sync import sync_to_async
+
+    return sync_to_async(closing_connections(func), thread_sensitive=False)
+
+
+def get_pool_stats(alias):
+    """Statistics of an alias's psycopg connection pool, or None when it is not pooled."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql' or not connection.settings_dict['OPTIONS'].get('pool'):
+        return None
+    return connection.pool.get_stats()
+
+
+def check_database(alias):
+    """Run a trivial query on an alias; returns its health and pool statistics."""
+    connection = connections[alias]
+    started = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except Exception as exc:
+        return {'ok': False, 'error': str(exc), 'pool': get_pool_stats(alias)}
+    return {
+        'ok': True,
+        'latency_ms': (time.perf_counter() - started) * 1000,
+        'vendor': connection.vendor,
+        'pool': get_pool_stats(alias),
+    }
+
+
+def database_health():
+    """Health of every configured database alias."""
+    databases = {alias: check_database(alias) for alias in connections.settings}
+    return {
+        'ok': all(result['ok'] for result in databases.values()),
+        'databases': databases,
+    }
@@ -61,9 +61,48 @@ class UserOwnedModel(BaseModel):
         abstract = True
 
 
+class SharedQuerySet(models.QuerySet):
+    """QuerySet resolving sharing permissions in SQL."""
+
+    def accessible_to(self, user):
+        """
+        Resources the user can access, in a single query: public ones, owned
+        ones and ones shared with the user (an EXISTS on the through table).
+        """
+        if not user.is_authenticated:
+            return self.filter(is_public=True)
+        if user.is_superuser:
+            return self
+
+        shared_with = self.model._meta.get_field('shared_with')
+        shares = shared_with.remote_field.through.objects.filter(**{
+            shared_with.m2m_field_name(): models.OuterRef('pk'),
+            shared_with.m2m_reverse_field_name(): user.pk,
+        })
+        return self.filter(
+            models.Q(is_public=True)
+            | models.Q(owner_id=user.pk)
+            | models.Exists(shares)
+        )
+
+    def editable_by(self, user):
+        """Resources the user can edit."""
+        if not user.is_authenticated:
+            return self.none()
+        if user.is_superuser:
+            return self
+        return self.filter(owner_id=user.pk)
+
+
+class SharedManager(models.Manager.from_queryset(SharedQuerySet)):
+    """Manager exposing SharedQuerySet methods."""
+
+
 class SharedModel(UserOwnedModel):
     """
     Abstract model for resources that can be shared between users.
+    Use ``Model.objects.accessible_to(user)`` to list resources; calling
+    ``can_access()`` in a loop costs a query per resource.
     """
     shared_with = models.ManyToManyField(
         User,
@@ -78,6 +117,8 @@ class SharedModel(UserOwnedModel):
         help_text=_('Whether this resource is publicly accessible')
     )
 
+    objects = SharedManager()
+
     class Meta:
         abstract = True
 
@@ -86,11 +127,12 @@ class SharedModel(UserOwnedModel):
         if not user.is_authenticated:
             return self.is_public
 
+        # Compare keys so the owner row is never loaded; query shares last
         return (
                 self.is_public or
-                self.owner == user or
-                self.shared_with.filter(id=user.id).exists() or
-                user.is_superuser
+                self.owner_id == user.pk or
+                user.is_superuser or
+                self.shared_with.filter(id=user.id).exists()
         )
 
     def can_edit(self, user):
@@ -98,7 +140,7 @@ class SharedModel(UserOwnedModel):
         if not user.is_authenticated:
             return False
 
-        return self.owner == user or user.is_superuser
+        return self.owner_id == user.pk or user.is_superuser
 
 
 class VersionedModel(BaseModel):
@@ -173,6 +215,9 @@ class ProcessingStatusModel(BaseModel):
         verbose_name=_('Processing completed at')
     )
 
+    # Fields published to pollers next to the status (apps/core/progress.py)
+    progress_fields = ()
+
     class Meta:
         abstract = True
 
@@ -198,7 +243,7 @@ class ProcessingStatusModel(BaseModel):
         self.status = StatusChoices.PROCESSING
         self.status_message = message
         self.processing_started_at = timezone.now()
-        self.save(update_fields=['status', 'status_message', 'processing_started_at'])
+        self.save_status(['status', 'status_message', 'processing_started_at'])
 
     def mark_completed(self, message=''):
         """Mark the processing as completed."""
@@ -207,13 +252,31 @@ class ProcessingStatusModel(BaseModel):
         self.status = StatusChoices.COMPLETED
         self.status_message = message
         self.processing_completed_at = timezone.now()
-        self.save(update_fields=['status', 'status_message', 'processing_completed_at'])
+        self.save_status(['status', 'status_message', 'processing_completed_at'])
 
     def mark_failed(self, message=''):
         """Mark the processing as failed."""
         self.status = StatusChoices.FAILED
         self.status_message = message
-        self.save(update_fields=['status', 'status_message'])
+        self.save_status(['status', 'status_message'])
+
+    def get_live_fields(self):
+        return (
+            'status', 'status_message', 'processing_started_at', 'processing_completed_at',
+            *self.progress_fields
+        )
+
+    def report_progress(self, **values):
+        """Set progress fields, coalesced into periodic UPDATEs."""
+        from apps.core.progress import get_reporter
+
+        get_reporter(self).set(**values)
+
+    def save_status(self, fields):
+        """Save a state change in one UPDATE with any pending progress, and publish it."""
+        from apps.core.progress import flush_progress
+
+        flush_progress(self, fields)
 
 
 class MetadataModel(models.Model):
@@ -258,6 +321,10 @@ class SoftDeleteManager(models.Manager):
         return super().get_queryset().filter(is_deleted=True)
 
 
+class SharedSoftDeleteManager(SoftDeleteManager.from_queryset(SharedQuerySet)):
+    """Soft delete manager for shared models, with SharedQuerySet methods."""
+
+
 class SoftDeleteModel(models.Model):
     """
     Abstract model that provides soft delete functionality.
@@ -0,0 +1,214 @@
+"""
+Optional PostgreSQL declarative partitioning by a foreign key.
+
+Large per-tenant tables (docs_chunk and embeddings_document_embedding, keyed
+by knowledge_base_id) can be converted into ``PARTITION BY LIST`` tables with
+one partition per key value and a DEFAULT partition for keys without one.
+Scans filtered on the key then touch a single partition, and dropping a
+tenant is ``DROP TABLE`` on its partition instead of a cascading DELETE.
+
+The conversion is opt-in and runs from a migration:
+
+    from apps.core.partitioning import partition_by_list, unpartition
+
+    operations = [
+        migrations.RunPython(
+            lambda apps, schema_editor: partition_by_list(
+                schema_editor, apps.get_model('documents', 'DocumentChunk'), 'knowledge_base'
+            ),
+            lambda apps, schema_editor: unpartition(
+                schema_editor, apps.get_model('documents', 'DocumentChunk')
+            ),
+        ),
+    ]
+
+PostgreSQL requires primary keys and unique constraints of a partitioned table
+to include the partition key, so the primary key becomes ``(key, id)`` and the
+model's unique_together must already contain the key. Django keeps treating
+``id`` as the primary key. Indexes declared on the model are recreated; indexes
+built outside of it, such as the per-model ANN indexes, have to be rebuilt with
+``EmbeddingModel.create_vector_indexes()``, which is never CONCURRENTLY on a
+partitioned table.
+"""
+from django.db import connections
+from django.db.backends.utils import truncate_name
+
+_partitioned = {}
+
+
+def partition_name(model, value):
+    """Name of the partition holding rows whose key equals value."""
+    suffix = value.hex if hasattr(value, 'hex') else str(value).replace('-', '')
+    return f"{model._meta.db_table}_p_{suffix}"
+
+
+def is_partitioned(model, using='default'):
+    """Whether a model's table is a partitioned table; cached per process."""
+    key = (using, model._meta.db_table)
+    if key not in _partitioned:
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            _partitioned[key] = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+                    "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s)",
+                    [model._meta.db_table]
+                )
+                _partitioned[key] = cursor.fetchone()[0]
+    return _partitioned[key]
+
+
+def create_partition(model, value, using='default'):
+    """Create the partition for a key value; a no-op on unpartitioned tables."""
+    if not is_partitioned(model, using):
+        return False
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {quote(partition_name(model, value))} "
+            f"PARTITION OF {quote(model._meta.db_table)} FOR VALUES IN (%s)",
+            [str(value)]
+        )
+    return True
+
+
+def drop_partition(model, value, using='default'):
+    """
+    Detach and drop the partition for a key value, removing its rows without
+    scanning the other partitions. Returns False when there is no partition.
+    """
+    if not is_partitioned(model, using):
+        return False
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    name = partition_name(model, value)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+        if not cursor.fetchone()[0]:
+            return False
+        cursor.execute(f"ALTER TABLE {quote(model._meta.db_table)} DETACH PARTITION {quote(name)}")
+        cursor.execute(f"DROP TABLE {quote(name)}")
+    return True
+
+
+def _copy_columns(model, connection):
+    quote = connection.ops.quote_name
+    return ', '.join(
+        quote(field.column) for field in model._meta.concrete_fields if not field.generated
+    )
+
+
+def _add_field_constraints(schema_editor, model):
+    """
+    Recreate foreign key constraints and single-column indexes, which
+    CREATE TABLE ... LIKE does not copy.
+    """
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    max_length = connection.ops.max_name_length()
+    for field in model._meta.concrete_fields:
+        if field.db_index and not field.unique:
+            name = truncate_name(f"{table}_{field.column}_idx", max_length)
+            schema_editor.execute(
+                f"CREATE INDEX {quote(name)} ON {quote(table)} ({quote(field.column)})"
+            )
+        if not field.remote_field or not field.db_constraint:
+            continue
+        target = field.target_field
+        name = truncate_name(f"{table}_{field.column}_fk", max_length)
+        schema_editor.execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} "
+            f"FOREIGN KEY ({quote(field.column)}) "
+            f"REFERENCES {quote(target.model._meta.db_table)} ({quote(target.column)}) "
+            f"DEFERRABLE INITIALLY DEFERRED"
+        )
+
+
+def _rebuild_table(schema_editor, model, partition_clause, primary_key):
+    """Recreate a model's table with a new definition and copy its rows over."""
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    old_table = f"{table}_old"
+    columns = _copy_columns(model, connection)
+
+    schema_editor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old_table)}")
+    # Constraint and index names are schema-wide; free them for the new table
+    schema_editor.execute(
+        f"ALTER TABLE {quote(old_table)} DROP CONSTRAINT IF EXISTS {quote(table + '_pkey')}"
+    )
+
+    schema_editor.execute(
+        f"CREATE TABLE {quote(table)} (LIKE {quote(old_table)} "
+        f"INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING CONSTRAINTS){partition_clause}"
+    )
+    schema_editor.execute(f"ALTER TABLE {quote(table)} ADD PRIMARY KEY ({primary_key})")
+    return old_table, columns
+
+
+def _finish_rebuild(schema_editor, model, old_table, columns):
+    quote = schema_editor.connection.ops.quote_name
+    table = model._meta.db_table
+
+    schema_editor.execute(
+        f"INSERT INTO {quote(table)} ({columns}) SELECT {columns} FROM {quote(old_table)}"
+    )
+    schema_editor.execute(f"DROP TABLE {quote(old_table)} CASCADE")
+
+    _add_field_constraints(schema_editor, model)
+    schema_editor.alter_unique_together(model, [], model._meta.unique_together)
+    for index in model._meta.indexes:
+        schema_editor.add_index(model, index)
+    _partitioned.pop((schema_editor.connection.alias, table), None)
+
+
+def partition_by_list(schema_editor, model, field_name):
+    """
+    Convert a model's table into one LIST-partitioned on field_name, with a
+    partition for every key value present and a DEFAULT partition.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    key = model._meta.get_field(field_name).column
+    pk = model._meta.pk.column
+
+    old_table, columns = _rebuild_table(
+        schema_editor, model,
+        f" PARTITION BY LIST ({quote(key)})",
+        f"{quote(key)}, {quote(pk)}"
+    )
+    schema_editor.execute(
+        f"CREATE TABLE {quote(table + '_p_default')} PARTITION OF {quote(table)} DEFAULT"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT {quote(key)} FROM {quote(old_table)}")
+        values = [row[0] for row in cursor.fetchall()]
+    for value in values:
+        schema_editor.execute(
+            f"CREATE TABLE {quote(partition_name(model, value))} "
+            f"PARTITION OF {quote(table)} FOR VALUES IN (%s)",
+            [str(value)]
+        )
+    _finish_rebuild(schema_editor, model, old_table, columns)
+
+
+def unpartition(schema_editor, model):
+    """Convert a partitioned table back into a plain table."""
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    old_table, columns = _rebuild_table(
+        schema_editor, model, '', connection.ops.quote_name(model._meta.pk.column)
+    )
+    _finish_rebuild(schema_editor, model, old_table, columns)
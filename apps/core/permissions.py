@@ -0,0 +1,91 @@
+"""
+Per-request memoisation of SharedModel permissions.
+
+``PermissionCacheMiddleware`` attaches a ``PermissionCache`` to every request
+as ``request.permissions``. Access checks answer from the loaded row when they
+can (public, owner, superuser), and otherwise resolve a whole batch of
+resources with one ``accessible_to()`` query; answers are kept for the rest of
+the request:
+
+    knowledge_bases = request.permissions.filter_accessible(knowledge_bases)
+    if request.permissions.can_access(knowledge_base): ...
+"""
+from apps.core.models import SharedQuerySet
+
+
+class PermissionCache:
+    """
+    Memoised access decisions of one user for SharedModel instances.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._access = {}
+
+    @staticmethod
+    def _key(obj):
+        return obj._meta.label, obj.pk
+
+    def _decide_locally(self, obj):
+        """Decide from the row alone, or return None when the shares must be queried."""
+        if obj.is_public:
+            return True
+        if not self.user.is_authenticated:
+            return False
+        if self.user.is_superuser or obj.owner_id == self.user.pk:
+            return True
+        return None
+
+    def prefetch(self, objs):
+        """Resolve access to several instances with at most one query per model."""
+        pending = {}
+        for obj in objs:
+            key = self._key(obj)
+            if key in self._access:
+                continue
+            decision = self._decide_locally(obj)
+            if decision is None:
+                pending.setdefault(type(obj), []).append(obj.pk)
+            else:
+                self._access[key] = decision
+
+        for model_cls, pks in pending.items():
+            # A bare SharedQuerySet skips manager filters such as soft delete
+            allowed = set(
+                SharedQuerySet(model=model_cls).filter(pk__in=pks)
+                .accessible_to(self.user)
+                .values_list('pk', flat=True)
+            )
+            for pk in pks:
+                self._access[(model_cls._meta.label, pk)] = pk in allowed
+
+    def can_access(self, obj):
+        """Check if the user can access an instance."""
+        key = self._key(obj)
+        if key not in self._access:
+            self.prefetch([obj])
+        return self._access[key]
+
+    def can_edit(self, obj):
+        """Check if the user can edit an instance; needs no query."""
+        return obj.can_edit(self.user)
+
+    def filter_accessible(self, objs):
+        """Return the instances the user can access, keeping their order."""
+        objs = list(objs)
+        self.prefetch(objs)
+        return [obj for obj in objs if self._access[self._key(obj)]]
+
+
+class PermissionCacheMiddleware:
+    """
+    Attach a PermissionCache for the authenticated user to each request.
+    Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.permissions = PermissionCache(request.user)
+        return self.get_response(request)
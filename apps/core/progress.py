@@ -0,0 +1,175 @@
+"""
+Coalesced progress reporting for ProcessingStatusModel rows.
+
+Fine-grained progress (one call per chunk or item) is accumulated in memory by
+a ProgressReporter and written with a single UPDATE at most every
+``PROGRESS_CONFIG['flush_interval']`` seconds: counters as ``F() + delta`` so
+concurrent writers add up, other fields by value. State changes (``mark_*``)
+write any pending progress together with the new status, so the database is
+exact whenever a task starts, completes or fails.
+
+Between flushes a snapshot of the row's live fields is published to the
+Django cache at most every ``publish_interval`` seconds. Pollers read it with
+``get_live_progress()`` and only fall back to the database when it is missing
+(no progress reported for ``timeout`` seconds, or a cache flush).
+"""
+import logging
+import threading
+import time
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROGRESS_CONFIG = {
+    'cache_alias': 'default',
+    'flush_interval': 5.0,
+    'publish_interval': 0.5,
+    'timeout': 60 * 60,
+}
+
+_reporters = {}
+_reporters_lock = threading.Lock()
+
+
+def get_progress_config():
+    from django.conf import settings
+
+    return {**DEFAULT_PROGRESS_CONFIG, **getattr(settings, 'PROGRESS_CONFIG', {})}
+
+
+def progress_key(model_cls, pk):
+    return f"progress:{model_cls._meta.label_lower}:{pk}"
+
+
+def _cache(config):
+    from django.core.cache import caches
+
+    return caches[config['cache_alias']]
+
+
+def live_snapshot(instance):
+    """The fields pollers see for an instance."""
+    return {field: getattr(instance, field) for field in instance.get_live_fields()}
+
+
+def publish_progress(instance, config=None):
+    """Publish an instance's live fields to the cache; never fails the caller."""
+    config = config or get_progress_config()
+    try:
+        _cache(config).set(
+            progress_key(type(instance), instance.pk), live_snapshot(instance), config['timeout']
+        )
+    except Exception:
+        logger.warning("Could not publish progress of %s", instance.pk, exc_info=True)
+
+
+class ProgressReporter:
+    """
+    Coalesces progress updates of one row. ``add()`` increments counters,
+    ``set()`` replaces values; both update the instance immediately and the
+    database and cache at a bounded rate.
+    """
+
+    def __init__(self, instance, config=None):
+        self.instance = instance
+        self.config = config or get_progress_config()
+        self.fields = set()
+        self._deltas = {}
+        self._values = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._last_publish = 0.0
+
+    def add(self, **deltas):
+        with self._lock:
+            self.fields.update(deltas)
+            for field, delta in deltas.items():
+                self._deltas[field] = self._deltas.get(field, 0) + delta
+                setattr(self.instance, field, getattr(self.instance, field) + delta)
+        self._tick()
+
+    def set(self, **values):
+        with self._lock:
+            self.fields.update(values)
+            self._values.update(values)
+            for field, value in values.items():
+                setattr(self.instance, field, value)
+        self._tick()
+
+    def _tick(self):
+        now = time.monotonic()
+        if now - self._last_flush >= self.config['flush_interval']:
+            self.flush()
+        elif now - self._last_publish >= self.config['publish_interval']:
+            self._last_publish = now
+            publish_progress(self.instance, self.config)
+
+    def take(self):
+        """Pending changes as UPDATE keyword arguments; clears them."""
+        with self._lock:
+            update = {field: F(field) + delta for field, delta in self._deltas.items() if delta}
+            update.update(self._values)
+            self._deltas, self._values = {}, {}
+            self._last_flush = time.monotonic()
+        return update
+
+    def flush(self):
+        """Write pending changes in one UPDATE and publish the live fields."""
+        update = self.take()
+        if update:
+            type(self.instance)._base_manager.filter(pk=self.instance.pk).update(**update)
+        self._last_publish = time.monotonic()
+        publish_progress(self.instance, self.config)
+
+
+def _registry_key(instance):
+    return (type(instance)._meta.label_lower, instance.pk)
+
+
+def get_reporter(instance):
+    """The process-wide reporter of a row, bound to the first instance that reports."""
+    key = _registry_key(instance)
+    with _reporters_lock:
+        reporter = _reporters.get(key)
+        if reporter is None:
+            reporter = _reporters[key] = ProgressReporter(instance)
+        return reporter
+
+
+def flush_progress(instance, fields=(), publish=True):
+    """
+    Write an instance's pending progress together with ``fields`` (taken from
+    the instance) in one UPDATE, stop coalescing for it and publish it.
+    """
+    with _reporters_lock:
+        reporter = _reporters.pop(_registry_key(instance), None)
+
+    update = {}
+    if reporter is not None:
+        update = reporter.take()
+        if reporter.instance is not instance:
+            for field in reporter.fields:
+                if field not in fields:
+                    setattr(instance, field, getattr(reporter.instance, field))
+    update.update({field: getattr(instance, field) for field in fields})
+    if update:
+        type(instance)._base_manager.filter(pk=instance.pk).update(**update)
+    if publish:
+        publish_progress(instance)
+
+
+def get_live_progress(model_cls, pk):
+    """The last published live fields of a row, or None."""
+    try:
+        return _cache(get_progress_config()).get(progress_key(model_cls, pk))
+    except Exception:
+        logger.warning("Could not read progress of %s", pk, exc_info=True)
+        return None
+
+
+async def aget_live_progress(model_cls, pk):
+    try:
+        return await _cache(get_progress_config()).aget(progress_key(model_cls, pk))
+    except Exception:
+        logger.warning("Could not read progress of %s", pk, exc_info=True)
+        return None
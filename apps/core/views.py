@@ -0,0 +1,15 @@
+"""
+Operational views.
+"""
+from django.http import JsonResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+from apps.core.db import database_health
+
+
+@never_cache
+@require_GET
+def health(request):
+    """Database health and connection pool statistics; 503 when a database is down."""
+    result = database_health()
+    return JsonResponse(result, status=200 if result['ok'] else 503)
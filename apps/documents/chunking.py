@@ -0,0 +1,290 @@
+"""
+Text chunking.
+
+Chunkers work on character offsets: they return spans into the original text
+so ``start_char``/``end_char`` are exact and substrings are only materialised
+when a chunk is stored. Python strings cannot be viewed through memoryview, so
+offsets into the one source string play that role.
+
+Strategies (``CHUNKERS``):
+    fixed      -- fixed character windows
+    sentence   -- whole sentences packed up to chunk_size characters
+    recursive  -- split on paragraphs, lines, sentences, then words until pieces fit
+    token      -- windows of chunk_size tokens
+
+Sentence and recursive boundaries are anchored on the text itself, so after a
+small edit the chunks re-align with the old ones and incremental re-chunking
+(apps/documents/rechunk.py) only re-embeds the few chunks around the edit.
+Fixed and token windows are anchored on offsets: an insertion shifts every
+later boundary, and re-chunking such documents gets no incremental savings.
+"""
+import re
+from collections import namedtuple
+
+ChunkSpan = namedtuple('ChunkSpan', ['start', 'end'])
+
+
+def fixed_window_spans(text_length, chunk_size, chunk_overlap):
+    """Yield windows of chunk_size characters, consecutive windows sharing chunk_overlap."""
+    if chunk_overlap >= chunk_size:
+        raise ValueError('chunk_overlap must be smaller than chunk_size')
+
+    step = chunk_size - chunk_overlap
+    start = 0
+    while start < text_length:
+        end = min(start + chunk_size, text_length)
+        yield ChunkSpan(start, end)
+        if end == text_length:
+            return
+        start += step
+
+
+def iter_stream_chunks(segments, chunk_size, chunk_overlap):
+    """
+    Yield (start, end, text) fixed windows over a stream of text segments.
+
+    Produces the same windows as ``fixed_window_spans`` over the concatenated
+    text while only buffering about one segment plus one chunk. The buffer is
+    compacted when refilled rather than after every chunk, so cutting a chunk
+    never copies the rest of the buffer.
+    """
+    if chunk_overlap >= chunk_size:
+        raise ValueError('chunk_overlap must be smaller than chunk_size')
+
+    step = chunk_size - chunk_overlap
+    buffer = ''
+    buffer_start = 0  # offset of buffer[0] in the full text
+    position = 0  # start of the next window, relative to buffer
+
+    for segment in segments:
+        buffer = buffer[position:] + segment
+        buffer_start += position
+        position = 0
+        while len(buffer) - position > chunk_size:
+            yield (
+                buffer_start + position,
+                buffer_start + position + chunk_size,
+                buffer[position:position + chunk_size]
+            )
+            position += step
+
+    # The final window runs to the end of the text
+    while position < len(buffer):
+        end = min(position + chunk_size, len(buffer))
+        yield buffer_start + position, buffer_start + end, buffer[position:end]
+        if end == len(buffer):
+            return
+        position += step
+
+
+def iter_stream_chunker_chunks(segments, chunker):
+    """
+    Yield (start, end, text) chunks of a piece-based chunker over a stream.
+
+    The chunker runs over a buffer of at least four chunk sizes. Only the last
+    piece of the buffer can be cut short, and it can only change the last two
+    chunks, so every chunk before them is emitted and the buffer restarts at
+    the first held-back chunk, which starts on a piece boundary. With local
+    pieces (sentence, token) this gives the same chunks as chunking the whole
+    text; recursive pieces stay anchored on the text's separators. Fixed
+    window chunkers use iter_stream_chunks().
+    """
+    if isinstance(chunker, FixedWindowChunker):
+        yield from iter_stream_chunks(segments, chunker.chunk_size, chunker.chunk_overlap)
+        return
+
+    buffer = ''
+    buffer_start = 0
+
+    for segment in segments:
+        buffer += segment
+        if len(buffer) < 4 * chunker.chunk_size:
+            continue
+        spans = list(chunker.spans(buffer))
+        if len(spans) < 3:
+            continue
+        for span in spans[:-2]:
+            yield buffer_start + span.start, buffer_start + span.end, buffer[span.start:span.end]
+        restart = spans[-2].start
+        buffer = buffer[restart:]
+        buffer_start += restart
+
+    for span in chunker.spans(buffer):
+        yield buffer_start + span.start, buffer_start + span.end, buffer[span.start:span.end]
+
+
+def pack_pieces(count, measure, limit, overlap):
+    """
+    Greedily group consecutive pieces into chunks.
+
+    ``measure(i, j)`` returns the size of pieces[i:j]. Yields (i, j) ranges
+    whose size stays within limit; each range starts with the trailing pieces
+    of the previous one that fit within overlap, and always ends further on.
+    """
+    i = 0
+    while i < count:
+        j = i + 1
+        while j < count and measure(i, j + 1) <= limit:
+            j += 1
+        yield i, j
+        if j >= count:
+            return
+        # Carry trailing pieces over, leaving room for at least one new piece
+        k = j
+        while k - 1 > i and measure(k - 1, j) <= overlap and measure(k - 1, j + 1) <= limit:
+            k -= 1
+        i = k
+
+
+class Chunker:
+    """
+    Base class for chunking strategies.
+
+    Subclasses implement ``pieces()``, returning the (start, end) offsets of
+    atomic pieces no larger than chunk_size; the base class packs them.
+    """
+
+    def __init__(self, chunk_size=1000, chunk_overlap=200):
+        if chunk_overlap >= chunk_size:
+            raise ValueError('chunk_overlap must be smaller than chunk_size')
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def pieces(self, text):
+        raise NotImplementedError
+
+    def split_oversized(self, start, end):
+        """Cut a piece larger than chunk_size into fixed windows without overlap."""
+        for span in fixed_window_spans(end - start, self.chunk_size, 0):
+            yield start + span.start, start + span.end
+
+    def spans(self, text):
+        """Yield the ChunkSpans of a text."""
+        starts, ends = [], []
+        for start, end in self.pieces(text):
+            starts.append(start)
+            ends.append(end)
+
+        def measure(i, j):
+            return ends[j - 1] - starts[i]
+
+        for i, j in pack_pieces(len(starts), measure, self.chunk_size, self.chunk_overlap):
+            yield ChunkSpan(starts[i], ends[j - 1])
+
+    def chunks(self, text):
+        """Yield (start, end, text) for every chunk of a text."""
+        for span in self.spans(text):
+            yield span.start, span.end, text[span.start:span.end]
+
+
+class FixedWindowChunker(Chunker):
+    """
+    Fixed windows of chunk_size characters.
+    """
+
+    def spans(self, text):
+        return fixed_window_spans(len(text), self.chunk_size, self.chunk_overlap)
+
+
+class SentenceChunker(Chunker):
+    """
+    Pack whole sentences into chunks; overlap repeats trailing sentences.
+    Sentences longer than chunk_size are cut into fixed windows.
+    """
+    SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+|\n\s*\n')
+
+    def pieces(self, text):
+        start = 0
+        for match in self.SENTENCE_END.finditer(text):
+            yield from self.sentence(start, match.end())
+            start = match.end()
+        if start < len(text):
+            yield from self.sentence(start, len(text))
+
+    def sentence(self, start, end):
+        if end - start > self.chunk_size:
+            yield from self.split_oversized(start, end)
+        else:
+            yield start, end
+
+
+class RecursiveChunker(Chunker):
+    """
+    Split on the coarsest separator that occurs in a piece, recursing with
+    finer separators into pieces that are still larger than chunk_size.
+    Separators stay attached to the end of the piece they terminate.
+    """
+    SEPARATORS = ('\n\n', '\n', '. ', ' ')
+
+    def __init__(self, chunk_size=1000, chunk_overlap=200, separators=None):
+        super().__init__(chunk_size, chunk_overlap)
+        self.separators = tuple(separators or self.SEPARATORS)
+
+    def pieces(self, text):
+        return self.split(text, 0, len(text), self.separators)
+
+    def split(self, text, start, end, separators):
+        if end - start <= self.chunk_size:
+            if end > start:
+                yield start, end
+            return
+
+        for position, separator in enumerate(separators):
+            if text.find(separator, start, end) != -1:
+                break
+        else:
+            yield from self.split_oversized(start, end)
+            return
+
+        finer = separators[position + 1:]
+        piece_start = start
+        while piece_start < end:
+            found = text.find(separator, piece_start, end)
+            piece_end = end if found == -1 else found + len(separator)
+            yield from self.split(text, piece_start, piece_end, finer)
+            piece_start = piece_end
+
+
+class TokenBudgetChunker(Chunker):
+    """
+    Windows of at most chunk_size tokens overlapping by chunk_overlap tokens.
+
+    ``tokenize(text)`` must return (start, end) character offsets of every
+    token; the default approximates tokens as words and punctuation marks.
+    """
+    TOKEN = re.compile(r'\w+|[^\w\s]')
+
+    def __init__(self, chunk_size=512, chunk_overlap=64, tokenize=None):
+        super().__init__(chunk_size, chunk_overlap)
+        self.tokenize = tokenize or self.regex_tokens
+
+    @classmethod
+    def regex_tokens(cls, text):
+        return [match.span() for match in cls.TOKEN.finditer(text)]
+
+    def pieces(self, text):
+        return self.tokenize(text)
+
+    def spans(self, text):
+        offsets = self.pieces(text)
+        for i, j in pack_pieces(
+            len(offsets), lambda i, j: j - i, self.chunk_size, self.chunk_overlap
+        ):
+            yield ChunkSpan(offsets[i][0], offsets[j - 1][1])
+
+
+CHUNKERS = {
+    'fixed': FixedWindowChunker,
+    'sentence': SentenceChunker,
+    'recursive': RecursiveChunker,
+    'token': TokenBudgetChunker,
+}
+
+
+def get_chunker(strategy='fixed', chunk_size=1000, chunk_overlap=200, **kwargs):
+    """Return a chunker for one of the CHUNKERS strategies."""
+    try:
+        chunker_class = CHUNKERS[strategy]
+    except KeyError:
+        raise ValueError(f"Unknown chunking strategy '{strategy}'")
+    return chunker_class(chunk_size=chunk_size, chunk_overlap=chunk_overlap, **kwargs)
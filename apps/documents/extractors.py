@@ -0,0 +1,156 @@
+"""
+Streaming text extractors, one per Document.file_type.
+
+Extractors read a binary file object and yield text segments (blocks, pages,
+paragraphs or rows) instead of returning the whole text, so the memory needed
+to process a document is bounded by its largest segment, not by its size.
+"""
+import codecs
+import zipfile
+from xml.etree import ElementTree
+
+# Characters per segment for plain text formats
+TEXT_BLOCK_SIZE = 1 << 20
+
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+class Extractor:
+    """
+    Base class for streaming extractors.
+    """
+
+    def iter_text(self, fileobj):
+        """Yield the text of a file as consecutive segments."""
+        raise NotImplementedError
+
+
+class TextExtractor(Extractor):
+    """
+    Decode text files block by block; multi-byte characters split across
+    blocks are handled by an incremental decoder.
+    """
+
+    def __init__(self, encoding='utf-8', block_size=TEXT_BLOCK_SIZE):
+        self.encoding = encoding
+        self.block_size = block_size
+
+    def iter_text(self, fileobj):
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+        while True:
+            data = fileobj.read(self.block_size)
+            if not data:
+                break
+            text = decoder.decode(data)
+            if text:
+                yield text
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+
+class MarkdownExtractor(TextExtractor):
+    """
+    Markdown is chunked as plain text so offsets match the source file.
+    """
+
+
+class PdfExtractor(Extractor):
+    """
+    Extract PDFs page by page; pypdf parses page objects lazily.
+    """
+
+    def iter_text(self, fileobj):
+        from pypdf import PdfReader
+
+        reader = PdfReader(fileobj)
+        for page in reader.pages:
+            text = page.extract_text() or ''
+            if text:
+                yield text + '\n\n'
+
+
+class DocxExtractor(Extractor):
+    """
+    Stream paragraphs out of word/document.xml with iterparse, removing each
+    paragraph from its parent once read, so the tree never holds more than
+    the elements currently open.
+    """
+
+    def iter_text(self, fileobj):
+        with zipfile.ZipFile(fileobj) as archive, archive.open('word/document.xml') as xml:
+            open_elements = []
+            for event, element in ElementTree.iterparse(xml, events=('start', 'end')):
+                if event == 'start':
+                    open_elements.append(element)
+                    continue
+                open_elements.pop()
+                if element.tag != f'{WORD_NAMESPACE}p':
+                    continue
+                text = ''.join(node.text or '' for node in element.iter(f'{WORD_NAMESPACE}t'))
+                if open_elements:
+                    open_elements[-1].remove(element)
+                if text:
+                    yield text + '\n'
+
+
+class XlsxExtractor(Extractor):
+    """
+    Stream worksheet rows as tab-separated lines using openpyxl's read-only mode.
+    """
+
+    def __init__(self, rows_per_segment=1000):
+        self.rows_per_segment = rows_per_segment
+
+    def iter_text(self, fileobj):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                lines = [f"# {sheet.title}\n"]
+                for row in sheet.iter_rows(values_only=True):
+                    if any(value is not None for value in row):
+                        lines.append('\t'.join('' if value is None else str(value) for value in row) + '\n')
+                    if len(lines) >= self.rows_per_segment:
+                        yield ''.join(lines)
+                        lines = []
+                if lines:
+                    yield ''.join(lines)
+        finally:
+            workbook.close()
+
+
+class ImageExtractor(Extractor):
+    """
+    OCR an image with Tesseract; an image yields a single segment.
+    """
+
+    def iter_text(self, fileobj):
+        import pytesseract
+        from PIL import Image
+
+        with Image.open(fileobj) as image:
+            text = pytesseract.image_to_string(image)
+        if text:
+            yield text
+
+
+EXTRACTORS = {
+    'pdf': PdfExtractor,
+    'docx': DocxExtractor,
+    'txt': TextExtractor,
+    'md': MarkdownExtractor,
+    'xlsx': XlsxExtractor,
+    'png': ImageExtractor,
+    'jpg': ImageExtractor,
+    'jpeg': ImageExtractor,
+}
+
+
+def get_extractor(file_type):
+    """Return an extractor instance for a Document.file_type."""
+    try:
+        return EXTRACTORS[file_type]()
+    except KeyError:
+        raise ValueError(f"No text extractor for file type '{file_type}'")
@@ -0,0 +1,142 @@
+"""
+Bulk ingestion of documents, chunks and embeddings.
+
+Model ``save()`` methods compute metrics and update knowledge base counters one
+row at a time. This module is the batch path: metrics are computed for a whole
+batch with NumPy, rows are streamed with PostgreSQL ``COPY ... FROM STDIN``
+(binary format for embeddings, so vectors are never rendered as text) and the
+knowledge base counters are adjusted with a single UPDATE per batch.
+"""
+import re
+from django.db import connections, transaction
+from apps.documents.metrics import compute_chunk_metrics
+
+
+def apply_chunk_metrics(chunks, tokenizer=None):
+    """Fill hashes and char/word/token counts on unsaved chunks in one vectorised pass."""
+    from apps.documents.models import compute_content_hash
+
+    char_counts, word_counts, token_counts = compute_chunk_metrics(
+        [chunk.content or '' for chunk in chunks], tokenizer=tokenizer
+    )
+    for chunk, chars, words, tokens in zip(chunks, char_counts, word_counts, token_counts):
+        chunk.content_hash = compute_content_hash(chunk.content or '')
+        if chunk.content:
+            chunk.char_count = int(chars)
+            chunk.word_count = int(words)
+            chunk.token_count = int(tokens)
+    return chunks
+
+
+def _copy_type(field, connection):
+    """Name of a field's column type without modifiers, e.g. varchar(20) -> varchar."""
+    return re.sub(r'\(.*\)', '', field.db_type(connection)).strip()
+
+
+def copy_objects(objs, binary=False, using='default'):
+    """
+    Insert unsaved model instances with COPY FROM STDIN.
+    Falls back to ``bulk_create`` on databases other than PostgreSQL.
+    """
+    if not objs:
+        return objs
+
+    model = type(objs[0])
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return model.objects.using(using).bulk_create(objs)
+
+    fields = [field for field in model._meta.concrete_fields if not field.generated]
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in fields)
+    sql = f"COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN"
+    if binary:
+        sql += " WITH (FORMAT BINARY)"
+
+    with connection.cursor() as cursor:
+        if binary:
+            from pgvector.psycopg import register_vector
+
+            register_vector(connection.connection)
+
+        with cursor.copy(sql) as copy:
+            if binary:
+                copy.set_types([_copy_type(field, connection) for field in fields])
+            for obj in objs:
+                copy.write_row([
+                    _copy_value(field, obj, connection, binary) for field in fields
+                ])
+    return objs
+
+
+def _copy_value(field, obj, connection, binary):
+    """Prepare one column value the way Django's INSERT compiler would."""
+    value = field.pre_save(obj, add=True)
+    if binary and field.get_internal_type() in ('VectorField', 'HalfVectorField'):
+        import numpy as np
+
+        return None if value is None else np.asarray(value, dtype=np.float32)
+    if binary and field.get_internal_type() == 'BitField':
+        from pgvector import Bit
+
+        return None if value is None else Bit(value)
+    return field.get_db_prep_save(value, connection)
+
+
+def copy_chunks(chunks, tokenizer=None, using='default'):
+    """Compute metrics for and COPY a batch of unsaved DocumentChunks."""
+    for chunk in chunks:
+        chunk.denormalize()
+    return copy_objects(apply_chunk_metrics(chunks, tokenizer=tokenizer), using=using)
+
+
+def copy_embeddings(embeddings, using='default'):
+    """
+    COPY a batch of unsaved DocumentEmbeddings using the binary format.
+    Vectors given as embedding_vector are stored under their model's storage type.
+    """
+    from apps.embeddings.models import EmbeddingModel
+
+    embedding_models = EmbeddingModel.objects.using(using).in_bulk(
+        {embedding.embedding_model_id for embedding in embeddings}
+    )
+    for embedding in embeddings:
+        embedding.denormalize()
+        embedding.apply_storage(embedding_models[embedding.embedding_model_id])
+    return copy_objects(embeddings, binary=True, using=using)
+
+
+def ingest_documents(knowledge_base, documents, chunks=(), embeddings=(), using='default'):
+    """
+    Ingest a batch of unsaved Documents with their chunks and embeddings.
+
+    Chunks and embeddings must reference their documents through ``document``
+    (primary keys are assigned on instantiation, so no round trip is needed).
+    Returns the number of documents, chunks and tokens added.
+    """
+    from apps.documents.models import Document
+
+    tokenizer = knowledge_base.get_tokenizer()
+    for document in documents:
+        document.knowledge_base = knowledge_base
+        document.update_file_info()
+        document.calculate_content_metrics(tokenizer=tokenizer)
+
+    chunks = list(chunks)
+    with transaction.atomic(using=using):
+        Document.objects.using(using).bulk_create(documents)
+        copy_chunks(chunks, tokenizer=tokenizer, using=using)
+        copy_embeddings(list(embeddings), using=using)
+
+        token_total = sum(chunk.token_count for chunk in chunks)
+        knowledge_base.add_to_statistics(
+            documents=len(documents),
+            chunks=len(chunks),
+            tokens=token_total
+        )
+
+    return {
+        'documents': len(documents),
+        'chunks': len(chunks),
+        'tokens': token_total,
+    }
@@ -1,14 +1,30 @@
 """
 Document models for the RAG system.
 """
+import hashlib
 import os
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.files.storage import default_storage
 from apps.core.models import (
     BaseModel, ProcessingStatusModel, MetadataModel, SoftDeleteModel
 )
+from apps.documents.metrics import count_words, estimate_tokens
+
+
+# Text search configuration for DocumentChunk.search_vector. 'simple' does no
+# stemming or stop-word removal, so part numbers and names match verbatim and
+# the index works across every supported document language.
+TEXT_SEARCH_CONFIG = 'simple'
+
+
+def compute_content_hash(content):
+    """Return the SHA-256 hex digest identifying a chunk's text."""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
 
 def document_upload_path(instance, filename):
@@ -137,10 +153,25 @@ class Document(BaseModel, ProcessingStatusModel, MetadataModel, SoftDeleteModel)
         db_table = 'docs_document'
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['knowledge_base', 'status']),
+            models.Index(
+                fields=['knowledge_base', 'status'],
+                condition=models.Q(is_deleted=False),
+                name='docs_doc_kb_status_live'
+            ),
             models.Index(fields=['file_type']),
             models.Index(fields=['language']),
             models.Index(fields=['uploaded_by']),
+            # Restore and purge only look at soft deleted rows
+            models.Index(
+                fields=['knowledge_base', 'deleted_at'],
+                condition=models.Q(is_deleted=True),
+                name='docs_doc_kb_deleted_at'
+            ),
+            models.Index(
+                fields=['deleted_at'],
+                condition=models.Q(is_deleted=True),
+                name='docs_doc_deleted_at'
+            ),
         ]
 
     def __str__(self):
@@ -148,15 +179,10 @@ class Document(BaseModel, ProcessingStatusModel, MetadataModel, SoftDeleteModel)
 
     def save(self, *args, **kwargs):
         """Override save to update file information."""
-        if self.file:
-            self.file_size = self.file.size
-            # Extract file extension
-            _, ext = os.path.splitext(self.file.name)
-            if ext:
-                self.file_type = ext[1:].lower()
+        self.update_file_info()
 
-        # Update knowledge base document count
-        is_new = not self.pk
+        # Update knowledge base document count; pk is always set by the UUID default
+        is_new = self._state.adding
         super().save(*args, **kwargs)
 
         if is_new:
@@ -166,15 +192,46 @@ class Document(BaseModel, ProcessingStatusModel, MetadataModel, SoftDeleteModel)
         """Override delete to update knowledge base statistics."""
         kb = self.knowledge_base
         super().delete(*args, **kwargs)
+        self.sync_deleted_flag()
         kb.decrement_document_count()
 
-    def calculate_content_metrics(self):
-        """Calculate and update content metrics."""
+    def restore(self):
+        """Restore a soft deleted document and its chunks and embeddings."""
+        super().restore()
+        self.sync_deleted_flag()
+        self.knowledge_base.increment_document_count()
+
+    def sync_deleted_flag(self):
+        """Mirror is_deleted onto this document's chunks and embeddings."""
+        from apps.embeddings.models import DocumentEmbedding
+
+        for model_cls in (DocumentChunk, DocumentEmbedding):
+            model_cls.objects.filter(
+                knowledge_base_id=self.knowledge_base_id,
+                document_id=self.pk
+            ).exclude(is_deleted=self.is_deleted).update(is_deleted=self.is_deleted)
+
+    def update_file_info(self):
+        """Update file size and type from the attached file."""
+        # Only ask the storage backend for the size of new uploads; for
+        # remote storages every .size access is a request
+        if self.file and (not self.file._committed or not self.file_size):
+            self.file_size = self.file.size
+            # Extract file extension
+            _, ext = os.path.splitext(self.file.name)
+            if ext:
+                self.file_type = ext[1:].lower()
+
+    def calculate_content_metrics(self, tokenizer=None):
+        """
+        Calculate and update content metrics. Tokens are counted with the
+        tokenizer of the knowledge base's embedding model unless one is given.
+        """
         if self.content:
+            tokenizer = tokenizer or self.knowledge_base.get_tokenizer()
             self.char_count = len(self.content)
-            self.word_count = len(self.content.split())
-            # Simple token estimation (characters / 4)
-            self.token_count = max(1, self.char_count // 4)
+            self.word_count = count_words(self.content)
+            self.token_count = tokenizer.count([self.content])[0]
         else:
             self.char_count = 0
             self.word_count = 0
@@ -194,6 +251,44 @@ class Document(BaseModel, ProcessingStatusModel, MetadataModel, SoftDeleteModel)
         """Check if the document is text-based."""
         return self.file_type in ['txt', 'md']
 
+    def iter_chunks(self, chunk_size, chunk_overlap):
+        """
+        Yield (index, start, end, text) chunks of this document with the
+        knowledge base's chunking strategy. Streamed documents are re-read and
+        chunked from their file, others are split from content.
+        """
+        from apps.documents.chunking import iter_stream_chunker_chunks
+
+        chunker = self.knowledge_base.get_chunker(chunk_size, chunk_overlap)
+        if self.get_metadata('content_streamed'):
+            from apps.documents.extractors import get_extractor
+
+            with self.file.open('rb') as fileobj:
+                segments = get_extractor(self.file_type).iter_text(fileobj)
+                for index, (start, end, text) in enumerate(
+                    iter_stream_chunker_chunks(segments, chunker)
+                ):
+                    yield index, start, end, text
+            return
+
+        for index, chunk in enumerate(chunker.chunks(self.content or '')):
+            yield (index, *chunk)
+
+    def stream_chunks(self, batch_size=500):
+        """
+        Extract, chunk and store the attached file with bounded memory,
+        resuming an interrupted run.
+        """
+        from apps.documents.streaming import stream_document
+
+        return stream_document(self, batch_size=batch_size)
+
+    def rechunk(self, chunk_size=None, chunk_overlap=None):
+        """Re-chunk the content, keeping unchanged chunks and their embeddings."""
+        from apps.documents.rechunk import rechunk_document
+
+        return rechunk_document(self, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
     def can_extract_text(self):
         """Check if text can be extracted from this document type."""
         return self.file_type in ['pdf', 'docx', 'txt', 'md', 'png', 'jpg', 'jpeg']
@@ -209,6 +304,23 @@ class DocumentChunk(BaseModel, MetadataModel):
         related_name='chunks'
     )
 
+    # Denormalised from document so knowledge base scans need no join and
+    # docs_chunk can be partitioned by knowledge base (apps/core/partitioning.py)
+    knowledge_base = models.ForeignKey(
+        'knowledge_bases.KnowledgeBase',
+        on_delete=models.CASCADE,
+        related_name='chunks',
+        editable=False,
+        db_index=False
+    )
+
+    is_deleted = models.BooleanField(
+        _('Is deleted'),
+        default=False,
+        editable=False,
+        help_text=_('Mirror of the document soft delete flag')
+    )
+
     content = models.TextField(
         _('Content'),
         help_text=_('Text content of this chunk')
@@ -232,6 +344,13 @@ class DocumentChunk(BaseModel, MetadataModel):
         help_text=_('Ending character position in the original document')
     )
 
+    content_hash = models.CharField(
+        _('Content hash'),
+        max_length=64,
+        blank=True,
+        help_text=_('SHA-256 of the chunk content, used to detect changed chunks')
+    )
+
     # Content Metrics
     char_count = models.PositiveIntegerField(
         _('Character count'),
@@ -298,38 +417,85 @@ class DocumentChunk(BaseModel, MetadataModel):
         help_text=_('Extracted named entities from this chunk')
     )
 
+    # Full-text search
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('keywords', config=TEXT_SEARCH_CONFIG, weight='A')
+            + SearchVector('content', config=TEXT_SEARCH_CONFIG, weight='B')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+        verbose_name=_('Search vector')
+    )
+
     class Meta:
         verbose_name = _('Document Chunk')
         verbose_name_plural = _('Document Chunks')
         db_table = 'docs_chunk'
         ordering = ['document', 'chunk_index']
-        unique_together = ['document', 'chunk_index']
+        # Includes knowledge_base so the constraint is valid on a partitioned table
+        unique_together = ['knowledge_base', 'document', 'chunk_index']
         indexes = [
             models.Index(fields=['document', 'chunk_index']),
+            models.Index(
+                fields=['knowledge_base', 'is_embedded'],
+                condition=models.Q(is_deleted=False),
+                name='docs_chunk_kb_embedded_live'
+            ),
+            models.Index(
+                fields=['knowledge_base', 'quality_score'],
+                condition=models.Q(is_deleted=False),
+                name='docs_chunk_kb_quality_live'
+            ),
             models.Index(fields=['is_embedded']),
             models.Index(fields=['quality_score']),
+            models.Index(fields=['document', 'content_hash']),
+            GinIndex(
+                fields=['search_vector'],
+                condition=models.Q(is_deleted=False),
+                name='docs_chunk_search_gin'
+            ),
         ]
 
     def __str__(self):
         return f"{self.document.title} - Chunk {self.chunk_index}"
 
     def save(self, *args, **kwargs):
-        """Override save to calculate metrics."""
-        self.calculate_metrics()
+        """Override save to calculate metrics with the knowledge base's tokenizer."""
+        self.denormalize()
+        # Tokenizers are cached per embedding model, so this costs no load per save
+        self.calculate_metrics(tokenizer=self.knowledge_base.get_tokenizer())
         super().save(*args, **kwargs)
 
-    def calculate_metrics(self):
-        """Calculate content metrics for this chunk."""
+    def denormalize(self):
+        """Copy knowledge_base and is_deleted from the document."""
+        if self.knowledge_base_id is None:
+            self.knowledge_base_id = self.document.knowledge_base_id
+            self.is_deleted = self.document.is_deleted
+
+    def calculate_metrics(self, tokenizer=None):
+        """
+        Calculate content metrics for this chunk. save() and the batch paths
+        pass the knowledge base's tokenizer; without one the token count is
+        estimated.
+        """
+        self.content_hash = compute_content_hash(self.content or '')
         if self.content:
             self.char_count = len(self.content)
-            self.word_count = len(self.content.split())
-            # Simple token estimation
-            self.token_count = max(1, self.char_count // 4)
+            self.word_count = count_words(self.content)
+            if tokenizer is not None:
+                self.token_count = tokenizer.count([self.content])[0]
+            else:
+                self.token_count = estimate_tokens(self.char_count)
 
     def get_context_window(self, window_size=1):
-        """Get surrounding chunks for context."""
+        """
+        Get surrounding chunks for context. To expand many search results use
+        apps.knowledge_bases.context.expand_context(), which batches them.
+        """
         chunks = DocumentChunk.objects.filter(
-            document=self.document,
+            knowledge_base_id=self.knowledge_base_id,
+            document_id=self.document_id,
             chunk_index__range=(
                 max(0, self.chunk_index - window_size),
                 self.chunk_index + window_size
@@ -347,7 +513,7 @@ class DocumentChunk(BaseModel, MetadataModel):
 
 class DocumentProcessingTask(BaseModel, ProcessingStatusModel):
     """
-    Track document processing tasks.
+    Track document processing tasks, queued and leased by apps/documents/queue.py.
     """
     document = models.ForeignKey(
         Document,
@@ -372,7 +538,51 @@ class DocumentProcessingTask(BaseModel, ProcessingStatusModel):
         _('Task ID'),
         max_length=255,
         blank=True,
-        help_text=_('Celery task ID for tracking')
+        help_text=_('Worker holding (or that last held) the task lease')
+    )
+
+    # Queue
+    priority = models.SmallIntegerField(
+        _('Priority'),
+        default=0,
+        help_text=_('Higher priorities are claimed first')
+    )
+
+    parameters = models.JSONField(
+        _('Parameters'),
+        default=dict,
+        blank=True,
+        help_text=_("Handler arguments; 'next' lists task types queued on completion")
+    )
+
+    attempts = models.PositiveSmallIntegerField(
+        _('Attempts'),
+        default=0,
+        help_text=_('Number of times the task was claimed')
+    )
+
+    max_attempts = models.PositiveSmallIntegerField(
+        _('Max attempts'),
+        default=5
+    )
+
+    run_after = models.DateTimeField(
+        _('Run after'),
+        default=timezone.now,
+        help_text=_('Earliest time the task may be claimed (retry backoff)')
+    )
+
+    lease_expires_at = models.DateTimeField(
+        _('Lease expires at'),
+        null=True,
+        blank=True,
+        help_text=_('Other workers may reclaim the task after this time')
+    )
+
+    heartbeat_at = models.DateTimeField(
+        _('Heartbeat at'),
+        null=True,
+        blank=True
     )
 
     progress = models.FloatField(
@@ -395,6 +605,8 @@ class DocumentProcessingTask(BaseModel, ProcessingStatusModel):
         help_text=_('Detailed error information if task failed')
     )
 
+    progress_fields = ('task_type', 'progress', 'attempts', 'result')
+
     class Meta:
         verbose_name = _('Document Processing Task')
         verbose_name_plural = _('Document Processing Tasks')
@@ -404,6 +616,17 @@ class DocumentProcessingTask(BaseModel, ProcessingStatusModel):
             models.Index(fields=['document', 'task_type']),
             models.Index(fields=['status']),
             models.Index(fields=['task_id']),
+            # Claim order of ready tasks, and running tasks for limits and lease expiry
+            models.Index(
+                fields=['task_type', '-priority', 'run_after'],
+                condition=models.Q(status='pending'),
+                name='docs_task_ready'
+            ),
+            models.Index(
+                fields=['task_type', 'lease_expires_at'],
+                condition=models.Q(status='processing'),
+                name='docs_task_leased'
+            ),
         ]
 
     def __str__(self):
@@ -0,0 +1,277 @@
+"""
+In-process scheduler running document processing stages as a dependency graph.
+
+    extract_text -> chunk_text -> generate_embeddings
+                               -> quality_assessment
+                               -> extract_entities    (no handler yet)
+                               -> generate_summary    (no handler yet)
+
+Every stage has its own worker threads and a bounded input queue, so stages
+overlap across documents: while one document is being embedded the next ones
+are already being extracted. A full queue blocks the stage feeding it, which
+keeps CPU-bound extraction from running arbitrarily far ahead of I/O-bound
+embedding (backpressure) while both stay busy. Concurrent embedding workers
+are coalesced into provider batches by the embedding service
+(apps/embeddings/clients.py).
+
+    python manage.py shell -c "from apps.documents.pipeline import run_pipeline; run_pipeline(documents)"
+
+Once a document is chunked, embedding and quality assessment run in parallel
+branches: I/O-bound embedding and CPU-bound scoring of chunks overlap.
+
+Stages reuse the queue handlers (TASK_QUEUE_CONFIG['handlers']) and record a
+DocumentProcessingTask per document and stage. Stages without a handler are
+left out and their dependents wait on the stages before them instead; entity
+extraction and summaries are in the graph but deferred until they have
+handlers. When a
+stage fails for a document, the stages depending on it are cancelled for that
+document only.
+"""
+import logging
+import queue
+import threading
+from graphlib import TopologicalSorter
+from django.db import connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Stage -> stages it depends on
+PIPELINE_STAGES = {
+    'extract_text': (),
+    'chunk_text': ('extract_text',),
+    'generate_embeddings': ('chunk_text',),
+    'extract_entities': ('chunk_text',),
+    'generate_summary': ('chunk_text',),
+    'quality_assessment': ('chunk_text',),
+}
+
+DEFAULT_PIPELINE_CONFIG = {
+    'stages': PIPELINE_STAGES,
+    'workers': {},
+    'default_workers': 1,
+    'queue_size': 8,
+}
+
+_DONE = object()
+
+
+def get_pipeline_config():
+    from django.conf import settings
+
+    return {**DEFAULT_PIPELINE_CONFIG, **getattr(settings, 'DOCUMENT_PIPELINE_CONFIG', {})}
+
+
+def resolve_stages(stages, available):
+    """
+    Restrict a stage graph to the available stages, making each one depend on
+    the nearest available stages upstream of it. Raises on cycles.
+    """
+    order = list(TopologicalSorter(stages).static_order())
+    unknown = set(order) - set(stages)
+    if unknown:
+        raise ValueError(f"Unknown pipeline stages: {', '.join(sorted(unknown))}")
+
+    upstream = {}
+    for stage in order:
+        resolved = set()
+        for dependency in stages[stage]:
+            if dependency in available:
+                resolved.add(dependency)
+            else:
+                resolved |= upstream[dependency]
+        upstream[stage] = resolved
+    return {stage: tuple(sorted(upstream[stage])) for stage in order if stage in available}
+
+
+class Stage:
+    """A pipeline stage: a handler, its worker threads and its bounded input queue."""
+
+    def __init__(self, name, handler, dependencies, workers, queue_size):
+        self.name = name
+        self.handler = handler
+        self.dependencies = dependencies
+        self.dependents = []
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.running = workers
+        self.processed = 0
+        self.failed = 0
+
+
+class PipelineScheduler:
+    """
+    Push documents through the stage graph; run() returns per-stage counts.
+    """
+
+    def __init__(self, config=None, handlers=None):
+        from apps.documents.queue import get_queue_config
+
+        self.config = config or get_pipeline_config()
+        handlers = handlers or {
+            name: import_string(path) for name, path in get_queue_config()['handlers'].items()
+        }
+        graph = resolve_stages(self.config['stages'], set(handlers))
+        if not graph:
+            raise ValueError('No pipeline stage has a handler')
+
+        self.stages = {
+            name: Stage(
+                name,
+                handlers[name],
+                dependencies,
+                self.config['workers'].get(name, self.config['default_workers']),
+                self.config['queue_size']
+            )
+            for name, dependencies in graph.items()
+        }
+        for stage in self.stages.values():
+            for dependency in stage.dependencies:
+                self.stages[dependency].dependents.append(stage)
+        self.roots = [stage for stage in self.stages.values() if not stage.dependencies]
+
+        self._lock = threading.Lock()
+        # (document pk, stage) -> dependencies that have not finished yet
+        self._waiting = {}
+        self._cancelled = set()
+
+    def _ready(self, document, finished, stage):
+        """Record a finished dependency; True once all of a stage's dependencies finished."""
+        with self._lock:
+            if (document.pk, stage.name) in self._cancelled:
+                return False
+            remaining = self._waiting.setdefault(
+                (document.pk, stage.name), set(stage.dependencies)
+            )
+            remaining.discard(finished.name)
+            if remaining:
+                return False
+            del self._waiting[(document.pk, stage.name)]
+            return True
+
+    def _cancel(self, document, stage, reason):
+        """Cancel a stage and everything downstream of it for one document."""
+        from apps.core.models import StatusChoices
+        from apps.documents.models import DocumentProcessingTask
+
+        pending = [stage]
+        cancelled = set()
+        with self._lock:
+            while pending:
+                current = pending.pop()
+                key = (document.pk, current.name)
+                if key in self._cancelled:
+                    continue
+                self._cancelled.add(key)
+                self._waiting.pop(key, None)
+                cancelled.add(current.name)
+                pending.extend(current.dependents)
+        DocumentProcessingTask.objects.bulk_create([
+            DocumentProcessingTask(
+                document=document,
+                task_type=name,
+                status=StatusChoices.CANCELLED,
+                status_message=reason
+            )
+            for name in sorted(cancelled)
+        ])
+
+    def run_stage(self, stage, document):
+        """Run one stage for one document, tracked as a DocumentProcessingTask."""
+        from django.utils import timezone
+        from apps.core.models import StatusChoices
+        from apps.documents.models import DocumentProcessingTask
+
+        task = DocumentProcessingTask.objects.create(
+            document=document,
+            task_type=stage.name,
+            status=StatusChoices.PROCESSING,
+            attempts=1,
+            task_id=threading.current_thread().name,
+            processing_started_at=timezone.now()
+        )
+        try:
+            result = stage.handler(task)
+        except Exception as exc:
+            task.status = StatusChoices.FAILED
+            task.error_details = f"{type(exc).__name__}: {exc}"
+            task.save(update_fields=['status', 'error_details'])
+            raise
+        task.status = StatusChoices.COMPLETED
+        task.progress = 1.0
+        task.result = result or {}
+        task.processing_completed_at = timezone.now()
+        task.save(update_fields=['status', 'progress', 'result', 'processing_completed_at'])
+
+    def _worker(self, stage):
+        try:
+            while True:
+                document = stage.queue.get()
+                if document is _DONE:
+                    break
+                try:
+                    self.run_stage(stage, document)
+                except Exception as exc:
+                    logger.exception("Stage %s failed for document %s", stage.name, document.pk)
+                    with self._lock:
+                        stage.failed += 1
+                    for dependent in stage.dependents:
+                        self._cancel(document, dependent, f"{stage.name} failed: {exc}")
+                    continue
+                with self._lock:
+                    stage.processed += 1
+                for dependent in stage.dependents:
+                    if self._ready(document, stage, dependent):
+                        # Blocks while the dependent stage is saturated
+                        dependent.queue.put(document)
+        finally:
+            connections.close_all()
+            self._worker_exited(stage)
+
+    def _worker_exited(self, stage):
+        """Close downstream stages once every stage they depend on has drained."""
+        with self._lock:
+            stage.running -= 1
+            closing = [
+                dependent for dependent in stage.dependents
+                if stage.running == 0
+                and all(self.stages[name].running == 0 for name in dependent.dependencies)
+            ]
+        for dependent in closing:
+            for _ in range(dependent.workers):
+                dependent.queue.put(_DONE)
+
+    def run(self, documents):
+        """Process an iterable of documents through every stage and wait for completion."""
+        threads = [
+            threading.Thread(
+                target=self._worker, args=(stage,), name=f"{stage.name}-{index}", daemon=True
+            )
+            for stage in self.stages.values()
+            for index in range(stage.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for document in documents:
+                for stage in self.roots:
+                    stage.queue.put(document)
+        finally:
+            for stage in self.roots:
+                for _ in range(stage.workers):
+                    stage.queue.put(_DONE)
+            for thread in threads:
+                thread.join()
+
+        return {
+            stage.name: {'processed': stage.processed, 'failed': stage.failed}
+            for stage in self.stages.values()
+        }
+
+
+def run_pipeline(documents, **kwargs):
+    """Run the processing pipeline over documents (a queryset or iterable)."""
+    if hasattr(documents, 'iterator'):
+        documents = documents.iterator(chunk_size=100)
+    return PipelineScheduler(**kwargs).run(documents)
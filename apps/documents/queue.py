@@ -0,0 +1,333 @@
+"""
+Database-backed queue for DocumentProcessingTask.
+
+Tasks are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of
+worker processes share the queue without a broker:
+
+    python manage.py shell -c "from apps.documents.queue import run_workers; run_workers(4)"
+
+* priorities -- higher ``priority`` first, then oldest ``run_after``;
+* per-type concurrency -- TASK_QUEUE_CONFIG['concurrency'] caps the running
+  tasks of a type across all workers (checked under a transaction-level
+  advisory lock per type);
+* leases -- a claimed task is leased for ``lease_seconds`` and a heartbeat
+  thread extends the lease while the handler runs. Tasks whose lease expired
+  (crashed worker) are claimed again;
+* retries -- a failed task is rescheduled with exponential backoff and full
+  jitter until ``max_attempts``, then marked failed.
+
+Handlers are looked up in TASK_QUEUE_CONFIG['handlers'] by task type;
+``enqueue()`` rejects types without a handler (including those listed in
+``parameters['next']``), since no worker would ever claim them. A handler
+takes the task and returns its result dict. ``parameters['next']`` lists task types enqueued for the same
+document once the task completes.
+"""
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import zlib
+from datetime import timedelta
+from django.db import connection, connections, models, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from apps.core.progress import flush_progress, publish_progress
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_CONFIG = {
+    'handlers': {},
+    'concurrency': {},
+    'lease_seconds': 300,
+    'heartbeat_interval': 30,
+    'poll_interval': 1.0,
+    'backoff_base': 5.0,
+    'backoff_max': 600.0,
+    'max_attempts': 5,
+}
+
+
+def get_queue_config():
+    from django.conf import settings
+
+    return {**DEFAULT_QUEUE_CONFIG, **getattr(settings, 'TASK_QUEUE_CONFIG', {})}
+
+
+def enqueue(document, task_type, priority=0, parameters=None, run_after=None, max_attempts=None):
+    """Queue a processing task for a document."""
+    config = get_queue_config()
+    parameters = parameters or {}
+    unhandled = {task_type, *parameters.get('next', [])} - set(config['handlers'])
+    if unhandled:
+        raise ValueError(f"No handler for task types: {', '.join(sorted(unhandled))}")
+
+    from apps.documents.models import DocumentProcessingTask
+
+    return DocumentProcessingTask.objects.create(
+        document=document,
+        task_type=task_type,
+        priority=priority,
+        parameters=parameters,
+        run_after=run_after or timezone.now(),
+        max_attempts=max_attempts or config['max_attempts']
+    )
+
+
+def backoff_delay(attempts, config):
+    """Full jitter: a random delay up to the exponential bound for this attempt."""
+    bound = min(config['backoff_max'], config['backoff_base'] * 2 ** max(0, attempts - 1))
+    return random.uniform(0, bound)
+
+
+def _advisory_key(task_type):
+    return zlib.crc32(f"docs_processing_task:{task_type}".encode('utf-8'))
+
+
+class Worker:
+    """
+    Claims and runs tasks one at a time until stopped.
+    """
+
+    def __init__(self, task_types=None, worker_id=None, config=None):
+        self.config = config or get_queue_config()
+        self.handlers = {
+            task_type: import_string(path) for task_type, path in self.config['handlers'].items()
+            if task_types is None or task_type in task_types
+        }
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease = timedelta(seconds=self.config['lease_seconds'])
+        self.stop_event = threading.Event()
+
+    def claimable_types(self, now):
+        """Task types with a handler whose concurrency limit is not reached."""
+        from apps.core.models import StatusChoices
+        from apps.documents.models import DocumentProcessingTask
+
+        types = []
+        for task_type in self.handlers:
+            limit = self.config['concurrency'].get(task_type)
+            if limit is None:
+                types.append(task_type)
+                continue
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_try_advisory_xact_lock(%s)', [_advisory_key(task_type)])
+                    if not cursor.fetchone()[0]:
+                        # Another worker is claiming this type right now
+                        continue
+            running = DocumentProcessingTask.objects.filter(
+                task_type=task_type,
+                status=StatusChoices.PROCESSING,
+                lease_expires_at__gte=now
+            ).count()
+            if running < limit:
+                types.append(task_type)
+        return types
+
+    def claim(self):
+        """Lease the next ready task, or return None."""
+        from apps.core.models import StatusChoices
+        from apps.documents.models import DocumentProcessingTask
+
+        while True:
+            with transaction.atomic():
+                now = timezone.now()
+                types = self.claimable_types(now)
+                if not types:
+                    return None
+                task = DocumentProcessingTask.objects.select_for_update(skip_locked=True).filter(
+                    models.Q(status=StatusChoices.PENDING, run_after__lte=now)
+                    | models.Q(status=StatusChoices.PROCESSING, lease_expires_at__lt=now),
+                    task_type__in=types
+                ).order_by('-priority', 'run_after').first()
+                if task is None:
+                    return None
+
+                if task.status == StatusChoices.PROCESSING and task.attempts >= task.max_attempts:
+                    # Its worker died on the last attempt
+                    task.status = StatusChoices.FAILED
+                    task.status_message = 'Lease expired'
+                    task.lease_expires_at = None
+                    task.save(update_fields=['status', 'status_message', 'lease_expires_at'])
+                    continue
+
+                task.status = StatusChoices.PROCESSING
+                task.status_message = ''
+                task.attempts += 1
+                task.task_id = self.worker_id
+                task.processing_started_at = now
+                task.heartbeat_at = now
+                task.lease_expires_at = now + self.lease
+                task.save(update_fields=[
+                    'status', 'status_message', 'attempts', 'task_id',
+                    'processing_started_at', 'heartbeat_at', 'lease_expires_at'
+                ])
+                return task
+
+    def _owned(self, task):
+        from apps.core.models import StatusChoices
+        from apps.documents.models import DocumentProcessingTask
+
+        return DocumentProcessingTask.objects.filter(
+            pk=task.pk, task_id=self.worker_id, attempts=task.attempts,
+            status=StatusChoices.PROCESSING
+        )
+
+    def heartbeat(self, task):
+        """Extend the lease; False when another worker took the task over."""
+        now = timezone.now()
+        return self._owned(task).update(
+            heartbeat_at=now, lease_expires_at=now + self.lease
+        ) == 1
+
+    def _finish(self, task, **fields):
+        """Apply a final state to a task still owned by this worker and publish it."""
+        flush_progress(task, publish=False)
+        updated = self._owned(task).update(lease_expires_at=None, **fields)
+        if updated:
+            for field, value in fields.items():
+                setattr(task, field, value)
+            publish_progress(task)
+        return updated == 1
+
+    def complete(self, task, result):
+        from apps.core.models import StatusChoices
+
+        with transaction.atomic():
+            updated = self._finish(
+                task,
+                status=StatusChoices.COMPLETED,
+                processing_completed_at=timezone.now(),
+                progress=1.0,
+                result=result or {}
+            )
+            following = task.parameters.get('next', [])
+            if updated and following:
+                enqueue(
+                    task.document,
+                    following[0],
+                    priority=task.priority,
+                    parameters={**task.parameters, 'next': following[1:]}
+                )
+        return updated
+
+    def fail(self, task, exc):
+        from apps.core.models import StatusChoices
+
+        details = f"{type(exc).__name__}: {exc}"
+        if task.attempts < task.max_attempts:
+            delay = backoff_delay(task.attempts, self.config)
+            return self._finish(
+                task,
+                status=StatusChoices.PENDING,
+                status_message=f"Attempt {task.attempts} failed, retrying in {delay:.0f}s",
+                error_details=details,
+                run_after=timezone.now() + timedelta(seconds=delay)
+            )
+        return self._finish(
+            task,
+            status=StatusChoices.FAILED,
+            status_message=f"Failed after {task.attempts} attempts",
+            error_details=details
+        )
+
+    def _heartbeat_loop(self, task, done):
+        try:
+            while not done.wait(self.config['heartbeat_interval']):
+                if not self.heartbeat(task):
+                    logger.warning("Lost the lease of task %s", task.pk)
+                    return
+        finally:
+            connections.close_all()
+
+    def execute(self, task):
+        """Run a claimed task's handler while heartbeating its lease."""
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat_loop, args=(task, done), name=f"heartbeat-{task.pk}", daemon=True
+        )
+        heartbeat.start()
+        try:
+            result = self.handlers[task.task_type](task)
+        except Exception as exc:
+            logger.exception("Task %s (%s) failed", task.pk, task.task_type)
+            done.set()
+            heartbeat.join()
+            self.fail(task, exc)
+            return False
+        done.set()
+        heartbeat.join()
+        return self.complete(task, result)
+
+    def run_once(self):
+        """Claim and run one task; False when none was ready."""
+        task = self.claim()
+        if task is None:
+            return False
+        self.execute(task)
+        return True
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+    def run(self):
+        """Process tasks until stop() or SIGTERM."""
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+        logger.info("Worker %s processing %s", self.worker_id, ', '.join(self.handlers))
+        while not self.stop_event.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception:
+                logger.exception("Worker %s failed to claim a task", self.worker_id)
+                connections.close_all()
+            # Idle: poll again with jitter so workers do not query in lockstep
+            self.stop_event.wait(self.config['poll_interval'] * random.uniform(0.5, 1.5))
+
+
+def _worker_process(task_types):
+    import django
+
+    django.setup()
+    Worker(task_types=task_types).run()
+
+
+def run_workers(processes=None, task_types=None):
+    """
+    Run a pool of worker processes until SIGTERM/SIGINT, restarting any that
+    exit unexpectedly.
+    """
+    import multiprocessing
+
+    context = multiprocessing.get_context('spawn')
+    processes = processes or os.cpu_count() or 1
+    stopping = threading.Event()
+
+    def start():
+        process = context.Process(target=_worker_process, args=(task_types,), daemon=False)
+        process.start()
+        return process
+
+    def stop(*args):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    connections.close_all()
+    pool = [start() for _ in range(processes)]
+    while not stopping.is_set():
+        for index, process in enumerate(pool):
+            if not process.is_alive():
+                logger.warning("Worker process %s exited with %s, restarting", process.pid, process.exitcode)
+                pool[index] = start()
+        stopping.wait(1.0)
+
+    for process in pool:
+        process.terminate()
+    for process in pool:
+        process.join()
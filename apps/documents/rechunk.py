@@ -0,0 +1,155 @@
+"""
+Incremental re-chunking of documents.
+
+New chunks are matched to existing ones by content hash. Matching chunks keep
+their rows and their vectors (renumbered if their index moved); only chunks
+whose text actually changed are created with ``is_embedded=False`` for the
+embedding pipeline to pick up. Vectors are deleted and renumbered through the
+knowledge base's vector store, so external stores stay keyed like the chunks.
+
+The savings depend on chunk boundaries surviving an edit. Sentence and
+recursive chunks are cut at the text's own separators, so an edit only changes
+the chunks around it. Fixed and token windows are cut at absolute offsets: an
+insertion or deletion shifts every later window, and nearly all of them are
+re-created and re-embedded.
+"""
+from collections import Counter, defaultdict
+from django.db import models, transaction
+
+# Indexes are parked above this offset while being renumbered, so rows can
+# swap positions without violating the (document, chunk_index) unique constraints
+INDEX_OFFSET = 1_000_000_000
+
+
+def backfill_content_hashes(document):
+    """Compute hashes for chunks stored before content_hash existed."""
+    from apps.documents.models import DocumentChunk, compute_content_hash
+
+    legacy = list(document.chunks.filter(content_hash='').only('id', 'content'))
+    for chunk in legacy:
+        chunk.content_hash = compute_content_hash(chunk.content)
+    DocumentChunk.objects.bulk_update(legacy, ['content_hash'], batch_size=1000)
+
+
+def plan_rechunk(existing, new_chunks):
+    """
+    Match new (index, start, end, hash) tuples against existing chunks.
+    Returns (reused [(chunk, new tuple)], created [new tuple], deleted [chunk]).
+    Among equal hashes the chunk already at the same index is preferred.
+    """
+    by_hash = defaultdict(dict)
+    for chunk in existing:
+        by_hash[chunk.content_hash][chunk.chunk_index] = chunk
+
+    reused, created = [], []
+    for new in new_chunks:
+        index, _, _, content_hash = new
+        candidates = by_hash.get(content_hash)
+        if not candidates:
+            created.append(new)
+            continue
+        old_index = index if index in candidates else next(iter(candidates))
+        reused.append((candidates.pop(old_index), new))
+
+    deleted = [chunk for candidates in by_hash.values() for chunk in candidates.values()]
+    return reused, created, deleted
+
+
+def renumber(queryset, mapping):
+    """Move rows from old to new chunk_index in two UPDATEs via INDEX_OFFSET."""
+    if not mapping:
+        return
+    queryset.filter(chunk_index__in=list(mapping)).update(
+        chunk_index=models.F('chunk_index') + INDEX_OFFSET
+    )
+    queryset.filter(chunk_index__gte=INDEX_OFFSET).update(
+        chunk_index=models.Case(
+            *[models.When(chunk_index=old + INDEX_OFFSET, then=models.Value(new))
+              for old, new in mapping.items()],
+            output_field=models.PositiveIntegerField()
+        )
+    )
+
+
+def rechunk_document(document, chunk_size=None, chunk_overlap=None):
+    """
+    Re-chunk ``document.content`` and reconcile it with the stored chunks.
+    Returns counts of reused, moved, created and deleted chunks.
+    """
+    from apps.documents.ingest import copy_chunks
+    from apps.documents.models import DocumentChunk, compute_content_hash
+    knowledge_base = document.knowledge_base
+    chunk_size = chunk_size or knowledge_base.chunk_size
+    chunk_overlap = knowledge_base.chunk_overlap if chunk_overlap is None else chunk_overlap
+
+    with transaction.atomic():
+        backfill_content_hashes(document)
+        existing = list(document.chunks.only(
+            'id', 'document_id', 'chunk_index', 'start_char', 'end_char',
+            'content_hash', 'token_count'
+        ))
+        available = Counter(chunk.content_hash for chunk in existing)
+
+        # Only the text of chunks that have to be created is kept in memory
+        new_chunks, texts = [], {}
+        for index, start, end, text in document.iter_chunks(chunk_size, chunk_overlap):
+            content_hash = compute_content_hash(text)
+            new_chunks.append((index, start, end, content_hash))
+            if available[content_hash]:
+                available[content_hash] -= 1
+            else:
+                texts[index] = text
+
+        reused, created, deleted = plan_rechunk(existing, new_chunks)
+
+        store = knowledge_base.get_vector_store()
+        DocumentChunk.objects.filter(pk__in=[chunk.pk for chunk in deleted]).delete()
+        store.delete_chunks(document.pk, [chunk.chunk_index for chunk in deleted])
+
+        moves = {
+            chunk.chunk_index: new[0] for chunk, new in reused if chunk.chunk_index != new[0]
+        }
+        renumber(document.chunks.all(), moves)
+
+        changed, moved = [], []
+        for chunk, (index, start, end, _) in reused:
+            if chunk.chunk_index in moves:
+                moved.append((chunk.chunk_index, chunk))
+            if (chunk.chunk_index, chunk.start_char, chunk.end_char) != (index, start, end):
+                chunk.chunk_index, chunk.start_char, chunk.end_char = index, start, end
+                changed.append(chunk)
+        DocumentChunk.objects.bulk_update(changed, ['start_char', 'end_char'], batch_size=1000)
+        store.move_chunks(moved)
+
+        # Vectors left at the indexes of new chunks belong to text that is gone
+        store.delete_chunks(document.pk, [new[0] for new in created])
+        new_rows = copy_chunks([
+            DocumentChunk(
+                document=document,
+                chunk_index=index,
+                start_char=start,
+                end_char=end,
+                content=texts[index]
+            )
+            for index, start, end, _ in created
+        ], tokenizer=knowledge_base.get_tokenizer())
+
+        token_delta = (
+            sum(chunk.token_count for chunk in new_rows)
+            - sum(chunk.token_count for chunk in deleted)
+        )
+        document.chunk_count = len(new_chunks)
+        document.save(update_fields=['chunk_count'])
+        knowledge_base.add_to_statistics(
+            chunks=len(created) - len(deleted),
+            tokens=token_delta
+        )
+        if moves or created or deleted:
+            knowledge_base.bump_content_version()
+
+    return {
+        'reused': len(reused),
+        'moved': len(moves),
+        'created': len(created),
+        'deleted': len(deleted),
+    }
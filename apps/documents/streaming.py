@@ -0,0 +1,124 @@
+"""
+Streaming ingestion: extract, chunk and persist a document without holding its
+full text in memory.
+"""
+from django.db import transaction
+from apps.documents.chunking import iter_stream_chunker_chunks
+from apps.documents.extractors import get_extractor
+from apps.documents.metrics import count_words
+
+
+class TextStats:
+    """
+    Running character, word and token counts over a stream of segments. A
+    word split across two segments is counted once.
+    """
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.char_count = 0
+        self.word_count = 0
+        self.token_count = 0
+        self._ends_in_word = False
+
+    def update(self, segment):
+        if not segment:
+            return
+        self.char_count += len(segment)
+        self.word_count += count_words(segment)
+        self.token_count += self.tokenizer.count([segment])[0]
+        if self._ends_in_word and not segment[0].isspace():
+            self.word_count -= 1
+        self._ends_in_word = not segment[-1].isspace()
+
+    def track(self, segments):
+        """Pass segments through while counting them."""
+        for segment in segments:
+            self.update(segment)
+            yield segment
+
+
+def _commit_batch(document, batch, tokenizer, progress):
+    """COPY one batch of chunks and record it as committed, in one transaction."""
+    from apps.documents.ingest import copy_chunks
+
+    with transaction.atomic():
+        copy_chunks(batch, tokenizer=tokenizer)
+        tokens = sum(chunk.token_count for chunk in batch)
+        progress['chunk_index'] = batch[-1].chunk_index
+        progress['chunks'] += len(batch)
+        progress['tokens'] += tokens
+        document.set_metadata('stream_progress', dict(progress))
+        document.save(update_fields=['metadata'])
+        document.knowledge_base.add_to_statistics(chunks=len(batch), tokens=tokens)
+
+
+def stream_document(document, batch_size=500, chunk_size=None, chunk_overlap=None):
+    """
+    Extract a document's file, chunk it on the fly and COPY the chunks in
+    batches of batch_size as they are produced.
+
+    Every batch is committed on its own together with
+    ``metadata['stream_progress']`` (the last committed chunk_index and
+    running totals), so no transaction stays open for the whole file and a
+    crash only loses the current batch. Running again resumes: the file is
+    re-read (chunking is deterministic), committed chunks are skipped and
+    only document-level counts are recomputed.
+
+    ``Document.content`` is left empty and ``metadata['content_streamed']`` is
+    set once every chunk is stored; later re-chunking reads the file again
+    instead of the content field.
+    """
+    from apps.documents.models import DocumentChunk
+
+    progress = document.get_metadata('stream_progress')
+    if progress is None:
+        if document.chunks.exists():
+            raise ValueError(f"Document {document.pk} already has chunks, use Document.rechunk()")
+        progress = {'chunk_index': -1, 'chunks': 0, 'tokens': 0}
+
+    knowledge_base = document.knowledge_base
+    chunk_size = chunk_size or knowledge_base.chunk_size
+    chunk_overlap = knowledge_base.chunk_overlap if chunk_overlap is None else chunk_overlap
+
+    tokenizer = knowledge_base.get_tokenizer()
+    stats = TextStats(tokenizer)
+    extractor = get_extractor(document.file_type)
+
+    with document.file.open('rb') as fileobj:
+        batch = []
+        chunks = iter_stream_chunker_chunks(
+            stats.track(extractor.iter_text(fileobj)),
+            knowledge_base.get_chunker(chunk_size, chunk_overlap)
+        )
+        for index, (start, end, text) in enumerate(chunks):
+            if index <= progress['chunk_index']:
+                continue
+            batch.append(DocumentChunk(
+                document=document,
+                chunk_index=index,
+                start_char=start,
+                end_char=end,
+                content=text
+            ))
+            if len(batch) >= batch_size:
+                _commit_batch(document, batch, tokenizer, progress)
+                batch = []
+        if batch:
+            _commit_batch(document, batch, tokenizer, progress)
+
+    document.char_count = stats.char_count
+    document.word_count = stats.word_count
+    document.token_count = stats.token_count
+    document.chunk_count = progress['chunks']
+    document.set_metadata('content_streamed', True)
+    document.metadata.pop('stream_progress', None)
+    document.save(update_fields=[
+        'char_count', 'word_count', 'token_count', 'chunk_count', 'metadata'
+    ])
+
+    return {
+        'chunks': progress['chunks'],
+        'characters': stats.char_count,
+        'tokens': progress['tokens'],
+    }
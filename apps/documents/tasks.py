@@ -0,0 +1,102 @@
+"""
+Handlers run by the processing queue (apps/documents/queue.py), registered in
+TASK_QUEUE_CONFIG['handlers']. Each takes a DocumentProcessingTask and returns
+its result dict.
+"""
+
+
+def extract_text(task):
+    """Extract, chunk and store the document's file with bounded memory."""
+    document = task.document
+    document.mark_processing()
+    try:
+        document.stream_chunks(batch_size=task.parameters.get('batch_size', 500))
+    except Exception as exc:
+        document.mark_failed(str(exc))
+        raise
+    document.mark_completed()
+    return {
+        'chunk_count': document.chunks.count(),
+        'token_count': document.token_count,
+    }
+
+
+def chunk_text(task):
+    """
+    Re-chunk the document's content, keeping unchanged chunks and their
+    embeddings. extract_text already chunks while it streams, so a chunked
+    document is only re-chunked when chunk parameters are given.
+    """
+    parameters = task.parameters
+    if ('chunk_size' not in parameters and 'chunk_overlap' not in parameters
+            and task.document.chunks.exists()):
+        return {'chunk_count': task.document.chunk_count, 'rechunked': False}
+    return task.document.rechunk(
+        chunk_size=parameters.get('chunk_size'),
+        chunk_overlap=parameters.get('chunk_overlap')
+    ) or {}
+
+
+def quality_assessment(task, batch_size=1000):
+    """
+    Score every chunk of the document with compute_quality_scores() and set
+    the document's quality_score to their mean. Runs alongside embedding.
+    """
+    from apps.documents.metrics import compute_quality_scores
+    from apps.documents.models import DocumentChunk
+
+    document = task.document
+    target_chars = document.knowledge_base.chunk_size
+    if document.knowledge_base.chunking_strategy == 'token':
+        # Token budgets: about four characters per token
+        target_chars *= 4
+
+    total = count = 0
+    chunks = document.chunks.filter(is_deleted=False).only('id', 'content').order_by('pk')
+    last_pk = None
+    while True:
+        page = chunks if last_pk is None else chunks.filter(pk__gt=last_pk)
+        batch = list(page[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        scores = compute_quality_scores([chunk.content or '' for chunk in batch], target_chars)
+        for chunk, score in zip(batch, scores):
+            chunk.quality_score = float(score)
+        DocumentChunk.objects.bulk_update(batch, ['quality_score'], batch_size=batch_size)
+        total += float(scores.sum())
+        count += len(batch)
+
+    document.quality_score = total / count if count else 0.0
+    document.save(update_fields=['quality_score'])
+    return {'chunk_count': count, 'quality_score': document.quality_score}
+
+
+def generate_embeddings(task):
+    """Run the task's EmbeddingJob, or a new one for the document's knowledge base model."""
+    from apps.core.models import StatusChoices
+    from apps.embeddings.models import EmbeddingJob
+
+    if task.parameters.get('job_id'):
+        job = EmbeddingJob.objects.get(pk=task.parameters['job_id'])
+        # A retry finds the job as the failed attempt left it; chunks embedded
+        # by that attempt are not embedded again
+        if task.attempts > 1 and job.status != StatusChoices.PENDING:
+            job.reset(f"Retry {task.attempts} of {task.max_attempts}")
+    else:
+        knowledge_base = task.document.knowledge_base
+        job = EmbeddingJob.objects.create(
+            job_type='document',
+            embedding_model=knowledge_base.get_embedding_model(),
+            parameters={
+                'knowledge_base_id': str(knowledge_base.pk),
+                'document_ids': [str(task.document_id)],
+            }
+        )
+    job.run()
+    job.refresh_from_db()
+    return {
+        'job_id': str(job.pk),
+        'processed_items': job.processed_items,
+        'failed_items': job.failed_items,
+    }
@@ -0,0 +1,260 @@
+"""
+Query embedding cache.
+
+Lookups go through three layers, fastest first:
+
+1. a per-process LRU dictionary,
+2. the shared Django cache (Redis when REDIS_URL is set, LocMemCache otherwise),
+3. the QueryEmbedding table.
+
+A hit in a lower layer is promoted into the layers above it. Hits are counted
+in memory and written to QueryEmbedding.hit_count in grouped UPDATEs every
+``flush_interval`` seconds, so a repeated query costs neither an embedding call
+nor a database write. Callers that must not touch the database (searches
+served from memory-mapped snapshots) pass ``use_database=False`` to use the
+first two layers only. Errors of the shared cache are logged and treated as
+misses, so a Redis outage falls through to the database or the provider.
+"""
+import atexit
+import hashlib
+import logging
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict
+from datetime import timedelta
+from django.db import models
+
+logger = logging.getLogger(__name__)
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def normalize_query(text):
+    """Collapse whitespace so trivially different spellings share a cache entry."""
+    return ' '.join(text.split())
+
+
+def make_query_hash(embedding_model, text):
+    """Hash a query for one embedding model; vectors differ between models."""
+    key = f"{embedding_model.pk}:{normalize_query(text)}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def pack_vector(vector):
+    """Serialize a vector as float32 bytes for the shared cache."""
+    return array('f', vector).tobytes()
+
+
+def unpack_vector(data):
+    """Deserialize a vector written by pack_vector."""
+    vector = array('f')
+    vector.frombytes(data)
+    return vector.tolist()
+
+
+class QueryEmbeddingCache:
+    """
+    Three-layer cache of query embeddings with buffered hit counting.
+    """
+    key_prefix = 'query_embedding'
+
+    def __init__(self, lru_size=1024, cache_alias='default', timeout=86400,
+                 flush_interval=30):
+        self.lru_size = lru_size
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+
+        self._lru = OrderedDict()
+        self._hits = Counter()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    @property
+    def shared_cache(self):
+        from django.core.cache import caches
+
+        return caches[self.cache_alias]
+
+    def _lru_get(self, query_hash):
+        with self._lock:
+            vector = self._lru.get(query_hash)
+            if vector is not None:
+                self._lru.move_to_end(query_hash)
+            return vector
+
+    def _lru_set(self, query_hash, vector):
+        with self._lock:
+            self._lru[query_hash] = vector
+            self._lru.move_to_end(query_hash)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def get(self, embedding_model, text, use_database=True):
+        """Return the cached vector for a query, or None."""
+        from apps.core.db import get_retrieval_alias
+        from apps.embeddings.models import QueryEmbedding
+
+        query_hash = make_query_hash(embedding_model, text)
+
+        vector = self._lru_get(query_hash)
+        if vector is None:
+            data = self._shared_get(query_hash)
+            if data is not None:
+                vector = unpack_vector(data)
+                self._lru_set(query_hash, vector)
+
+        if vector is None:
+            if not use_database:
+                return None
+            vector = QueryEmbedding.objects.using(get_retrieval_alias()).filter(
+                query_hash=query_hash
+            ).values_list('embedding_vector', flat=True).first()
+            if vector is None:
+                return None
+            vector = [float(value) for value in vector]
+            self._promote(query_hash, vector)
+
+        # Hit counts are flushed to QueryEmbedding rows
+        if use_database:
+            self.record_hit(query_hash)
+        return vector
+
+    def _shared_get(self, query_hash):
+        try:
+            return self.shared_cache.get(f"{self.key_prefix}:{query_hash}")
+        except Exception:
+            logger.warning(
+                "Could not read query embedding %s from the cache", query_hash, exc_info=True
+            )
+            return None
+
+    def _promote(self, query_hash, vector):
+        self._lru_set(query_hash, vector)
+        try:
+            self.shared_cache.set(
+                f"{self.key_prefix}:{query_hash}", pack_vector(vector), self.timeout
+            )
+        except Exception:
+            logger.warning(
+                "Could not write query embedding %s to the cache", query_hash, exc_info=True
+            )
+
+    def set(self, embedding_model, text, vector, use_database=True):
+        """Store a freshly computed query vector in every layer."""
+        from apps.embeddings.models import QueryEmbedding
+
+        query_hash = make_query_hash(embedding_model, text)
+        vector = [float(value) for value in vector]
+        self._promote(query_hash, vector)
+        if not use_database:
+            return vector
+        QueryEmbedding.objects.bulk_create([
+            QueryEmbedding(
+                query_text=text,
+                query_hash=query_hash,
+                embedding_model=embedding_model,
+                embedding_vector=vector
+            )
+        ], ignore_conflicts=True)
+        return vector
+
+    def get_or_embed(self, embedding_model, text, use_database=True):
+        """Return the vector for a query, embedding it only on a full cache miss."""
+        vector = self.get(embedding_model, text, use_database)
+        if vector is None:
+            vector = self.set(
+                embedding_model, text, embedding_model.embed([text])[0], use_database
+            )
+        return vector
+
+    async def aget_or_embed(self, embedding_model, text, use_database=True):
+        """
+        Async get_or_embed(). In-process hits return without leaving the event
+        loop (and flush due hit counts in a worker thread); shared cache and
+        database lookups run in a worker thread and the embedding call is
+        awaited.
+        """
+        from apps.core.db import db_sync_to_async
+
+        query_hash = make_query_hash(embedding_model, text)
+        vector = self._lru_get(query_hash)
+        if vector is not None:
+            if use_database and self._count_hit(query_hash):
+                await db_sync_to_async(self.flush_hit_counts)()
+            return vector
+
+        vector = await db_sync_to_async(self.get)(embedding_model, text, use_database)
+        if vector is None:
+            vector = (await embedding_model.aembed([text]))[0]
+            vector = await db_sync_to_async(self.set)(embedding_model, text, vector, use_database)
+        return vector
+
+    def _count_hit(self, query_hash):
+        """Count a hit in memory; returns whether a flush is due."""
+        with self._lock:
+            self._hits[query_hash] += 1
+            return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def record_hit(self, query_hash):
+        """Count a hit in memory and flush counts if the interval has elapsed."""
+        if self._count_hit(query_hash):
+            self.flush_hit_counts()
+
+    def flush_hit_counts(self):
+        """Write buffered hit counts, one UPDATE per distinct increment."""
+        from django.utils import timezone
+        from apps.embeddings.models import QueryEmbedding
+
+        with self._lock:
+            hits, self._hits = self._hits, Counter()
+            self._last_flush = time.monotonic()
+
+        by_increment = {}
+        for query_hash, count in hits.items():
+            by_increment.setdefault(count, []).append(query_hash)
+
+        now = timezone.now()
+        for count, hashes in by_increment.items():
+            QueryEmbedding.objects.filter(query_hash__in=hashes).update(
+                hit_count=models.F('hit_count') + count,
+                last_used=now
+            )
+        return len(hits)
+
+    def clear(self):
+        """Drop the in-process layer and pending hit counts."""
+        with self._lock:
+            self._lru.clear()
+            self._hits.clear()
+
+
+def get_query_cache():
+    """Return the process-wide cache configured by settings.QUERY_CACHE_CONFIG."""
+    global _default_cache
+    from django.conf import settings
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = QueryEmbeddingCache(**getattr(settings, 'QUERY_CACHE_CONFIG', {}))
+            atexit.register(_default_cache.flush_hit_counts)
+        return _default_cache
+
+
+def evict_stale_query_embeddings(max_age=timedelta(days=30), batch_size=10000):
+    """Delete cached query embeddings unused for max_age, in bounded batches."""
+    from django.utils import timezone
+    from apps.embeddings.models import QueryEmbedding
+
+    cutoff = timezone.now() - max_age
+    deleted = 0
+    while True:
+        pks = list(
+            QueryEmbedding.objects.filter(last_used__lt=cutoff)
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return deleted
+        deleted += QueryEmbedding.objects.filter(pk__in=pks).delete()[0]
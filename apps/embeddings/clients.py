@@ -0,0 +1,447 @@
+"""
+Provider-agnostic embedding client.
+
+One EmbeddingService per process owns an event loop thread and every provider
+client, so limits hold for the whole process whether callers are sync
+(``EmbeddingModel.embed``, the embedding pipeline) or async (the API):
+
+* micro-batching -- concurrent requests for the same model are coalesced into
+  one provider call of up to ``max_batch_size`` texts, waiting at most
+  ``batch_wait_ms`` for more requests to arrive;
+* concurrency and rate limits per provider -- ``max_concurrency`` calls in
+  flight and ``requests_per_second`` calls started;
+* retries -- transient failures (connection errors, 429 and 5xx) are retried
+  up to ``max_retries`` times with exponential backoff and full jitter,
+  honouring Retry-After.
+
+Providers are configured in ``settings.EMBEDDING_CONFIG['providers']``; each
+entry's ``backend`` is a dotted path to an EmbeddingProvider class, so tests
+can point 'ollama' at FakeProvider. Per-model ``config`` can override
+max_batch_size and batch_wait_ms.
+
+Every provider call is recorded in the latency histograms of its model (see
+apps.embeddings.latency).
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import random
+import threading
+import time
+from functools import partial
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+DEFAULT_PROVIDER_CONFIG = {
+    'max_concurrency': 4,
+    'requests_per_second': None,
+    'max_batch_size': 64,
+    'batch_wait_ms': 5,
+    'max_retries': 4,
+    'backoff_base': 0.5,
+    'backoff_max': 30.0,
+    'timeout': 60.0,
+}
+
+_service = None
+_service_lock = threading.Lock()
+
+
+class EmbeddingProvider:
+    """
+    Base class for embedding providers: one async call embeds a list of texts.
+    """
+
+    def __init__(self, config):
+        self.config = config
+
+    async def embed(self, embedding_model, texts):
+        """Return one vector per text."""
+        raise NotImplementedError
+
+    def is_retryable(self, exc):
+        """Whether a failed call may succeed when retried."""
+        return isinstance(exc, (ConnectionError, TimeoutError, asyncio.TimeoutError))
+
+    def retry_after(self, exc):
+        """Seconds the provider asked to wait before retrying, if any."""
+        return None
+
+
+class OllamaProvider(EmbeddingProvider):
+    """Ollama's /api/embed endpoint."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        import ollama
+
+        self._client = ollama.AsyncClient(host=config.get('host'), timeout=config.get('timeout'))
+
+    async def embed(self, embedding_model, texts):
+        response = await self._client.embed(model=embedding_model.model_id, input=texts)
+        return response.embeddings
+
+    def is_retryable(self, exc):
+        import httpx
+        import ollama
+
+        if isinstance(exc, ollama.ResponseError):
+            return exc.status_code in RETRY_STATUSES
+        return isinstance(exc, httpx.TransportError) or super().is_retryable(exc)
+
+
+class HttpEmbeddingProvider(EmbeddingProvider):
+    """Base class for JSON-over-HTTP providers."""
+
+    def __init__(self, config, base_url, headers=None):
+        super().__init__(config)
+        import httpx
+
+        self._client = httpx.AsyncClient(
+            base_url=base_url, headers=headers or {}, timeout=config.get('timeout')
+        )
+
+    async def post(self, path, payload):
+        response = await self._client.post(path, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    def is_retryable(self, exc):
+        import httpx
+
+        if isinstance(exc, httpx.HTTPStatusError):
+            return exc.response.status_code in RETRY_STATUSES
+        return isinstance(exc, httpx.TransportError) or super().is_retryable(exc)
+
+    def retry_after(self, exc):
+        import httpx
+
+        if isinstance(exc, httpx.HTTPStatusError):
+            try:
+                return float(exc.response.headers.get('retry-after'))
+            except (TypeError, ValueError):
+                return None
+        return None
+
+
+class OpenAIProvider(HttpEmbeddingProvider):
+    """OpenAI (or compatible) /embeddings endpoint."""
+
+    def __init__(self, config):
+        super().__init__(
+            config,
+            base_url=config.get('base_url', 'https://api.openai.com/v1'),
+            headers={'Authorization': f"Bearer {config.get('api_key', '')}"}
+        )
+
+    async def embed(self, embedding_model, texts):
+        data = await self.post('/embeddings', {'model': embedding_model.model_id, 'input': texts})
+        return [item['embedding'] for item in sorted(data['data'], key=lambda item: item['index'])]
+
+
+class HuggingFaceProvider(HttpEmbeddingProvider):
+    """Hugging Face Text Embeddings Inference server (/embed endpoint)."""
+
+    def __init__(self, config):
+        headers = {}
+        if config.get('api_key'):
+            headers['Authorization'] = f"Bearer {config['api_key']}"
+        super().__init__(config, base_url=config.get('url', 'http://localhost:8080'), headers=headers)
+
+    async def embed(self, embedding_model, texts):
+        return await self.post('/embed', {'inputs': texts, 'truncate': True})
+
+
+class SentenceTransformersProvider(EmbeddingProvider):
+    """Local sentence-transformers models, encoded in a worker thread."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _get_model(self, model_id):
+        with self._lock:
+            if model_id not in self._models:
+                from sentence_transformers import SentenceTransformer
+
+                self._models[model_id] = SentenceTransformer(
+                    model_id, device=self.config.get('device')
+                )
+            return self._models[model_id]
+
+    def _encode(self, model_id, texts):
+        return self._get_model(model_id).encode(texts, convert_to_numpy=True).tolist()
+
+    async def embed(self, embedding_model, texts):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, partial(self._encode, embedding_model.model_id, texts)
+        )
+
+
+class FakeProvider(EmbeddingProvider):
+    """
+    Deterministic offline provider for tests and benchmarks: a text always
+    maps to the same unit vector of the model's dimension. ``latency`` (seconds
+    per call) simulates a remote provider.
+    """
+
+    @staticmethod
+    def vector(embedding_model, text):
+        seed = hashlib.sha256(f"{embedding_model.model_id}:{text}".encode('utf-8')).digest()
+        rng = random.Random(seed)
+        values = [rng.gauss(0.0, 1.0) for _ in range(embedding_model.dimension)]
+        norm = math.sqrt(sum(value * value for value in values)) or 1.0
+        return [value / norm for value in values]
+
+    async def embed(self, embedding_model, texts):
+        latency = self.config.get('latency', 0)
+        if latency:
+            await asyncio.sleep(latency)
+        return [self.vector(embedding_model, text) for text in texts]
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` acquisitions per second with bursts of ``burst``."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ProviderClient:
+    """
+    Calls one provider within its concurrency and rate limits, with retries.
+    """
+
+    def __init__(self, name, config, latency):
+        self.name = name
+        self.config = {**DEFAULT_PROVIDER_CONFIG, **config}
+        self.provider = import_string(self.config['backend'])(self.config)
+        self.latency = latency
+        self._semaphore = asyncio.Semaphore(self.config['max_concurrency'])
+        rate = self.config['requests_per_second']
+        self._limiter = RateLimiter(rate, self.config.get('burst')) if rate else None
+
+    def backoff(self, attempt, retry_after=None):
+        """Full jitter: a random delay up to the exponential bound, or Retry-After."""
+        if retry_after is not None:
+            return min(retry_after, self.config['backoff_max'])
+        bound = min(self.config['backoff_max'], self.config['backoff_base'] * 2 ** attempt)
+        return random.uniform(0, bound)
+
+    async def call(self, embedding_model, texts, tokens=0):
+        """One provider call for a batch of texts, retried on transient errors."""
+        attempt = 0
+        while True:
+            if self._limiter is not None:
+                await self._limiter.acquire()
+            async with self._semaphore:
+                started = time.perf_counter()
+                try:
+                    vectors = await self.provider.embed(embedding_model, texts)
+                except Exception as exc:
+                    if attempt >= self.config['max_retries'] or not self.provider.is_retryable(exc):
+                        raise
+                    delay = self.backoff(attempt, self.provider.retry_after(exc))
+                    logger.warning(
+                        "Embedding call to %s failed (%s), retry %d in %.2fs",
+                        self.name, exc, attempt + 1, delay
+                    )
+                else:
+                    if len(vectors) != len(texts):
+                        raise ValueError(
+                            f"{self.name} returned {len(vectors)} vectors for {len(texts)} texts"
+                        )
+                    self.latency.record(
+                        embedding_model.pk,
+                        (time.perf_counter() - started) * 1000,
+                        texts=len(texts),
+                        tokens=tokens
+                    )
+                    return vectors
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent embed requests for one model into provider calls.
+    """
+
+    def __init__(self, client, embedding_model, max_batch_size, max_wait):
+        self.client = client
+        self.embedding_model = embedding_model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending = []
+        self._pending_texts = 0
+        self._timer = None
+
+    async def submit(self, texts, token_counts):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((texts, token_counts, future))
+        self._pending_texts += len(texts)
+        if self._pending_texts >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        requests, self._pending, self._pending_texts = self._pending, [], 0
+        if requests:
+            asyncio.ensure_future(self._run(requests))
+
+    async def _embed(self, texts, token_counts):
+        results = await asyncio.gather(*[
+            self.client.call(
+                self.embedding_model,
+                texts[start:start + self.max_batch_size],
+                tokens=sum(token_counts[start:start + self.max_batch_size])
+            )
+            for start in range(0, len(texts), self.max_batch_size)
+        ])
+        return [vector for result in results for vector in result]
+
+    async def _run(self, requests):
+        texts = [text for request_texts, _, _ in requests for text in request_texts]
+        token_counts = [count for _, request_counts, _ in requests for count in request_counts]
+        try:
+            vectors = await self._embed(texts, token_counts)
+        except Exception as exc:
+            # Retries are exhausted on a transient error: the provider is down
+            # and calling it once per request would only multiply the load
+            if len(requests) == 1 or self.client.provider.is_retryable(exc):
+                for _, _, future in requests:
+                    if not future.cancelled():
+                        future.set_exception(exc)
+                return
+            # Do not fail every coalesced request for one bad input
+            await asyncio.gather(*[self._run([request]) for request in requests])
+            return
+
+        offset = 0
+        for request_texts, _, future in requests:
+            if not future.cancelled():
+                future.set_result(vectors[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+
+class EmbeddingService:
+    """
+    Process-wide embedding client running on its own event loop thread.
+    """
+
+    def __init__(self, config=None, latency=None):
+        from apps.embeddings.latency import get_latency_aggregator
+
+        self.config = config or {}
+        self.latency = latency or get_latency_aggregator()
+        self._clients = {}
+        self._batchers = {}
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run_loop, name='embedding-client', daemon=True
+        )
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def get_client(self, provider):
+        """Client of a provider; must be called on the service loop."""
+        if provider not in self._clients:
+            providers = self.config.get('providers', {})
+            if provider not in providers:
+                raise ImproperlyConfigured(f"Provider {provider} is not configured")
+            self._clients[provider] = ProviderClient(provider, providers[provider], self.latency)
+        return self._clients[provider]
+
+    def get_batcher(self, embedding_model):
+        """Micro-batcher of a model; must be called on the service loop."""
+        key = (embedding_model.pk, embedding_model.provider, embedding_model.model_id)
+        if key not in self._batchers:
+            client = self.get_client(embedding_model.provider)
+            model_config = embedding_model.config or {}
+            self._batchers[key] = MicroBatcher(
+                client,
+                embedding_model,
+                max_batch_size=model_config.get('max_batch_size', client.config['max_batch_size']),
+                max_wait=model_config.get('batch_wait_ms', client.config['batch_wait_ms']) / 1000
+            )
+        return self._batchers[key]
+
+    def is_retryable(self, embedding_model, exc):
+        """
+        Whether an embed failure is transient (retries exhausted) rather than
+        caused by the inputs. Failures before any provider call, such as a
+        missing provider, are not the inputs' fault either.
+        """
+        client = self._clients.get(embedding_model.provider)
+        return client is None or client.provider.is_retryable(exc)
+
+    async def _embed(self, embedding_model, texts, token_counts):
+        if not texts:
+            return []
+        return await self.get_batcher(embedding_model).submit(texts, token_counts)
+
+    def submit(self, embedding_model, texts, token_counts=None):
+        """
+        Schedule an embed request; returns a concurrent.futures.Future.
+        Token counts (for throughput metrics) are computed in the calling
+        thread with the model's tokenizer unless given.
+        """
+        from apps.embeddings.tokenizers import count_tokens
+
+        texts = list(texts)
+        if token_counts is None:
+            token_counts = count_tokens(embedding_model, texts)
+        return asyncio.run_coroutine_threadsafe(
+            self._embed(embedding_model, texts, [count or 0 for count in token_counts]), self.loop
+        )
+
+    def embed(self, embedding_model, texts, token_counts=None):
+        """Embed texts from synchronous code."""
+        return self.submit(embedding_model, texts, token_counts).result()
+
+    async def aembed(self, embedding_model, texts, token_counts=None):
+        """Embed texts from any event loop."""
+        return await asyncio.wrap_future(self.submit(embedding_model, texts, token_counts))
+
+
+def get_embedding_service():
+    """Return the process-wide service configured by settings.EMBEDDING_CONFIG."""
+    global _service
+    from django.conf import settings
+
+    with _service_lock:
+        if _service is None:
+            config = getattr(settings, 'EMBEDDING_CONFIG', {})
+            _service = EmbeddingService(config)
+        return _service
@@ -0,0 +1,201 @@
+"""
+Approximate nearest neighbour (ANN) indexes for pgvector columns.
+
+One embeddings table holds vectors produced by several embedding models, and
+those models do not share a dimension. An untyped ``vector`` column cannot be
+indexed directly, so every EmbeddingModel gets its own partial expression index:
+
+    CREATE INDEX ... ON embeddings_document_embedding
+    USING hnsw ((embedding_vector::vector(768)) vector_cosine_ops)
+    WHERE embedding_model_id = '<uuid>'
+
+Queries are served by that index only when they use the same cast and filter on
+the same model, which is what ``distance_expression()`` builds.
+
+Document vectors of models with a compact ``storage_type`` are indexed on their
+``halfvec`` column, or on their sign bits with Hamming distance for int8 and
+binary storage (see apps/embeddings/quantization.py).
+"""
+from django.db import connections
+from django.db.models import F
+from django.db.models.functions import Cast
+from pgvector import HalfVector
+from pgvector.django import (
+    BitField, HalfVectorField, VectorField, CosineDistance, HammingDistance,
+    L2Distance, MaxInnerProduct
+)
+from apps.embeddings.quantization import INDEXED_FIELDS, get_storage_type, quantize_binary
+
+# pgvector refuses to build HNSW/IVFFlat indexes on wider vectors
+MAX_INDEXED_DIMENSION = 2000
+
+MAX_INDEXED_DIMENSIONS = {
+    'vector': MAX_INDEXED_DIMENSION,
+    'halfvec': 4000,
+    'bit': 64000,
+}
+
+# Column type of each storage type's indexed column
+COLUMN_TYPES = {
+    'float32': 'vector',
+    'float16': 'halfvec',
+    'int8': 'bit',
+    'binary': 'bit',
+}
+
+OPCLASSES = {
+    'cosine': 'vector_cosine_ops',
+    'l2': 'vector_l2_ops',
+    'inner_product': 'vector_ip_ops',
+}
+
+HALFVEC_OPCLASSES = {
+    'cosine': 'halfvec_cosine_ops',
+    'l2': 'halfvec_l2_ops',
+    'inner_product': 'halfvec_ip_ops',
+}
+
+DISTANCE_FUNCTIONS = {
+    'cosine': CosineDistance,
+    'l2': L2Distance,
+    'inner_product': MaxInnerProduct,
+}
+
+DEFAULT_INDEX_PARAMS = {
+    'hnsw': {'m': 16, 'ef_construction': 64, 'ef_search': 40},
+    'ivfflat': {'lists': 100, 'probes': 1},
+}
+
+# Parameters applied with SET LOCAL at query time rather than in the index DDL
+SEARCH_PARAMS = {
+    'hnsw': {'ef_search': 'hnsw.ef_search'},
+    'ivfflat': {'probes': 'ivfflat.probes'},
+}
+
+
+def get_index_params(embedding_model):
+    """Return index parameters for a model, falling back to pgvector defaults."""
+    params = DEFAULT_INDEX_PARAMS.get(embedding_model.index_type, {}).copy()
+    params.update(embedding_model.config.get('index_params', {}))
+    return params
+
+
+def get_index_name(model_cls, embedding_model):
+    """Return a stable index name that fits in PostgreSQL's 63-character limit."""
+    return f"{model_cls._meta.db_table}_{embedding_model.pk.hex[:16]}_ann"
+
+
+def get_opclass(column_type, metric):
+    """Operator class indexing a column type for a distance metric."""
+    if column_type == 'bit':
+        return 'bit_hamming_ops'
+    if column_type == 'halfvec':
+        return HALFVEC_OPCLASSES[metric]
+    return OPCLASSES[metric]
+
+
+def vector_expression(embedding_model, column=None, storage_type='float32'):
+    """Return the typed column expression the per-model index is built on."""
+    column = column or INDEXED_FIELDS[storage_type]
+    dimension = embedding_model.dimension
+    column_type = COLUMN_TYPES[storage_type]
+    if column_type == 'bit':
+        return Cast(F(column), BitField(length=dimension))
+    if column_type == 'halfvec':
+        return Cast(F(column), HalfVectorField(dimensions=dimension))
+    return Cast(F(column), VectorField(dimensions=dimension))
+
+
+def distance_expression(embedding_model, vector, column=None, storage_type='float32'):
+    """
+    Return an index-compatible distance expression for a query vector. Sign-bit
+    storage compares the query's sign bits by Hamming distance.
+    """
+    expression = vector_expression(embedding_model, column, storage_type)
+    column_type = COLUMN_TYPES[storage_type]
+    if column_type == 'bit':
+        return HammingDistance(expression, quantize_binary(vector))
+    distance = DISTANCE_FUNCTIONS[embedding_model.distance_metric]
+    if column_type == 'halfvec':
+        return distance(expression, HalfVector(vector))
+    return distance(expression, vector)
+
+
+def build_create_index_sql(model_cls, embedding_model, column=None,
+                           concurrently=True, using=None):
+    """Build the CREATE INDEX statement for one model's vectors."""
+    if embedding_model.index_type not in DEFAULT_INDEX_PARAMS:
+        return None
+
+    storage_type = get_storage_type(model_cls, embedding_model)
+    column = column or INDEXED_FIELDS[storage_type]
+    column_type = COLUMN_TYPES[storage_type]
+    max_dimension = MAX_INDEXED_DIMENSIONS[column_type]
+    if embedding_model.dimension > max_dimension:
+        raise ValueError(
+            f"Cannot index {embedding_model.dimension}-dimensional {column_type} "
+            f"columns, pgvector supports at most {max_dimension}"
+        )
+
+    quote = connections[using or 'default'].ops.quote_name
+    params = get_index_params(embedding_model)
+    search_params = SEARCH_PARAMS[embedding_model.index_type]
+    with_params = ', '.join(
+        f"{key} = {int(value)}" for key, value in params.items()
+        if key not in search_params
+    )
+    model_column = model_cls._meta.get_field('embedding_model').column
+
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS "
+        f"{quote(get_index_name(model_cls, embedding_model))} "
+        f"ON {quote(model_cls._meta.db_table)} "
+        f"USING {embedding_model.index_type} "
+        f"(({quote(column)}::{column_type}({int(embedding_model.dimension)})) "
+        f"{get_opclass(column_type, embedding_model.distance_metric)}) "
+        f"WITH ({with_params}) "
+        f"WHERE {quote(model_column)} = '{embedding_model.pk}'"
+    )
+
+
+def create_vector_index(model_cls, embedding_model, column=None,
+                        concurrently=True, using=None):
+    """
+    Create the ANN index for one model's vectors if it does not exist yet.
+    Partitioned tables do not support CREATE INDEX CONCURRENTLY.
+    """
+    from apps.core.partitioning import is_partitioned
+
+    if concurrently and is_partitioned(model_cls, using or 'default'):
+        concurrently = False
+    sql = build_create_index_sql(
+        model_cls, embedding_model, column=column, concurrently=concurrently,
+        using=using
+    )
+    if sql is None:
+        return False
+
+    with connections[using or 'default'].cursor() as cursor:
+        cursor.execute(sql)
+    return True
+
+
+def drop_vector_index(model_cls, embedding_model, concurrently=True, using=None):
+    """Drop the ANN index for one model's vectors."""
+    quote = connections[using or 'default'].ops.quote_name
+    with connections[using or 'default'].cursor() as cursor:
+        cursor.execute(
+            f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS "
+            f"{quote(get_index_name(model_cls, embedding_model))}"
+        )
+
+
+def apply_search_params(cursor, embedding_model):
+    """
+    Apply query-time index parameters (ef_search, probes) for the current transaction.
+    Must be called inside ``transaction.atomic()`` since it uses SET LOCAL.
+    """
+    params = get_index_params(embedding_model)
+    for key, setting in SEARCH_PARAMS.get(embedding_model.index_type, {}).items():
+        if key in params:
+            cursor.execute(f"SET LOCAL {setting} = {int(params[key])}")
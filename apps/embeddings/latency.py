@@ -0,0 +1,281 @@
+"""
+Per-EmbeddingModel latency histograms.
+
+Every provider call is recorded with ``record()``, which only appends a tuple
+to a deque (atomic, no lock), so the hot path never waits for another thread
+or for the database. A background thread drains the deque every
+``EMBEDDING_CONFIG['latency_flush_interval']`` seconds into one histogram per
+model and writes it as an EmbeddingLatencyWindow row. It also folds the
+window into EmbeddingModel.usage_count and avg_processing_time with a single
+atomic UPDATE, so concurrent workers never overwrite each other's counts.
+
+Histograms use logarithmic buckets growing by 10% (at most ~5% error on any
+quantile), stored sparsely, so windows from many processes and periods
+merge by adding bucket counts. ``latency_summary()`` merges recent windows
+into p50/p95/p99 call latency and texts/tokens per second of provider time.
+"""
+import atexit
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MIN_MS = 0.05
+GROWTH = 1.1
+MAX_BUCKET = 180  # ~17 minutes
+
+_aggregator = None
+_aggregator_lock = threading.Lock()
+
+
+def bucket_index(ms):
+    """Index of the bucket containing a latency in milliseconds."""
+    if ms <= MIN_MS:
+        return 0
+    return min(MAX_BUCKET, int(math.log(ms / MIN_MS) / math.log(GROWTH)) + 1)
+
+
+def bucket_value(index):
+    """Representative latency of a bucket (geometric midpoint of its bounds)."""
+    if index == 0:
+        return MIN_MS
+    return MIN_MS * GROWTH ** (index - 0.5)
+
+
+class LatencyHistogram:
+    """
+    Sparse log-bucketed histogram of call latencies plus throughput totals.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.calls = 0
+        self.texts = 0
+        self.tokens = 0
+        self.total_ms = 0.0
+        self.min_ms = None
+        self.max_ms = None
+
+    def add(self, ms, texts=1, tokens=0):
+        index = bucket_index(ms)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.calls += 1
+        self.texts += texts
+        self.tokens += tokens
+        self.total_ms += ms
+        self.min_ms = ms if self.min_ms is None else min(self.min_ms, ms)
+        self.max_ms = ms if self.max_ms is None else max(self.max_ms, ms)
+
+    def merge(self, other):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.calls += other.calls
+        self.texts += other.texts
+        self.tokens += other.tokens
+        self.total_ms += other.total_ms
+        for name, pick in (('min_ms', min), ('max_ms', max)):
+            value = getattr(other, name)
+            if value is not None:
+                current = getattr(self, name)
+                setattr(self, name, value if current is None else pick(current, value))
+        return self
+
+    def quantile(self, q):
+        """Approximate latency (ms) below which a fraction ``q`` of calls fell."""
+        if not self.calls:
+            return None
+        rank = q * self.calls
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(max(bucket_value(index), self.min_ms), self.max_ms)
+        return self.max_ms
+
+    def summary(self):
+        seconds = self.total_ms / 1000
+        return {
+            'calls': self.calls,
+            'texts': self.texts,
+            'tokens': self.tokens,
+            'mean_ms': self.total_ms / self.calls if self.calls else None,
+            'min_ms': self.min_ms,
+            'max_ms': self.max_ms,
+            'p50_ms': self.quantile(0.50),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'texts_per_second': self.texts / seconds if seconds else None,
+            'tokens_per_second': self.tokens / seconds if seconds else None,
+        }
+
+    @classmethod
+    def from_window(cls, window):
+        histogram = cls()
+        histogram.buckets = {int(index): count for index, count in window.buckets.items()}
+        histogram.calls = window.calls
+        histogram.texts = window.texts
+        histogram.tokens = window.tokens
+        histogram.total_ms = window.total_ms
+        histogram.min_ms = window.min_ms
+        histogram.max_ms = window.max_ms
+        return histogram
+
+
+class LatencyAggregator:
+    """
+    Collects samples in memory and flushes them to the database periodically.
+    """
+
+    def __init__(self, flush_interval=60, retention=timedelta(days=7)):
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self._samples = deque()
+        self._window_started = timezone.now()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def record(self, model_pk, ms, texts=1, tokens=0):
+        """Record one provider call of ``texts`` texts that took ``ms`` milliseconds."""
+        self._samples.append((model_pk, ms, texts, tokens))
+        if self._thread is None:
+            self._start()
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='embedding-latency', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing embedding latency histograms failed")
+
+    def drain(self):
+        """Move pending samples into one histogram per model."""
+        histograms = {}
+        samples = self._samples
+        while True:
+            try:
+                model_pk, ms, texts, tokens = samples.popleft()
+            except IndexError:
+                break
+            histograms.setdefault(model_pk, LatencyHistogram()).add(ms, texts, tokens)
+        return histograms
+
+    def pending(self):
+        """Summaries of samples recorded by this process since the last flush."""
+        histograms = {}
+        for model_pk, ms, texts, tokens in list(self._samples):
+            histograms.setdefault(model_pk, LatencyHistogram()).add(ms, texts, tokens)
+        return {model_pk: histogram.summary() for model_pk, histogram in histograms.items()}
+
+    def flush(self):
+        """Write one EmbeddingLatencyWindow per model and update its counters."""
+        from django.db import connections, models, transaction
+        from apps.embeddings.models import EmbeddingLatencyWindow, EmbeddingModel
+
+        with self._flush_lock:
+            started, ended = self._window_started, timezone.now()
+            histograms = self.drain()
+            self._window_started = ended
+            if not histograms:
+                return 0
+
+            try:
+                with transaction.atomic():
+                    EmbeddingLatencyWindow.objects.bulk_create([
+                        EmbeddingLatencyWindow(
+                            embedding_model_id=model_pk,
+                            started_at=started,
+                            ended_at=ended,
+                            calls=histogram.calls,
+                            texts=histogram.texts,
+                            tokens=histogram.tokens,
+                            total_ms=histogram.total_ms,
+                            min_ms=histogram.min_ms,
+                            max_ms=histogram.max_ms,
+                            buckets={str(index): count for index, count in histogram.buckets.items()},
+                        )
+                        for model_pk, histogram in histograms.items()
+                    ])
+                    for model_pk, histogram in histograms.items():
+                        # Running mean of milliseconds per text, weighted by texts
+                        EmbeddingModel.objects.filter(pk=model_pk).update(
+                            avg_processing_time=(
+                                models.F('avg_processing_time') * models.F('usage_count')
+                                + histogram.total_ms
+                            ) / (models.F('usage_count') + histogram.texts),
+                            usage_count=models.F('usage_count') + histogram.texts
+                        )
+                    if self.retention:
+                        EmbeddingLatencyWindow.objects.filter(
+                            ended_at__lt=ended - self.retention
+                        ).delete()
+            finally:
+                if threading.current_thread() is self._thread:
+                    connections.close_all()
+            return len(histograms)
+
+
+def get_latency_aggregator():
+    """Return the process-wide aggregator configured by settings.EMBEDDING_CONFIG."""
+    global _aggregator
+    from django.conf import settings
+
+    with _aggregator_lock:
+        if _aggregator is None:
+            config = getattr(settings, 'EMBEDDING_CONFIG', {})
+            _aggregator = LatencyAggregator(
+                flush_interval=config.get('latency_flush_interval', 60),
+                retention=timedelta(days=config.get('latency_retention_days', 7))
+            )
+            atexit.register(_aggregator.flush)
+        return _aggregator
+
+
+def latency_histograms(embedding_models=None, since=None):
+    """Merge stored windows into one LatencyHistogram per embedding model pk."""
+    from apps.embeddings.models import EmbeddingLatencyWindow
+
+    windows = EmbeddingLatencyWindow.objects.all()
+    if embedding_models is not None:
+        windows = windows.filter(embedding_model__in=embedding_models)
+    if since is not None:
+        windows = windows.filter(ended_at__gte=since)
+
+    histograms = {}
+    for window in windows.iterator():
+        histograms.setdefault(window.embedding_model_id, LatencyHistogram()).merge(
+            LatencyHistogram.from_window(window)
+        )
+    return histograms
+
+
+def latency_summary(embedding_models=None, since=None, order_by='p95_ms'):
+    """
+    Latency summaries of embedding models over windows ending after ``since``,
+    best first by ``order_by`` (lowest latency, or highest throughput for the
+    ``*_per_second`` keys). Models without measurements come last.
+    """
+    histograms = latency_histograms(embedding_models, since)
+    summaries = [
+        {'embedding_model_id': model_pk, **histogram.summary()}
+        for model_pk, histogram in histograms.items()
+    ]
+    sign = -1 if order_by.endswith('_per_second') else 1
+    return sorted(
+        summaries,
+        key=lambda summary: (summary[order_by] is None, sign * (summary[order_by] or 0))
+    )
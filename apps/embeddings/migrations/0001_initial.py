@@ -0,0 +1,188 @@
+import uuid
+
+import django.db.models.deletion
+import django.utils.timezone
+import pgvector.django
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('documents', '__first__'),
+        ('knowledge_bases', '__first__'),
+    ]
+
+    operations = [
+        pgvector.django.VectorExtension(),
+        migrations.CreateModel(
+            name='EmbeddingModel',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('metadata', models.JSONField(blank=True, default=dict, help_text='Additional metadata stored as JSON', verbose_name='Metadata')),
+                ('name', models.CharField(help_text='Name of the embedding model', max_length=100, unique=True, verbose_name='Name')),
+                ('provider', models.CharField(choices=[('ollama', 'Ollama'), ('openai', 'OpenAI'), ('huggingface', 'Hugging Face'), ('sentence_transformers', 'Sentence Transformers')], help_text='Provider of the embedding model', max_length=50, verbose_name='Provider')),
+                ('model_id', models.CharField(help_text='Identifier used by the provider', max_length=200, verbose_name='Model ID')),
+                ('dimension', models.PositiveIntegerField(help_text='Dimension of the embedding vectors', verbose_name='Dimension')),
+                ('max_tokens', models.PositiveIntegerField(default=512, help_text='Maximum number of tokens the model can process', verbose_name='Max tokens')),
+                ('description', models.TextField(blank=True, help_text='Description of the model and its capabilities', verbose_name='Description')),
+                ('is_active', models.BooleanField(default=True, help_text='Whether this model is available for use', verbose_name='Is active')),
+                ('avg_processing_time', models.FloatField(default=0.0, help_text='Average provider time per embedded text in milliseconds; see latency_windows for percentiles', verbose_name='Average processing time')),
+                ('usage_count', models.PositiveBigIntegerField(default=0, help_text='Number of texts embedded with this model', verbose_name='Usage count')),
+                ('index_type', models.CharField(choices=[('hnsw', 'HNSW'), ('ivfflat', 'IVFFlat'), ('none', 'None (exact search)')], default='hnsw', help_text='ANN index built for vectors produced by this model', max_length=20, verbose_name='Index type')),
+                ('distance_metric', models.CharField(choices=[('cosine', 'Cosine'), ('l2', 'Euclidean (L2)'), ('inner_product', 'Inner product')], default='cosine', help_text='Distance used to compare vectors produced by this model', max_length=20, verbose_name='Distance metric')),
+                ('storage_type', models.CharField(choices=[('float32', 'float32 (vector)'), ('float16', 'float16 (halfvec)'), ('int8', 'int8 scalar quantisation'), ('binary', 'Binary quantisation')], default='float32', help_text='How document vectors of this model are stored and indexed', max_length=20, verbose_name='Storage type')),
+                ('config', models.JSONField(blank=True, default=dict, help_text='Model-specific configuration parameters', verbose_name='Configuration')),
+            ],
+            options={
+                'verbose_name': 'Embedding Model',
+                'verbose_name_plural': 'Embedding Models',
+                'db_table': 'embeddings_model',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EmbeddingLatencyWindow',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('started_at', models.DateTimeField(verbose_name='Started at')),
+                ('ended_at', models.DateTimeField(verbose_name='Ended at')),
+                ('calls', models.PositiveIntegerField(default=0, verbose_name='Calls')),
+                ('texts', models.PositiveBigIntegerField(default=0, verbose_name='Texts')),
+                ('tokens', models.PositiveBigIntegerField(default=0, verbose_name='Tokens')),
+                ('total_ms', models.FloatField(default=0.0, verbose_name='Total time (ms)')),
+                ('min_ms', models.FloatField(null=True, verbose_name='Fastest call (ms)')),
+                ('max_ms', models.FloatField(null=True, verbose_name='Slowest call (ms)')),
+                ('buckets', models.JSONField(default=dict, help_text='Call counts by logarithmic latency bucket index', verbose_name='Buckets')),
+                ('embedding_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='latency_windows', to='embeddings.embeddingmodel')),
+            ],
+            options={
+                'verbose_name': 'Embedding Latency Window',
+                'verbose_name_plural': 'Embedding Latency Windows',
+                'db_table': 'embeddings_latency_window',
+                'indexes': [
+                    models.Index(fields=['embedding_model', 'ended_at'], name='embeddings__embeddi_d4b300_idx'),
+                    models.Index(fields=['ended_at'], name='embeddings__ended_a_c29180_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='DocumentEmbedding',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='pending', max_length=20, verbose_name='Status')),
+                ('status_message', models.TextField(blank=True, help_text='Additional information about the current status', verbose_name='Status message')),
+                ('processing_started_at', models.DateTimeField(blank=True, null=True, verbose_name='Processing started at')),
+                ('processing_completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Processing completed at')),
+                ('is_deleted', models.BooleanField(default=False, editable=False, help_text='Mirror of the document soft delete flag', verbose_name='Is deleted')),
+                ('chunk_index', models.PositiveIntegerField(help_text='Index of the chunk within the document', verbose_name='Chunk index')),
+                ('text_content', models.TextField(help_text='The text content that was embedded', verbose_name='Text content')),
+                ('embedding_vector', pgvector.django.VectorField(blank=True, help_text='The float32 embedding vector for this text chunk', null=True, verbose_name='Embedding Vector')),
+                ('embedding_half', pgvector.django.HalfVectorField(blank=True, help_text='float16 vector of models stored as halfvec', null=True, verbose_name='Half-precision vector')),
+                ('embedding_int8', models.BinaryField(blank=True, help_text='Scale-prefixed int8 codes of models stored with scalar quantisation', null=True, verbose_name='int8 codes')),
+                ('embedding_bits', pgvector.django.BitField(blank=True, help_text='Binary quantised vector indexed for int8 and binary storage', null=True, verbose_name='Sign bits')),
+                ('chunk_metadata', models.JSONField(blank=True, default=dict, help_text='Additional metadata for this chunk', verbose_name='Chunk metadata')),
+                ('processing_time', models.FloatField(blank=True, help_text='Time taken to generate this embedding in milliseconds', null=True, verbose_name='Processing time')),
+                ('token_count', models.PositiveIntegerField(blank=True, help_text='Number of tokens in the text content', null=True, verbose_name='Token count')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='embeddings', to='documents.document', verbose_name='Document')),
+                ('knowledge_base', models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='document_embeddings', to='knowledge_bases.knowledgebase', verbose_name='Knowledge Base')),
+                ('embedding_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_embeddings', to='embeddings.embeddingmodel', verbose_name='Embedding Model')),
+            ],
+            options={
+                'verbose_name': 'Document Embedding',
+                'verbose_name_plural': 'Document Embeddings',
+                'db_table': 'embeddings_document_embedding',
+                'unique_together': {('knowledge_base', 'document', 'chunk_index', 'embedding_model')},
+                'indexes': [
+                    models.Index(fields=['document', 'embedding_model'], name='embeddings__documen_b90e93_idx'),
+                    models.Index(condition=models.Q(('is_deleted', False)), fields=['knowledge_base', 'embedding_model'], name='emb_doc_kb_model_live'),
+                    models.Index(fields=['chunk_index'], name='embeddings__chunk_i_018257_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='QueryEmbedding',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('query_text', models.TextField(help_text='The original query text', verbose_name='Query text')),
+                ('query_hash', models.CharField(help_text='Hash of the query text for quick lookups', max_length=64, unique=True, verbose_name='Query hash')),
+                ('embedding_vector', pgvector.django.VectorField(help_text='The embedding vector for this query', verbose_name='Embedding Vector')),
+                ('hit_count', models.PositiveIntegerField(default=1, help_text='Number of times this cached embedding was used', verbose_name='Hit count')),
+                ('last_used', models.DateTimeField(auto_now=True, help_text='When this cached embedding was last used', verbose_name='Last used')),
+                ('embedding_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='query_embeddings', to='embeddings.embeddingmodel', verbose_name='Embedding Model')),
+            ],
+            options={
+                'verbose_name': 'Query Embedding',
+                'verbose_name_plural': 'Query Embeddings',
+                'db_table': 'embeddings_query_embedding',
+                'indexes': [
+                    models.Index(fields=['query_hash'], name='embeddings__query_h_a638e4_idx'),
+                    models.Index(fields=['embedding_model', 'last_used'], name='embeddings__embeddi_098b19_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='SemanticCacheEntry',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('kind', models.CharField(choices=[('search', 'Vector search'), ('hybrid', 'Hybrid search')], max_length=20, verbose_name='Kind')),
+                ('params_hash', models.CharField(help_text='Hash of the parameters (k, filters, ...) the payload was produced with', max_length=64, verbose_name='Parameters hash')),
+                ('query_text', models.TextField(blank=True, verbose_name='Query text')),
+                ('embedding_vector', pgvector.django.VectorField(verbose_name='Embedding Vector')),
+                ('content_version', models.PositiveBigIntegerField(help_text='KnowledgeBase.content_version the payload was computed at', verbose_name='Content version')),
+                ('payload', models.JSONField(default=dict, help_text='Cached hits and stage scores', verbose_name='Payload')),
+                ('hit_count', models.PositiveIntegerField(default=0, verbose_name='Hit count')),
+                ('last_used', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Last used')),
+                ('expires_at', models.DateTimeField(verbose_name='Expires at')),
+                ('knowledge_base', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='semantic_cache_entries', to='knowledge_bases.knowledgebase', verbose_name='Knowledge Base')),
+                ('embedding_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='semantic_cache_entries', to='embeddings.embeddingmodel', verbose_name='Embedding Model')),
+            ],
+            options={
+                'verbose_name': 'Semantic Cache Entry',
+                'verbose_name_plural': 'Semantic Cache Entries',
+                'db_table': 'embeddings_semantic_cache',
+                'indexes': [
+                    models.Index(fields=['knowledge_base', 'kind', 'params_hash', 'content_version'], name='embeddings_semcache_lookup'),
+                    models.Index(fields=['knowledge_base', 'last_used'], name='embeddings_semcache_lru'),
+                    models.Index(fields=['expires_at'], name='embeddings_semcache_expiry'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='EmbeddingJob',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='pending', max_length=20, verbose_name='Status')),
+                ('status_message', models.TextField(blank=True, help_text='Additional information about the current status', verbose_name='Status message')),
+                ('processing_started_at', models.DateTimeField(blank=True, null=True, verbose_name='Processing started at')),
+                ('processing_completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Processing completed at')),
+                ('job_type', models.CharField(choices=[('document', 'Document Embedding'), ('query', 'Query Embedding'), ('reindex', 'Reindexing')], help_text='Type of embedding job', max_length=20, verbose_name='Job type')),
+                ('parameters', models.JSONField(blank=True, default=dict, help_text='Job-specific parameters', verbose_name='Parameters')),
+                ('total_items', models.PositiveIntegerField(default=0, help_text='Total number of items to process', verbose_name='Total items')),
+                ('processed_items', models.PositiveIntegerField(default=0, help_text='Number of items processed', verbose_name='Processed items')),
+                ('failed_items', models.PositiveIntegerField(default=0, help_text='Number of items that failed processing', verbose_name='Failed items')),
+                ('started_at', models.DateTimeField(blank=True, help_text='When the job started processing', null=True, verbose_name='Started at')),
+                ('completed_at', models.DateTimeField(blank=True, help_text='When the job finished processing', null=True, verbose_name='Completed at')),
+                ('result_data', models.JSONField(blank=True, default=dict, help_text='Job results and statistics', verbose_name='Result data')),
+                ('embedding_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='embedding_jobs', to='embeddings.embeddingmodel', verbose_name='Embedding Model')),
+            ],
+            options={
+                'verbose_name': 'Embedding Job',
+                'verbose_name_plural': 'Embedding Jobs',
+                'db_table': 'embeddings_job',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
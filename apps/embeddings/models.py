@@ -1,9 +1,10 @@
 """ Embedding models for the RAG system. """
 from django.db import models
+from django.utils import timezone
 # from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
-from django.contrib.postgres.fields import ArrayField
-from apps.core.models import BaseModel, ProcessingStatusModel, MetadataModel
+from pgvector.django import BitField, HalfVectorField, VectorField
+from apps.core.models import BaseModel, ProcessingStatusModel, MetadataModel, StatusChoices
 
 
 class EmbeddingModel(BaseModel, MetadataModel):
@@ -62,13 +63,51 @@ class EmbeddingModel(BaseModel, MetadataModel):
     avg_processing_time = models.FloatField(
         _('Average processing time'),
         default=0.0,
-        help_text=_('Average processing time per token in milliseconds')
+        help_text=_('Average provider time per embedded text in milliseconds; see latency_windows for percentiles')
     )
 
     usage_count = models.PositiveBigIntegerField(
         _('Usage count'),
         default=0,
-        help_text=_('Number of times this model has been used')
+        help_text=_('Number of texts embedded with this model')
+    )
+
+    # Vector Index Configuration
+    index_type = models.CharField(
+        _('Index type'),
+        max_length=20,
+        choices=[
+            ('hnsw', 'HNSW'),
+            ('ivfflat', 'IVFFlat'),
+            ('none', _('None (exact search)')),
+        ],
+        default='hnsw',
+        help_text=_('ANN index built for vectors produced by this model')
+    )
+
+    distance_metric = models.CharField(
+        _('Distance metric'),
+        max_length=20,
+        choices=[
+            ('cosine', _('Cosine')),
+            ('l2', _('Euclidean (L2)')),
+            ('inner_product', _('Inner product')),
+        ],
+        default='cosine',
+        help_text=_('Distance used to compare vectors produced by this model')
+    )
+
+    storage_type = models.CharField(
+        _('Storage type'),
+        max_length=20,
+        choices=[
+            ('float32', _('float32 (vector)')),
+            ('float16', _('float16 (halfvec)')),
+            ('int8', _('int8 scalar quantisation')),
+            ('binary', _('Binary quantisation')),
+        ],
+        default='float32',
+        help_text=_('How document vectors of this model are stored and indexed')
     )
 
     # Configuration
@@ -88,20 +127,129 @@ class EmbeddingModel(BaseModel, MetadataModel):
     def __str__(self):
         return f"{self.name} ({self.provider})"
 
-    def increment_usage(self):
-        """Increment the usage counter."""
-        self.usage_count = models.F('usage_count') + 1
-        self.save(update_fields=['usage_count'])
+    def increment_usage(self, texts=1):
+        """Increment the usage counter in the database without touching this instance."""
+        type(self).objects.filter(pk=self.pk).update(usage_count=models.F('usage_count') + texts)
+
+    def update_processing_time(self, new_time, texts=1, tokens=0):
+        """
+        Record a provider call of ``texts`` texts that took ``new_time``
+        milliseconds. The measurement is aggregated in memory and folded into
+        usage_count and avg_processing_time at the next latency flush.
+        """
+        from apps.embeddings.latency import get_latency_aggregator
+
+        get_latency_aggregator().record(self.pk, new_time, texts=texts, tokens=tokens)
+
+    def get_latency(self, since=None):
+        """Measured latency percentiles and throughput of this model."""
+        from apps.embeddings.latency import latency_histograms, LatencyHistogram
+
+        histogram = latency_histograms([self.pk], since).get(self.pk, LatencyHistogram())
+        return histogram.summary()
+
+    @property
+    def throughput(self):
+        """Measured embedding throughput in texts per second."""
+        if not self.avg_processing_time:
+            return None
+        return 1000 / self.avg_processing_time
+
+    def embed(self, texts, token_counts=None):
+        """
+        Embed a list of texts with this model and return one vector per text.
+
+        Requests go through the process-wide embedding client, which batches,
+        rate limits and retries provider calls (see apps.embeddings.clients).
+        Known token counts of the texts save tokenizing them again for metrics.
+        """
+        from apps.embeddings.clients import get_embedding_service
+
+        return get_embedding_service().embed(self, texts, token_counts)
+
+    async def aembed(self, texts, token_counts=None):
+        """Async version of embed(); the provider call does not hold a thread."""
+        from apps.embeddings.clients import get_embedding_service
+
+        return await get_embedding_service().aembed(self, texts, token_counts)
+
+    def create_vector_indexes(self, concurrently=True):
+        """Create the ANN indexes serving this model's document, query and semantic cache vectors."""
+        from apps.embeddings.indexes import create_vector_index
+
+        for model_cls in (DocumentEmbedding, QueryEmbedding, SemanticCacheEntry):
+            create_vector_index(model_cls, self, concurrently=concurrently)
+
+    def drop_vector_indexes(self, concurrently=True):
+        """Drop the ANN indexes for this model, e.g. before changing index_type."""
+        from apps.embeddings.indexes import drop_vector_index
+
+        for model_cls in (DocumentEmbedding, QueryEmbedding, SemanticCacheEntry):
+            drop_vector_index(model_cls, self, concurrently=concurrently)
+
+    def change_storage_type(self, storage_type, batch_size=1000, concurrently=True):
+        """
+        Switch document vectors to another storage type: re-encode stored rows
+        and rebuild the document ANN index. Returns (converted, skipped) rows;
+        rows holding only sign bits cannot be expanded and are skipped.
+        """
+        from apps.embeddings.indexes import create_vector_index, drop_vector_index
+        from apps.embeddings.quantization import requantize
+
+        drop_vector_index(DocumentEmbedding, self, concurrently=concurrently)
+        self.storage_type = storage_type
+        self.save(update_fields=['storage_type', 'updated_at'])
+        result = requantize(self, batch_size=batch_size)
+        create_vector_index(DocumentEmbedding, self, concurrently=concurrently)
+        return result
+
+
+class EmbeddingLatencyWindow(models.Model):
+    """
+    Latency histogram of one process's provider calls for a model over one
+    flush interval. Windows are merged to compute percentiles over any period.
+    """
+    id = models.BigAutoField(primary_key=True)
+
+    embedding_model = models.ForeignKey(
+        EmbeddingModel,
+        on_delete=models.CASCADE,
+        related_name='latency_windows'
+    )
+
+    started_at = models.DateTimeField(_('Started at'))
+
+    ended_at = models.DateTimeField(_('Ended at'))
 
-    def update_processing_time(self, new_time):
-        """Update average processing time with a new measurement."""
-        if self.usage_count == 0:
-            self.avg_processing_time = new_time
-        else:
-            # Calculate rolling average
-            total_time = self.avg_processing_time * self.usage_count
-            self.avg_processing_time = (total_time + new_time) / (self.usage_count + 1)
-        self.save(update_fields=['avg_processing_time'])
+    calls = models.PositiveIntegerField(_('Calls'), default=0)
+
+    texts = models.PositiveBigIntegerField(_('Texts'), default=0)
+
+    tokens = models.PositiveBigIntegerField(_('Tokens'), default=0)
+
+    total_ms = models.FloatField(_('Total time (ms)'), default=0.0)
+
+    min_ms = models.FloatField(_('Fastest call (ms)'), null=True)
+
+    max_ms = models.FloatField(_('Slowest call (ms)'), null=True)
+
+    buckets = models.JSONField(
+        _('Buckets'),
+        default=dict,
+        help_text=_('Call counts by logarithmic latency bucket index')
+    )
+
+    class Meta:
+        verbose_name = _('Embedding Latency Window')
+        verbose_name_plural = _('Embedding Latency Windows')
+        db_table = 'embeddings_latency_window'
+        indexes = [
+            models.Index(fields=['embedding_model', 'ended_at']),
+            models.Index(fields=['ended_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.embedding_model_id}: {self.calls} calls until {self.ended_at}"
 
 
 class DocumentEmbedding(BaseModel, ProcessingStatusModel):
@@ -115,6 +263,23 @@ class DocumentEmbedding(BaseModel, ProcessingStatusModel):
         verbose_name=_('Document')
     )
 
+    # Denormalised from document, see DocumentChunk.knowledge_base
+    knowledge_base = models.ForeignKey(
+        'knowledge_bases.KnowledgeBase',
+        on_delete=models.CASCADE,
+        related_name='document_embeddings',
+        editable=False,
+        db_index=False,
+        verbose_name=_('Knowledge Base')
+    )
+
+    is_deleted = models.BooleanField(
+        _('Is deleted'),
+        default=False,
+        editable=False,
+        help_text=_('Mirror of the document soft delete flag')
+    )
+
     chunk_index = models.PositiveIntegerField(
         _('Chunk index'),
         help_text=_('Index of the chunk within the document')
@@ -132,10 +297,36 @@ class DocumentEmbedding(BaseModel, ProcessingStatusModel):
         verbose_name=_('Embedding Model')
     )
 
-    embedding_vector = ArrayField(
-        models.FloatField(),
+    # Dimension-less so vectors of every model share the table; each model is
+    # served by its own partial index (see apps/embeddings/indexes.py). Only
+    # the columns of the model's storage_type are filled, see
+    # apps/embeddings/quantization.py.
+    embedding_vector = VectorField(
         verbose_name=_('Embedding Vector'),
-        help_text=_('The embedding vector for this text chunk')
+        null=True,
+        blank=True,
+        help_text=_('The float32 embedding vector for this text chunk')
+    )
+
+    embedding_half = HalfVectorField(
+        verbose_name=_('Half-precision vector'),
+        null=True,
+        blank=True,
+        help_text=_('float16 vector of models stored as halfvec')
+    )
+
+    embedding_int8 = models.BinaryField(
+        _('int8 codes'),
+        null=True,
+        blank=True,
+        help_text=_('Scale-prefixed int8 codes of models stored with scalar quantisation')
+    )
+
+    embedding_bits = BitField(
+        verbose_name=_('Sign bits'),
+        null=True,
+        blank=True,
+        help_text=_('Binary quantised vector indexed for int8 and binary storage')
     )
 
     # Metadata for the chunk
@@ -165,15 +356,51 @@ class DocumentEmbedding(BaseModel, ProcessingStatusModel):
         verbose_name = _('Document Embedding')
         verbose_name_plural = _('Document Embeddings')
         db_table = 'embeddings_document_embedding'
-        unique_together = ['document', 'chunk_index', 'embedding_model']
+        # Includes knowledge_base so the constraint is valid on a partitioned table
+        unique_together = ['knowledge_base', 'document', 'chunk_index', 'embedding_model']
         indexes = [
             models.Index(fields=['document', 'embedding_model']),
+            models.Index(
+                fields=['knowledge_base', 'embedding_model'],
+                condition=models.Q(is_deleted=False),
+                name='emb_doc_kb_model_live'
+            ),
             models.Index(fields=['chunk_index']),
         ]
 
+    # Vectors are stored under the storage_type of their EmbeddingModel
+    quantized_storage = True
+
     def __str__(self):
         return f"Embedding for {self.document.title} (chunk {self.chunk_index})"
 
+    def save(self, *args, **kwargs):
+        """Override save to fill the denormalised document fields and compact vector columns."""
+        self.denormalize()
+        self.apply_storage()
+        super().save(*args, **kwargs)
+
+    def set_vector(self, vector, embedding_model=None):
+        """Store a vector in the columns of the embedding model's storage type."""
+        from apps.embeddings.quantization import encode
+
+        for field, value in encode(embedding_model or self.embedding_model, vector).items():
+            setattr(self, field, value)
+
+    def apply_storage(self, embedding_model=None):
+        """Encode a float32 embedding_vector set by the caller into the compact columns."""
+        if self.embedding_vector is None:
+            return
+        if (self.embedding_half is None and self.embedding_int8 is None
+                and self.embedding_bits is None):
+            self.set_vector(self.embedding_vector, embedding_model)
+
+    def denormalize(self):
+        """Copy knowledge_base and is_deleted from the document."""
+        if self.knowledge_base_id is None:
+            self.knowledge_base_id = self.document.knowledge_base_id
+            self.is_deleted = self.document.is_deleted
+
 
 class QueryEmbedding(BaseModel):
     """
@@ -198,8 +425,7 @@ class QueryEmbedding(BaseModel):
         verbose_name=_('Embedding Model')
     )
 
-    embedding_vector = ArrayField(
-        models.FloatField(),
+    embedding_vector = VectorField(
         verbose_name=_('Embedding Vector'),
         help_text=_('The embedding vector for this query')
     )
@@ -230,11 +456,103 @@ class QueryEmbedding(BaseModel):
         return f"Query embedding: {self.query_text[:50]}..."
 
     def increment_hit_count(self):
-        """Increment the hit counter for cache usage tracking."""
+        """
+        Increment the hit counter for cache usage tracking.
+        Lookups through apps.embeddings.cache buffer hits instead of calling this.
+        """
         self.hit_count = models.F('hit_count') + 1
         self.save(update_fields=['hit_count', 'last_used'])
 
 
+class SemanticCacheEntry(BaseModel):
+    """
+    Retrieval results cached for a query, found again by
+    similarity of later query embeddings (see apps/embeddings/semantic_cache.py).
+    """
+    KINDS = [
+        ('search', _('Vector search')),
+        ('hybrid', _('Hybrid search')),
+    ]
+
+    knowledge_base = models.ForeignKey(
+        'knowledge_bases.KnowledgeBase',
+        on_delete=models.CASCADE,
+        related_name='semantic_cache_entries',
+        db_index=False,
+        verbose_name=_('Knowledge Base')
+    )
+
+    embedding_model = models.ForeignKey(
+        EmbeddingModel,
+        on_delete=models.CASCADE,
+        related_name='semantic_cache_entries',
+        verbose_name=_('Embedding Model')
+    )
+
+    kind = models.CharField(
+        _('Kind'),
+        max_length=20,
+        choices=KINDS
+    )
+
+    params_hash = models.CharField(
+        _('Parameters hash'),
+        max_length=64,
+        help_text=_('Hash of the parameters (k, filters, ...) the payload was produced with')
+    )
+
+    query_text = models.TextField(
+        _('Query text'),
+        blank=True
+    )
+
+    # Dimension-less like DocumentEmbedding; served by a per-model partial index
+    embedding_vector = VectorField(
+        verbose_name=_('Embedding Vector')
+    )
+
+    content_version = models.PositiveBigIntegerField(
+        _('Content version'),
+        help_text=_('KnowledgeBase.content_version the payload was computed at')
+    )
+
+    payload = models.JSONField(
+        _('Payload'),
+        default=dict,
+        help_text=_('Cached hits and stage scores')
+    )
+
+    hit_count = models.PositiveIntegerField(
+        _('Hit count'),
+        default=0
+    )
+
+    last_used = models.DateTimeField(
+        _('Last used'),
+        default=timezone.now
+    )
+
+    expires_at = models.DateTimeField(
+        _('Expires at')
+    )
+
+    class Meta:
+        verbose_name = _('Semantic Cache Entry')
+        verbose_name_plural = _('Semantic Cache Entries')
+        db_table = 'embeddings_semantic_cache'
+        indexes = [
+            models.Index(
+                fields=['knowledge_base', 'kind', 'params_hash', 'content_version'],
+                name='embeddings_semcache_lookup'
+            ),
+            models.Index(fields=['knowledge_base', 'last_used'], name='embeddings_semcache_lru'),
+            models.Index(fields=['expires_at'], name='embeddings_semcache_expiry'),
+        ]
+
+    def __str__(self):
+        return f"Semantic cache ({self.kind}): {self.query_text[:50]}"
+
+
 class EmbeddingJob(BaseModel, ProcessingStatusModel):
     """
     Tracks embedding generation jobs for batch processing.
@@ -309,6 +627,11 @@ class EmbeddingJob(BaseModel, ProcessingStatusModel):
         help_text=_('Job results and statistics')
     )
 
+    progress_fields = (
+        'job_type', 'parameters', 'total_items', 'processed_items', 'failed_items',
+        'started_at', 'completed_at', 'result_data'
+    )
+
     class Meta:
         verbose_name = _('Embedding Job')
         verbose_name_plural = _('Embedding Jobs')
@@ -327,10 +650,35 @@ class EmbeddingJob(BaseModel, ProcessingStatusModel):
 
     def mark_item_processed(self):
         """Mark one item as processed."""
-        self.processed_items = models.F('processed_items') + 1
-        self.save(update_fields=['processed_items'])
+        self.record_progress(processed=1)
 
     def mark_item_failed(self):
         """Mark one item as failed."""
-        self.failed_items = models.F('failed_items') + 1
-        self.save(update_fields=['failed_items'])
\ No newline at end of file
+        self.record_progress(failed=1)
+
+    def record_progress(self, processed=0, failed=0):
+        """
+        Add processed and failed items; coalesced into periodic UPDATEs and
+        written in full by the next mark_completed()/mark_failed().
+        """
+        from apps.core.progress import get_reporter
+
+        get_reporter(self).add(processed_items=processed, failed_items=failed)
+
+    def reset(self, message=''):
+        """Return the job to PENDING with cleared counters so it can run again."""
+        self.status = StatusChoices.PENDING
+        self.status_message = message
+        self.total_items = self.processed_items = self.failed_items = 0
+        self.started_at = self.completed_at = None
+        self.result_data = {}
+        self.save_status([
+            'status', 'status_message', 'total_items', 'processed_items', 'failed_items',
+            'started_at', 'completed_at', 'result_data'
+        ])
+
+    def run(self, **kwargs):
+        """Run this job with the batched embedding pipeline."""
+        from apps.embeddings.pipeline import run_embedding_job
+
+        return run_embedding_job(self, **kwargs)
\ No newline at end of file
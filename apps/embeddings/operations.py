@@ -0,0 +1,56 @@
+"""
+Migration helpers for moving embeddings from ``float8[]`` arrays onto pgvector.
+
+The conversion is a regular schema migration; PostgreSQL's schema editor emits
+``ALTER COLUMN ... TYPE vector USING embedding_vector::vector`` and pgvector
+provides the ``double precision[] -> vector`` cast:
+
+    from pgvector.django import VectorExtension, VectorField
+    from apps.embeddings.operations import (
+        create_vector_indexes, drop_vector_indexes
+    )
+
+    operations = [
+        VectorExtension(),
+        migrations.AlterField('documentembedding', 'embedding_vector', VectorField()),
+        migrations.AlterField('queryembedding', 'embedding_vector', VectorField()),
+        migrations.RunPython(create_vector_indexes, drop_vector_indexes),
+    ]
+
+Going backwards the same AlterField casts ``vector -> real[]``. The per-model ANN
+indexes are built non-concurrently here because migrations run in a transaction;
+use ``EmbeddingModel.create_vector_indexes()`` to rebuild them online.
+"""
+from apps.embeddings.indexes import create_vector_index, drop_vector_index
+
+INDEXED_MODELS = ['DocumentEmbedding', 'QueryEmbedding', 'SemanticCacheEntry']
+
+
+def create_vector_indexes(apps, schema_editor):
+    """Create ANN indexes for every active embedding model."""
+    EmbeddingModel = apps.get_model('embeddings', 'EmbeddingModel')
+    using = schema_editor.connection.alias
+
+    for embedding_model in EmbeddingModel.objects.using(using).filter(is_active=True):
+        for model_name in INDEXED_MODELS:
+            create_vector_index(
+                apps.get_model('embeddings', model_name),
+                embedding_model,
+                concurrently=False,
+                using=using
+            )
+
+
+def drop_vector_indexes(apps, schema_editor):
+    """Drop the ANN indexes created by ``create_vector_indexes``."""
+    EmbeddingModel = apps.get_model('embeddings', 'EmbeddingModel')
+    using = schema_editor.connection.alias
+
+    for embedding_model in EmbeddingModel.objects.using(using).all():
+        for model_name in INDEXED_MODELS:
+            drop_vector_index(
+                apps.get_model('embeddings', model_name),
+                embedding_model,
+                concurrently=False,
+                using=using
+            )
@@ -0,0 +1,200 @@
+"""
+Batched embedding generation driven by EmbeddingJob.
+"""
+import time
+from django.db import transaction
+from django.utils import timezone
+from apps.core.models import StatusChoices
+
+
+class EmbeddingPipeline:
+    """
+    Embed every chunk in scope of an EmbeddingJob.
+
+    Chunks are streamed with keyset pagination on the primary key and grouped
+    into provider calls whose token total stays within the model's budget.
+    Each read batch costs one vector store upsert and one chunk UPDATE, whatever
+    its size; job counters are coalesced by the progress reporter.
+
+    Supported job parameters:
+        knowledge_base_id -- only embed chunks of this knowledge base
+        document_ids      -- only embed chunks of these documents
+    Reindex jobs re-embed chunks that already have an embedding.
+    """
+
+    def __init__(self, job, read_batch_size=2000, embed=None):
+        self.job = job
+        self.embedding_model = job.embedding_model
+        self.read_batch_size = read_batch_size
+        self.embed = embed or self.embedding_model.embed
+        self._pass_token_counts = embed is None
+
+        config = self.embedding_model.config
+        self.max_batch_tokens = config.get(
+            'max_batch_tokens', self.embedding_model.max_tokens * 16
+        )
+        self.max_batch_size = config.get('max_batch_size', 256)
+        self._stores = {}
+
+    def get_queryset(self):
+        """Return the chunks this job has to embed."""
+        from apps.documents.models import DocumentChunk
+
+        queryset = DocumentChunk.objects.filter(is_deleted=False)
+        if self.job.job_type != 'reindex':
+            queryset = queryset.filter(is_embedded=False)
+
+        parameters = self.job.parameters
+        if parameters.get('knowledge_base_id'):
+            queryset = queryset.filter(knowledge_base_id=parameters['knowledge_base_id'])
+        if parameters.get('document_ids'):
+            queryset = queryset.filter(document_id__in=parameters['document_ids'])
+        return queryset
+
+    def iter_batches(self):
+        """Yield chunks in primary key order, read_batch_size rows per query."""
+        queryset = self.get_queryset().select_related('document').only(
+            'id', 'document_id', 'knowledge_base_id', 'chunk_index', 'content', 'token_count',
+            'document__file_type', 'document__language'
+        ).order_by('pk')
+
+        last_pk = None
+        while True:
+            page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            batch = list(page[:self.read_batch_size])
+            if not batch:
+                return
+            last_pk = batch[-1].pk
+            yield batch
+
+    def group_by_tokens(self, chunks):
+        """Split chunks into provider calls bounded by token budget and item count."""
+        max_tokens = self.embedding_model.max_tokens
+        group, group_tokens = [], 0
+        for chunk in chunks:
+            # Providers truncate inputs to max_tokens, so longer chunks cost no more
+            tokens = min(chunk.token_count or max_tokens, max_tokens)
+            if group and (group_tokens + tokens > self.max_batch_tokens
+                          or len(group) >= self.max_batch_size):
+                yield group
+                group, group_tokens = [], 0
+            group.append(chunk)
+            group_tokens += tokens
+        if group:
+            yield group
+
+    def embed_group(self, chunks):
+        """
+        Embed a group of chunks, bisecting on provider errors so one bad input
+        only fails itself. Returns (embedded chunks, vectors, failed count).
+
+        Transient errors (an outage outlasting the client's retries) are
+        raised instead: bisecting would multiply calls to a failing provider
+        and mark every chunk failed, where the job should fail and be retried
+        by the task queue.
+        """
+        try:
+            texts = [chunk.content for chunk in chunks]
+            if self._pass_token_counts:
+                vectors = self.embed(texts, [chunk.token_count for chunk in chunks])
+            else:
+                vectors = self.embed(texts)
+        except Exception as exc:
+            if self.is_retryable(exc):
+                raise
+            if len(chunks) == 1:
+                return [], [], 1
+            middle = len(chunks) // 2
+            left = self.embed_group(chunks[:middle])
+            right = self.embed_group(chunks[middle:])
+            return left[0] + right[0], left[1] + right[1], left[2] + right[2]
+        return list(chunks), list(vectors), 0
+
+    def is_retryable(self, exc):
+        from apps.embeddings.clients import get_embedding_service
+
+        return get_embedding_service().is_retryable(self.embedding_model, exc)
+
+    def get_store(self, knowledge_base_id):
+        """Return the vector store of a knowledge base, writing vectors for this job's model."""
+        from apps.knowledge_bases.models import KnowledgeBase
+
+        if knowledge_base_id not in self._stores:
+            knowledge_base = KnowledgeBase.objects.get(pk=knowledge_base_id)
+            store = knowledge_base.get_vector_store()
+            store.embedding_model = self.embedding_model
+            self._stores[knowledge_base_id] = store
+        return self._stores[knowledge_base_id]
+
+    def write_batch(self, chunks, vectors, failed):
+        """Persist one read batch: vectors, chunk flags and job counters."""
+        from apps.documents.models import DocumentChunk
+
+        by_knowledge_base = {}
+        for chunk, vector in zip(chunks, vectors):
+            by_knowledge_base.setdefault(chunk.knowledge_base_id, ([], []))
+            by_knowledge_base[chunk.knowledge_base_id][0].append(chunk)
+            by_knowledge_base[chunk.knowledge_base_id][1].append(vector)
+
+        with transaction.atomic():
+            for knowledge_base_id, (kb_chunks, kb_vectors) in by_knowledge_base.items():
+                store = self.get_store(knowledge_base_id)
+                store.upsert(kb_chunks, kb_vectors)
+
+            DocumentChunk.objects.filter(pk__in=[chunk.pk for chunk in chunks]).update(
+                is_embedded=True,
+                embedding_model=self.embedding_model.name
+            )
+            self.job.record_progress(processed=len(chunks), failed=failed)
+
+    def run(self):
+        """Run the job to completion and return its result data."""
+        job = self.job
+        job.total_items = self.get_queryset().count()
+        job.started_at = timezone.now()
+        job.save(update_fields=['total_items', 'started_at'])
+        job.mark_processing()
+
+        processed = failed = 0
+        started = time.perf_counter()
+        try:
+            for batch in self.iter_batches():
+                batch_chunks, batch_vectors, batch_failed = [], [], 0
+                for group in self.group_by_tokens(batch):
+                    chunks, vectors, group_failed = self.embed_group(group)
+                    batch_chunks.extend(chunks)
+                    batch_vectors.extend(vectors)
+                    batch_failed += group_failed
+
+                self.write_batch(batch_chunks, batch_vectors, batch_failed)
+                processed += len(batch_chunks)
+                failed += batch_failed
+        except Exception as exc:
+            job.mark_failed(str(exc))
+            raise
+        finally:
+            # Once per job rather than per batch: every batch would update the knowledge base row
+            for store in self._stores.values():
+                store.knowledge_base.bump_content_version()
+
+        elapsed = time.perf_counter() - started
+        job.result_data = {
+            'processed': processed,
+            'failed': failed,
+            'elapsed_seconds': elapsed,
+            'chunks_per_second': processed / elapsed if elapsed else 0.0,
+        }
+        job.completed_at = timezone.now()
+        job.save(update_fields=['result_data', 'completed_at'])
+        if failed and not processed:
+            job.mark_failed(f"All {failed} chunks failed to embed")
+        else:
+            job.mark_completed(f"Embedded {processed} chunks, {failed} failed")
+        return job.result_data
+
+
+def run_embedding_job(job, **kwargs):
+    """Run an EmbeddingJob with the batched pipeline."""
+    if job.status != StatusChoices.PENDING:
+        raise ValueError(f"Job {job.pk} is {job.status}, expected {StatusChoices.PENDING}")
+    return EmbeddingPipeline(job, **kwargs).run()
@@ -0,0 +1,217 @@
+"""
+Compact storage of document vectors.
+
+``EmbeddingModel.storage_type`` selects how DocumentEmbedding stores and
+indexes the vectors of a model (bytes per vector for 768 dimensions):
+
+    float32   embedding_vector, pgvector ``vector``               3072
+    float16   embedding_half, ``halfvec``                         1536
+    int8      embedding_int8 codes + embedding_bits for the index  868
+    binary    embedding_bits, ``bit``                               96
+
+int8 uses per-vector scalar quantisation: a float32 scale followed by one
+signed byte per dimension. pgvector cannot index bytea, so int8 and binary
+vectors are both searched through a Hamming-distance index on their sign bits
+(binary quantisation).
+
+Quantised candidates are re-ranked at higher precision: search fetches
+``config['rescore_factor']`` (default 4) times k candidates from the index and
+rescores them against the query with the float32 vector when
+``config['keep_full_precision']`` keeps it (the column is TOASTed, so only the
+candidates' copies are read), else with the dequantised int8 codes. Binary
+vectors without a full precision copy are ranked by Hamming distance only.
+
+Changing a model's storage_type needs ``requantize()`` followed by
+``EmbeddingModel.drop_vector_indexes()`` and ``create_vector_indexes()``.
+"""
+import struct
+
+STORAGE_TYPES = ('float32', 'float16', 'int8', 'binary')
+
+# Column searched through the ANN index, per storage type
+INDEXED_FIELDS = {
+    'float32': 'embedding_vector',
+    'float16': 'embedding_half',
+    'int8': 'embedding_bits',
+    'binary': 'embedding_bits',
+}
+
+VECTOR_FIELDS = ('embedding_vector', 'embedding_half', 'embedding_int8', 'embedding_bits')
+
+DEFAULT_RESCORE_FACTOR = 4
+
+
+def get_storage_type(model_cls, embedding_model):
+    """Storage type of a model's vectors in a table; only DocumentEmbedding is quantised."""
+    if getattr(model_cls, 'quantized_storage', False):
+        return embedding_model.storage_type
+    return 'float32'
+
+
+def keeps_full_precision(embedding_model):
+    """Whether float32 copies of the vectors are stored."""
+    return (
+        embedding_model.storage_type == 'float32'
+        or embedding_model.config.get('keep_full_precision', False)
+    )
+
+
+def storage_bytes(embedding_model):
+    """Approximate bytes per stored vector, without row and TOAST overhead."""
+    dimension = embedding_model.dimension
+    sizes = {
+        'float32': 4 * dimension,
+        'float16': 2 * dimension,
+        'int8': 4 + dimension + (dimension + 7) // 8,
+        'binary': (dimension + 7) // 8,
+    }
+    size = sizes[embedding_model.storage_type]
+    if embedding_model.storage_type != 'float32' and keeps_full_precision(embedding_model):
+        size += 4 * dimension
+    return size
+
+
+def quantize_int8(vector):
+    """Scale-prefixed int8 codes of a vector."""
+    import numpy as np
+
+    values = np.asarray(vector, dtype=np.float32)
+    peak = float(np.abs(values).max()) if values.size else 0.0
+    scale = peak / 127 if peak else 1.0
+    codes = np.clip(np.rint(values / scale), -127, 127).astype(np.int8)
+    return struct.pack('<f', scale) + codes.tobytes()
+
+
+def dequantize_int8(data):
+    """Approximate float32 vector of int8 codes."""
+    import numpy as np
+
+    data = bytes(data)
+    scale = struct.unpack('<f', data[:4])[0]
+    return np.frombuffer(data, dtype=np.int8, offset=4).astype(np.float32) * scale
+
+
+def quantize_binary(vector):
+    """Sign bits of a vector as a '0'/'1' string, like pgvector's binary_quantize()."""
+    return ''.join('1' if value > 0 else '0' for value in vector)
+
+
+def encode(embedding_model, vector):
+    """Column values storing a vector under a model's storage type."""
+    storage_type = embedding_model.storage_type
+    return {
+        'embedding_vector': vector if keeps_full_precision(embedding_model) else None,
+        'embedding_half': vector if storage_type == 'float16' else None,
+        'embedding_int8': quantize_int8(vector) if storage_type == 'int8' else None,
+        'embedding_bits': quantize_binary(vector) if storage_type in ('int8', 'binary') else None,
+    }
+
+
+def as_array(value):
+    """float32 array of a stored vector (numpy array, HalfVector or list)."""
+    import numpy as np
+
+    if hasattr(value, 'to_numpy'):
+        value = value.to_numpy()
+    return np.asarray(value, dtype=np.float32)
+
+
+def decode(values):
+    """
+    Best available float32 reconstruction from a dict of stored columns, or
+    None when only sign bits are stored.
+    """
+    for field in ('embedding_vector', 'embedding_half'):
+        if values.get(field) is not None:
+            return as_array(values[field])
+    if values.get('embedding_int8') is not None:
+        return dequantize_int8(values['embedding_int8'])
+    return None
+
+
+def rescore_field(embedding_model):
+    """Column used to re-rank index candidates, or None when no rescoring applies."""
+    storage_type = embedding_model.storage_type
+    if storage_type == 'float32':
+        return None
+    if keeps_full_precision(embedding_model):
+        return 'embedding_vector'
+    if storage_type == 'int8':
+        return 'embedding_int8'
+    return None
+
+
+def candidate_count(embedding_model, k):
+    """Number of index candidates to fetch for k results."""
+    if rescore_field(embedding_model) is None:
+        return k
+    return k * embedding_model.config.get('rescore_factor', DEFAULT_RESCORE_FACTOR)
+
+
+def similarity(metric, matrix, vector):
+    """Similarity of every row to a vector under a distance metric (higher is better)."""
+    import numpy as np
+
+    if metric == 'cosine':
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+        return (matrix @ vector) / np.where(norms == 0, 1.0, norms)
+    if metric == 'l2':
+        return -np.linalg.norm(matrix - vector, axis=1)
+    return matrix @ vector
+
+
+def rescore(embedding_model, vector, rows, k):
+    """
+    Re-rank candidate rows ``(document_id, chunk_index, stored)`` by exact
+    similarity to the query; returns the top k as (document_id, chunk_index, score).
+    """
+    import numpy as np
+
+    if not rows:
+        return []
+
+    field = rescore_field(embedding_model)
+    if field == 'embedding_int8':
+        matrix = np.stack([dequantize_int8(stored) for _, _, stored in rows])
+    else:
+        matrix = np.stack([as_array(stored) for _, _, stored in rows])
+    scores = similarity(
+        embedding_model.distance_metric, matrix, np.asarray(vector, dtype=np.float32)
+    )
+    order = np.argsort(-scores)[:k]
+    return [(rows[i][0], rows[i][1], float(scores[i])) for i in order]
+
+
+def requantize(embedding_model, batch_size=1000):
+    """
+    Re-encode stored vectors of a model after its storage_type or
+    keep_full_precision changed. Rows that only have sign bits cannot be
+    expanded and are left unchanged; returns (converted, skipped).
+    """
+    from django.db import transaction
+    from apps.embeddings.models import DocumentEmbedding
+
+    queryset = DocumentEmbedding.objects.filter(embedding_model=embedding_model).order_by('pk')
+
+    converted = skipped = 0
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        batch = list(page.only('pk', *VECTOR_FIELDS)[:batch_size])
+        if not batch:
+            return converted, skipped
+        last_pk = batch[-1].pk
+
+        updated = []
+        for embedding in batch:
+            vector = decode({field: getattr(embedding, field) for field in VECTOR_FIELDS})
+            if vector is None:
+                skipped += 1
+                continue
+            for field, value in encode(embedding_model, vector.tolist()).items():
+                setattr(embedding, field, value)
+            updated.append(embedding)
+
+        with transaction.atomic():
+            DocumentEmbedding.objects.bulk_update(updated, VECTOR_FIELDS)
+        converted += len(updated)
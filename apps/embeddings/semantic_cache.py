@@ -0,0 +1,237 @@
+"""
+Semantic cache of retrieval results.
+
+QueryEmbedding only serves exact repeats of a query text. This cache serves
+near-duplicates ("how do I reset my password" / "reset password how"): a
+query's embedding is matched against recent SemanticCacheEntry rows of the
+same knowledge base through the embedding model's ANN index, and the nearest
+entry is used when its score under the model's distance metric reaches
+``SEMANTIC_CACHE_CONFIG['thresholds'][<metric>]``. Scores are those of vector
+search hits: cosine similarity, inner product, or negated L2 distance.
+
+An entry only matches queries with the same kind ('search', 'hybrid') and
+parameters (k, filters, ...; for hybrid searches also the
+normalized query text, which the lexical leg ranks by), and only while the
+knowledge base's ``content_version`` is the one it was computed at. The
+statistics rollup bumps that version for ingestion and deletions, embedding
+jobs when they finish and re-chunking once per document, so stale entries stop
+matching and ``evict_semantic_cache()`` deletes them together
+with expired entries (``ttl``) and the least recently used entries beyond
+``max_entries`` per knowledge base:
+
+    python manage.py shell -c "from apps.embeddings.semantic_cache import run_eviction; run_eviction()"
+
+Hits are counted in memory and written every ``flush_interval`` seconds, as in
+apps/embeddings/cache.py.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from django.db import connections, models, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEMANTIC_CACHE_CONFIG = {
+    'enabled': True,
+    # Cosine 0.95 is an L2 distance of about 0.32 between unit vectors
+    'thresholds': {'cosine': 0.95, 'inner_product': 0.95, 'l2': -0.32},
+    'ttl': 60 * 60 * 24,
+    'max_entries': 10000,
+    'flush_interval': 30,
+}
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_semantic_cache_config():
+    from django.conf import settings
+
+    return {**DEFAULT_SEMANTIC_CACHE_CONFIG, **getattr(settings, 'SEMANTIC_CACHE_CONFIG', {})}
+
+
+def make_params_hash(params):
+    """Stable hash of the parameters a payload depends on."""
+    key = json.dumps(params or {}, sort_keys=True, default=str)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class SemanticCache:
+    """
+    Looks up and stores SemanticCacheEntry rows with buffered hit counting.
+    """
+
+    def __init__(self, enabled=True, thresholds=None, ttl=86400, max_entries=10000,
+                 flush_interval=30):
+        self.enabled = enabled
+        self.thresholds = {**DEFAULT_SEMANTIC_CACHE_CONFIG['thresholds'], **(thresholds or {})}
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+
+        self._hits = Counter()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def get(self, knowledge_base, embedding_model, vector, kind, params=None):
+        """Return the payload of the nearest matching entry, or None."""
+        from django.utils import timezone
+        from apps.core.db import get_retrieval_alias
+        from apps.embeddings.indexes import apply_search_params, distance_expression
+        from apps.embeddings.models import SemanticCacheEntry
+        from apps.knowledge_bases.models import KnowledgeBase
+        from apps.knowledge_bases.vector_stores import distance_to_score
+
+        metric = embedding_model.distance_metric
+        if not self.enabled or metric not in self.thresholds:
+            return None
+
+        alias = get_retrieval_alias()
+        # The current version is read in the same query, so a stale instance
+        # can never match entries of content that changed since
+        current_version = KnowledgeBase._base_manager.filter(
+            pk=knowledge_base.pk
+        ).values('content_version')
+        queryset = SemanticCacheEntry.objects.using(alias).filter(
+            knowledge_base_id=knowledge_base.pk,
+            embedding_model=embedding_model,
+            kind=kind,
+            params_hash=make_params_hash(params),
+            content_version=models.Subquery(current_version),
+            expires_at__gt=timezone.now()
+        ).annotate(
+            distance=distance_expression(embedding_model, vector)
+        ).order_by('distance').values_list('pk', 'distance', 'payload')[:1]
+
+        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+            apply_search_params(cursor, embedding_model)
+            rows = list(queryset)
+
+        if not rows:
+            return None
+        pk, distance, payload = rows[0]
+        if distance_to_score(metric, distance) < self.thresholds[metric]:
+            return None
+        self.record_hit(pk)
+        return payload
+
+    def set(self, knowledge_base, embedding_model, query_text, vector, kind, params, payload):
+        """Store a payload computed at the knowledge base's current content version."""
+        from django.utils import timezone
+        from apps.embeddings.models import SemanticCacheEntry
+
+        if not self.enabled:
+            return None
+        now = timezone.now()
+        return SemanticCacheEntry.objects.create(
+            knowledge_base_id=knowledge_base.pk,
+            embedding_model=embedding_model,
+            kind=kind,
+            params_hash=make_params_hash(params),
+            query_text=query_text if isinstance(query_text, str) else '',
+            embedding_vector=[float(value) for value in vector],
+            content_version=knowledge_base.content_version,
+            payload=payload,
+            last_used=now,
+            expires_at=now + timedelta(seconds=self.ttl)
+        )
+
+    def record_hit(self, pk):
+        """Count a hit in memory and flush counts if the interval has elapsed."""
+        with self._lock:
+            self._hits[pk] += 1
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush_hit_counts()
+
+    def flush_hit_counts(self):
+        """Write buffered hit counts, one UPDATE per distinct increment."""
+        from django.utils import timezone
+        from apps.embeddings.models import SemanticCacheEntry
+
+        with self._lock:
+            hits, self._hits = self._hits, Counter()
+            self._last_flush = time.monotonic()
+
+        by_increment = {}
+        for pk, count in hits.items():
+            by_increment.setdefault(count, []).append(pk)
+
+        now = timezone.now()
+        for count, pks in by_increment.items():
+            SemanticCacheEntry.objects.filter(pk__in=pks).update(
+                hit_count=models.F('hit_count') + count,
+                last_used=now
+            )
+        return len(hits)
+
+
+def get_semantic_cache():
+    """Return the process-wide cache configured by settings.SEMANTIC_CACHE_CONFIG."""
+    global _default_cache
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SemanticCache(**get_semantic_cache_config())
+            atexit.register(_default_cache.flush_hit_counts)
+        return _default_cache
+
+
+def _delete_in_batches(queryset, batch_size):
+    from apps.embeddings.models import SemanticCacheEntry
+
+    deleted = 0
+    while True:
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        deleted += SemanticCacheEntry.objects.filter(pk__in=pks).delete()[0]
+
+
+def evict_semantic_cache(max_entries=None, batch_size=10000):
+    """
+    Delete expired entries, entries of older content versions and, per
+    knowledge base, the least recently used entries beyond max_entries.
+    Returns the number of deleted entries.
+    """
+    from django.utils import timezone
+    from apps.embeddings.models import SemanticCacheEntry
+
+    max_entries = max_entries or get_semantic_cache_config()['max_entries']
+    entries = SemanticCacheEntry.objects.all()
+    deleted = _delete_in_batches(
+        entries.filter(
+            models.Q(expires_at__lte=timezone.now())
+            | models.Q(content_version__lt=models.F('knowledge_base__content_version'))
+        ),
+        batch_size
+    )
+
+    over_limit = entries.values('knowledge_base_id').annotate(
+        total=models.Count('pk')
+    ).filter(total__gt=max_entries)
+    for row in over_limit:
+        oldest = entries.filter(knowledge_base_id=row['knowledge_base_id']).order_by('-last_used')
+        cutoff = oldest.values_list('last_used', flat=True)[max_entries - 1]
+        deleted += _delete_in_batches(
+            entries.filter(knowledge_base_id=row['knowledge_base_id'], last_used__lt=cutoff),
+            batch_size
+        )
+    return deleted
+
+
+def run_eviction(interval=300.0, batch_size=10000):
+    """Evict semantic cache entries every interval seconds until interrupted."""
+    while True:
+        try:
+            deleted = evict_semantic_cache(batch_size=batch_size)
+            if deleted:
+                logger.debug("Evicted %d semantic cache entries", deleted)
+        except Exception:
+            logger.exception("Semantic cache eviction failed")
+        time.sleep(interval)
@@ -0,0 +1,152 @@
+"""
+Tokenizer registry for accurate per-EmbeddingModel token counts.
+
+Tokenizers are expensive to load, so each one is loaded once per process and
+shared. The tokenizer of a model is taken from ``config['tokenizer']``:
+
+    {"tokenizer": "hf:nomic-ai/nomic-embed-text-v1.5"}   Hugging Face tokenizers
+    {"tokenizer": "tiktoken:cl100k_base"}                tiktoken encodings
+
+Without that setting OpenAI models use tiktoken and Hugging Face / Sentence
+Transformers models load the tokenizer of their model_id. Models whose
+tokenizer cannot be loaded fall back to the 4-characters-per-token heuristic.
+"""
+import logging
+import threading
+from apps.documents.metrics import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_tokenizers = {}
+_lock = threading.Lock()
+
+
+class HeuristicTokenizer:
+    """
+    Estimate 4 characters per token; offsets approximate tokens as words and punctuation.
+    """
+    name = 'heuristic'
+
+    def count(self, texts):
+        return [estimate_tokens(len(text)) for text in texts]
+
+    def offsets(self, text):
+        from apps.documents.chunking import TokenBudgetChunker
+
+        return TokenBudgetChunker.regex_tokens(text)
+
+
+class HuggingFaceTokenizer:
+    """
+    Tokenizer from the Hugging Face ``tokenizers`` library (Rust, batch-parallel).
+    """
+
+    def __init__(self, name, batch_size=256):
+        from tokenizers import Tokenizer
+
+        self.name = f"hf:{name}"
+        self.batch_size = batch_size
+        self._tokenizer = Tokenizer.from_pretrained(name)
+        self._tokenizer.no_truncation()
+        self._tokenizer.no_padding()
+
+    def count(self, texts):
+        counts = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self._tokenizer.encode_batch(
+                list(texts[start:start + self.batch_size]), add_special_tokens=False
+            )
+            counts.extend(len(encoding.ids) for encoding in encodings)
+        return counts
+
+    def offsets(self, text):
+        return self._tokenizer.encode(text, add_special_tokens=False).offsets
+
+
+class TiktokenTokenizer:
+    """
+    OpenAI tiktoken encoding.
+    """
+
+    def __init__(self, name):
+        import tiktoken
+
+        self.name = f"tiktoken:{name}"
+        try:
+            self._encoding = tiktoken.encoding_for_model(name)
+        except KeyError:
+            self._encoding = tiktoken.get_encoding(name)
+
+    def count(self, texts):
+        return [len(tokens) for tokens in self._encoding.encode_ordinary_batch(list(texts))]
+
+    def offsets(self, text):
+        tokens = self._encoding.encode_ordinary(text)
+        _, starts = self._encoding.decode_with_offsets(tokens)
+        ends = starts[1:] + [len(text)]
+        return list(zip(starts, ends))
+
+
+TOKENIZER_CLASSES = {
+    'hf': HuggingFaceTokenizer,
+    'tiktoken': TiktokenTokenizer,
+}
+
+
+def get_tokenizer_spec(embedding_model):
+    """Return the 'kind:name' tokenizer spec of an EmbeddingModel, or None."""
+    if embedding_model.config.get('tokenizer'):
+        return embedding_model.config['tokenizer']
+    if embedding_model.provider == 'openai':
+        return f"tiktoken:{embedding_model.model_id}"
+    if embedding_model.provider in ('huggingface', 'sentence_transformers'):
+        return f"hf:{embedding_model.model_id}"
+    return None
+
+
+def load_tokenizer(spec):
+    """Load (once per process) the tokenizer for a 'kind:name' spec."""
+    if not spec:
+        return HeuristicTokenizer()
+
+    with _lock:
+        if spec not in _tokenizers:
+            kind, _, name = spec.partition(':')
+            try:
+                _tokenizers[spec] = TOKENIZER_CLASSES[kind](name)
+            except Exception:
+                logger.warning("Could not load tokenizer %s, using heuristic counts", spec, exc_info=True)
+                _tokenizers[spec] = HeuristicTokenizer()
+        return _tokenizers[spec]
+
+
+def get_tokenizer(embedding_model):
+    """Return the shared tokenizer of an EmbeddingModel."""
+    return load_tokenizer(get_tokenizer_spec(embedding_model))
+
+
+def get_tokenizer_by_name(model_name):
+    """Return the shared tokenizer of an EmbeddingModel looked up by name."""
+    from apps.embeddings.models import EmbeddingModel
+
+    key = f"model:{model_name}"
+    with _lock:
+        if key in _tokenizers:
+            return _tokenizers[key]
+
+    embedding_model = EmbeddingModel.objects.filter(name=model_name).first()
+    tokenizer = get_tokenizer(embedding_model) if embedding_model else HeuristicTokenizer()
+    with _lock:
+        _tokenizers[key] = tokenizer
+    return tokenizer
+
+
+def count_tokens(embedding_model, texts):
+    """Count tokens of many texts with an EmbeddingModel's tokenizer."""
+    return get_tokenizer(embedding_model).count(texts)
+
+
+def clear_tokenizers():
+    """Forget every loaded tokenizer, e.g. after changing a model's config."""
+    with _lock:
+        _tokenizers.clear()
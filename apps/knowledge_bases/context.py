@@ -0,0 +1,210 @@
+"""
+Context expansion of retrieval hits into prompt-ready passages.
+
+``expand_context()`` widens every hit to ``window_size`` neighbouring chunks
+on each side, merges windows that overlap or touch within a document, and
+loads all of them with a single query (one chunk_index range per merged
+window, served by the (document, chunk_index) index). Document titles come
+from the hits themselves, or from one more query for hits without their
+document loaded. Expanding the top-20 hits therefore costs one or two
+queries rather than two per hit.
+
+Consecutive chunks overlap by the knowledge base's chunk_overlap; passages
+are stitched on the chunks' character offsets so overlapping text appears
+once. Passages are returned best hit first and fill at most ``max_tokens``:
+a passage that does not fit is narrowed to its hits, dropping the neighbours
+furthest from a hit first, and skipped if even its hits do not fit.
+"""
+from dataclasses import dataclass, field
+from functools import reduce
+from operator import or_
+from django.db.models import Q
+
+
+@dataclass
+class Passage:
+    """Consecutive chunks of one document around one or more hits."""
+    document_id: object
+    title: str
+    start_index: int
+    end_index: int
+    text: str
+    token_count: int
+    score: float
+    hit_indexes: list = field(default_factory=list)
+
+    def to_prompt(self):
+        if self.start_index == self.end_index:
+            location = f"chunk {self.start_index}"
+        else:
+            location = f"chunks {self.start_index}-{self.end_index}"
+        return f"[{self.title}, {location}]\n{self.text}"
+
+
+def merge_windows(hits, window_size):
+    """
+    Merge the chunk windows of hits per document. ``hits`` are
+    (document_id, chunk_index, score) tuples; returns document_id ->
+    [(start, end, {hit chunk_index: score})] sorted by start.
+    """
+    windows = {}
+    for document_id, chunk_index, score in hits:
+        windows.setdefault(document_id, []).append(
+            (max(0, chunk_index - window_size), chunk_index + window_size, chunk_index, score)
+        )
+
+    merged = {}
+    for document_id, spans in windows.items():
+        spans.sort()
+        ranges = []
+        for start, end, chunk_index, score in spans:
+            if ranges and start <= ranges[-1][1] + 1:
+                previous_start, previous_end, scores = ranges[-1]
+                ranges[-1] = (previous_start, max(previous_end, end), scores)
+            else:
+                ranges.append((start, end, {}))
+            scores = ranges[-1][2]
+            scores[chunk_index] = max(score, scores.get(chunk_index, score))
+        merged[document_id] = ranges
+    return merged
+
+
+def fetch_windows(windows, knowledge_base_ids):
+    """
+    Load the chunks of every merged window in one query: document_id ->
+    {chunk_index: chunk}. The knowledge base predicate lets partitioned
+    tables prune to the hits' partitions.
+    """
+    from apps.core.db import get_retrieval_alias
+    from apps.documents.models import DocumentChunk
+
+    condition = reduce(or_, (
+        Q(document_id=document_id, chunk_index__range=(start, end))
+        for document_id, ranges in windows.items()
+        for start, end, _ in ranges
+    ))
+    chunks = {}
+    for chunk in DocumentChunk.objects.using(get_retrieval_alias()).filter(
+        condition, knowledge_base_id__in=knowledge_base_ids, is_deleted=False
+    ).only(
+        'id', 'document_id', 'chunk_index', 'start_char', 'end_char', 'content', 'token_count'
+    ):
+        chunks.setdefault(str(chunk.document_id), {})[chunk.chunk_index] = chunk
+    return chunks
+
+
+def _document_titles(results):
+    """Titles of the hits' documents, loading those the hits do not carry in one query."""
+    from apps.core.db import get_retrieval_alias
+    from apps.documents.models import Document, DocumentChunk
+
+    titles, missing = {}, set()
+    for result in results:
+        chunk = result.chunk
+        if DocumentChunk.document.is_cached(chunk):
+            titles[str(chunk.document_id)] = chunk.document.title
+        else:
+            missing.add(chunk.document_id)
+    missing = {document_id for document_id in missing if str(document_id) not in titles}
+    if missing:
+        titles.update(
+            (str(pk), title) for pk, title in
+            Document.objects.using(get_retrieval_alias()).filter(pk__in=missing)
+            .values_list('pk', 'title')
+        )
+    return titles
+
+
+def stitch(chunks):
+    """Join consecutive chunks, keeping the text they share only once. Returns (text, tokens)."""
+    parts, tokens, previous = [], 0.0, None
+    for chunk in chunks:
+        content = chunk.content
+        skip = 0
+        if (previous is not None and len(content) == chunk.end_char - chunk.start_char
+                and previous.start_char <= chunk.start_char < previous.end_char):
+            skip = min(len(content), previous.end_char - chunk.start_char)
+        elif previous is not None:
+            parts.append('\n')
+        parts.append(content[skip:])
+        if content:
+            tokens += (chunk.token_count or 0) * (len(content) - skip) / len(content)
+        previous = chunk
+    return ''.join(parts), round(tokens)
+
+
+def _narrow(chunks, hit_indexes, max_tokens):
+    """Drop the neighbours furthest from a hit until the chunks fit; None if the hits alone do not."""
+    chunks = list(chunks)
+    while True:
+        text, tokens = stitch(chunks)
+        if tokens <= max_tokens:
+            return chunks, text, tokens
+        neighbours = [
+            chunk for chunk in (chunks[0], chunks[-1]) if chunk.chunk_index not in hit_indexes
+        ]
+        if not neighbours:
+            return None
+        furthest = max(
+            neighbours,
+            key=lambda chunk: min(abs(chunk.chunk_index - index) for index in hit_indexes)
+        )
+        chunks.remove(furthest)
+
+
+def expand_context(results, window_size=1, max_tokens=None):
+    """
+    Expand SearchResults into passages of neighbouring chunks, best first,
+    within an optional token budget.
+    """
+    if not results:
+        return []
+
+    windows = merge_windows(
+        [(str(result.chunk.document_id), result.chunk.chunk_index, result.score)
+         for result in results],
+        window_size
+    )
+    chunks = fetch_windows(windows, {result.chunk.knowledge_base_id for result in results})
+    titles = _document_titles(results)
+
+    candidates = []
+    for document_id, ranges in windows.items():
+        document_chunks = chunks.get(document_id, {})
+        for start, end, scores in ranges:
+            window = [
+                document_chunks[index] for index in range(start, end + 1)
+                if index in document_chunks
+            ]
+            if window:
+                candidates.append((max(scores.values()), document_id, window, scores))
+    candidates.sort(key=lambda candidate: -candidate[0])
+
+    passages, seen, remaining = [], set(), max_tokens
+    for score, document_id, window, scores in candidates:
+        if remaining is None:
+            text, tokens = stitch(window)
+        else:
+            narrowed = _narrow(window, set(scores), remaining)
+            if narrowed is None:
+                continue
+            window, text, tokens = narrowed
+        # The same text uploaded twice only needs to be in the prompt once
+        if text in seen:
+            continue
+        seen.add(text)
+        passages.append(Passage(
+            document_id=window[0].document_id,
+            title=titles.get(document_id, ''),
+            start_index=window[0].chunk_index,
+            end_index=window[-1].chunk_index,
+            text=text,
+            token_count=tokens,
+            score=score,
+            hit_indexes=sorted(scores)
+        ))
+        if remaining is not None:
+            remaining -= tokens
+            if remaining <= 0:
+                break
+    return passages
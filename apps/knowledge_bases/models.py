@@ -6,7 +6,7 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
 from apps.core.models import (
     SharedModel, ProcessingStatusModel, MetadataModel,
-    VersionedModel, SoftDeleteModel
+    VersionedModel, SoftDeleteModel, SharedSoftDeleteManager
 )
 
 
@@ -55,6 +55,23 @@ class KnowledgeBase(SharedModel, ProcessingStatusModel, MetadataModel, SoftDelet
         help_text=_('Overlap between adjacent chunks')
     )
 
+    chunking_strategy = models.CharField(
+        _('Chunking strategy'),
+        max_length=20,
+        choices=[
+            ('fixed', _('Fixed window')),
+            ('sentence', _('Sentence aware')),
+            ('recursive', _('Recursive separators')),
+            ('token', _('Token budget')),
+        ],
+        default='recursive',
+        help_text=_(
+            'How documents are split into chunks; token budget sizes are in tokens. '
+            'Fixed and token windows shift after an edit, so re-chunking them '
+            're-embeds most chunks'
+        )
+    )
+
     # Vector Store Configuration
     vector_store_type = models.CharField(
         _('Vector store type'),
@@ -62,6 +79,7 @@ class KnowledgeBase(SharedModel, ProcessingStatusModel, MetadataModel, SoftDelet
         choices=[
             ('pgvector', 'PostgreSQL pgvector'),
             ('qdrant', 'Qdrant'),
+            ('mmap', _('Memory-mapped snapshot')),
         ],
         default='pgvector'
     )
@@ -100,66 +118,285 @@ class KnowledgeBase(SharedModel, ProcessingStatusModel, MetadataModel, SoftDelet
         help_text=_('When the knowledge base was last fully indexed')
     )
 
+    content_version = models.PositiveBigIntegerField(
+        _('Content version'),
+        default=0,
+        editable=False,
+        help_text=_('Incremented when documents, chunks or vectors change; invalidates the semantic cache')
+    )
+
+    objects = SharedSoftDeleteManager()
+
     class Meta:
         verbose_name = _('Knowledge Base')
         verbose_name_plural = _('Knowledge Bases')
         db_table = 'kb_knowledge_base'
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['owner', 'is_public']),
+            models.Index(
+                fields=['owner', 'is_public'],
+                condition=models.Q(is_deleted=False),
+                name='kb_owner_public_live'
+            ),
             models.Index(fields=['status']),
             models.Index(fields=['embedding_model']),
+            models.Index(
+                fields=['deleted_at'],
+                condition=models.Q(is_deleted=True),
+                name='kb_deleted_at'
+            ),
         ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Override save to create this knowledge base's table partitions."""
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+
+        if is_new:
+            self.create_partitions()
+
+    def delete(self, using=None, keep_parents=False):
+        """
+        Soft delete the knowledge base and its live documents; the documents
+        share its deleted_at so restore() can find exactly them.
+        """
+        from django.db import transaction
+        from apps.knowledge_bases.purge import soft_delete_documents
+
+        with transaction.atomic():
+            super().delete(using=using, keep_parents=keep_parents)
+            soft_delete_documents(self)
+
+    def restore(self):
+        """Restore the knowledge base and the documents deleted along with it."""
+        from django.db import transaction
+        from apps.knowledge_bases.purge import restore_documents
+
+        with transaction.atomic():
+            restore_documents(self, self.deleted_at)
+            super().restore()
+
+    def hard_delete(self):
+        """Permanently delete the knowledge base, dropping its partitions first."""
+        self.drop_partitions()
+        super().hard_delete()
+
+    def purge(self, batch_size=5000):
+        """Permanently delete the knowledge base and its data in bounded batches."""
+        from apps.knowledge_bases.purge import purge_knowledge_base
+
+        return purge_knowledge_base(self, batch_size=batch_size)
+
+    @staticmethod
+    def get_partitioned_models():
+        """Models whose tables may be partitioned by knowledge base."""
+        from django.apps import apps
+
+        return [
+            apps.get_model('documents', 'DocumentChunk'),
+            apps.get_model('embeddings', 'DocumentEmbedding'),
+        ]
+
+    def create_partitions(self):
+        """Create the chunk and embedding partitions of this knowledge base, if partitioned."""
+        from apps.core.partitioning import create_partition
+
+        for model_cls in self.get_partitioned_models():
+            create_partition(model_cls, self.pk)
+
+    def drop_partitions(self):
+        """Drop this knowledge base's partitions instead of deleting their rows one by one."""
+        from apps.core.partitioning import drop_partition
+
+        for model_cls in self.get_partitioned_models():
+            drop_partition(model_cls, self.pk)
+
     def increment_document_count(self):
         """Increment the document count."""
-        self.document_count = models.F('document_count') + 1
-        self.save(update_fields=['document_count'])
-        self.refresh_from_db()
+        self.add_to_statistics(documents=1)
 
     def decrement_document_count(self):
         """Decrement the document count."""
-        if self.document_count > 0:
-            self.document_count = models.F('document_count') - 1
-            self.save(update_fields=['document_count'])
-            self.refresh_from_db()
-
-    def update_statistics(self):
-        """Update knowledge base statistics based on current documents and chunks."""
-        from apps.documents.models import Document, DocumentChunk
-
-        # Update document count
-        self.document_count = self.documents.filter(is_deleted=False).count()
-
-        # Update chunk count and total tokens
-        chunk_stats = DocumentChunk.objects.filter(
-            document__knowledge_base=self,
-            document__is_deleted=False
-        ).aggregate(
-            total_chunks=models.Count('id'),
-            total_tokens=models.Sum('token_count') or 0
+        self.add_to_statistics(documents=-1)
+
+    def add_to_statistics(self, documents=0, chunks=0, tokens=0):
+        """
+        Record a change of the document, chunk and token counters.
+
+        The change is appended as a KnowledgeBaseStatisticsDelta row instead of
+        updating this row, so concurrent ingests never wait on each other;
+        rollup_statistics() folds the deltas into the counters and bumps
+        content_version in the same UPDATE.
+        """
+        if documents or chunks or tokens:
+            KnowledgeBaseStatisticsDelta.objects.create(
+                knowledge_base_id=self.pk,
+                documents=documents,
+                chunks=chunks,
+                tokens=tokens
+            )
+
+    def bump_content_version(self):
+        """
+        Invalidate cached retrieval results once the current transaction
+        commits. The UPDATE runs after the commit, so long ingest
+        transactions never hold this row's lock; callers bump once per
+        finished document or job, not per batch.
+        """
+        from django.db import transaction
+
+        transaction.on_commit(
+            lambda: KnowledgeBase._base_manager.filter(pk=self.pk).update(
+                content_version=models.F('content_version') + 1
+            )
         )
 
-        self.chunk_count = chunk_stats['total_chunks']
-        self.total_tokens = chunk_stats['total_tokens']
+    def get_statistics(self):
+        """Get the current counters, including deltas not rolled up yet."""
+        pending = self.statistics_deltas.aggregate(
+            documents=models.Sum('documents', default=0),
+            chunks=models.Sum('chunks', default=0),
+            tokens=models.Sum('tokens', default=0)
+        )
+        return {
+            'document_count': max(0, self.document_count + pending['documents']),
+            'chunk_count': max(0, self.chunk_count + pending['chunks']),
+            'total_tokens': max(0, self.total_tokens + pending['tokens']),
+            'avg_chunk_quality': self.avg_chunk_quality,
+        }
+
+    def get_tokenizer(self):
+        """Get the shared tokenizer of this knowledge base's embedding model."""
+        from apps.embeddings.tokenizers import get_tokenizer_by_name
+
+        return get_tokenizer_by_name(self.embedding_model)
+
+    def get_chunker(self, chunk_size=None, chunk_overlap=None):
+        """Get a chunker for this knowledge base's strategy and sizes."""
+        from apps.documents.chunking import get_chunker
+
+        kwargs = {}
+        if self.chunking_strategy == 'token':
+            kwargs['tokenize'] = self.get_tokenizer().offsets
+
+        return get_chunker(
+            self.chunking_strategy,
+            chunk_size=chunk_size or self.chunk_size,
+            chunk_overlap=self.chunk_overlap if chunk_overlap is None else chunk_overlap,
+            **kwargs
+        )
+
+    def rechunk_documents(self):
+        """Re-chunk every document after chunk_size or chunk_overlap changed."""
+        totals = {'reused': 0, 'moved': 0, 'created': 0, 'deleted': 0}
+        for document in self.documents.filter(is_deleted=False).iterator(chunk_size=100):
+            for key, value in document.rechunk().items():
+                totals[key] += value
+        return totals
+
+    def update_statistics(self, attempts=3):
+        """
+        Recompute knowledge base statistics from the current documents and chunks.
+
+        Chunk count, tokens and average quality come from one aggregate scan;
+        pending statistics deltas are discarded since the recount includes them.
+        The recount and the deltas it discards come from one REPEATABLE READ
+        snapshot, so exactly the deltas of the counted changes are removed;
+        later ones are left to rollup_statistics(). Discarding deltas bumps
+        content_version as their rollup would have. Locks are taken in the
+        rollup's order (deltas, then this row). A concurrent rollup of the
+        same rows makes the snapshot fail to serialize, and the recount is
+        retried up to ``attempts`` times.
+        """
+        from django.db import OperationalError
+
+        for attempt in range(1, attempts + 1):
+            try:
+                return self._recount_statistics()
+            except OperationalError as exc:
+                # serialization_failure, deadlock_detected
+                sqlstate = getattr(exc.__cause__, 'sqlstate', None)
+                if attempt == attempts or sqlstate not in ('40001', '40P01'):
+                    raise
+
+    def _recount_statistics(self):
+        from django.db import connection, transaction
+        from apps.documents.models import DocumentChunk
+
+        # The isolation level must be set by the first statement of the transaction
+        with transaction.atomic(durable=True):
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            delta_ids = list(
+                self.statistics_deltas.select_for_update().values_list('id', flat=True)
+            )
+
+            document_count = self.documents.filter(is_deleted=False).count()
+            chunk_stats = DocumentChunk.objects.filter(
+                knowledge_base=self,
+                is_deleted=False
+            ).aggregate(
+                total_chunks=models.Count('id'),
+                total_tokens=models.Sum('token_count', default=0),
+                avg_quality=models.Avg('quality_score')
+            )
+
+            self.document_count = document_count
+            self.chunk_count = chunk_stats['total_chunks']
+            self.total_tokens = chunk_stats['total_tokens']
+            self.avg_chunk_quality = chunk_stats['avg_quality'] or 0.0
+
+            update = {
+                'document_count': self.document_count,
+                'chunk_count': self.chunk_count,
+                'total_tokens': self.total_tokens,
+                'avg_chunk_quality': self.avg_chunk_quality,
+            }
+            if delta_ids:
+                # The changes behind these deltas invalidate cached results
+                update['content_version'] = models.F('content_version') + 1
+                KnowledgeBaseStatisticsDelta.objects.filter(id__in=delta_ids).delete()
+            KnowledgeBase._base_manager.filter(pk=self.pk).update(**update)
+            if delta_ids:
+                self.content_version += 1
+
+    def get_embedding_model(self):
+        """Get the EmbeddingModel configured for this knowledge base."""
+        from apps.embeddings.models import EmbeddingModel
+
+        return EmbeddingModel.objects.get(name=self.embedding_model)
+
+    def get_vector_store(self):
+        """Get the vector store backend holding this knowledge base's vectors."""
+        from apps.knowledge_bases.vector_stores import get_vector_store
+
+        return get_vector_store(self)
+
+    def export_snapshot(self, root=None, dtype='float32'):
+        """Export chunks and vectors into a memory-mapped snapshot; returns its directory."""
+        from django.conf import settings
+        from apps.knowledge_bases.snapshots import export_snapshot
 
-        # Update average chunk quality
-        quality_avg = DocumentChunk.objects.filter(
-            document__knowledge_base=self,
-            document__is_deleted=False,
-            quality_score__isnull=False
-        ).aggregate(
-            avg_quality=models.Avg('quality_score')
+        config = settings.VECTOR_STORE_CONFIG.get('mmap', {})
+        return export_snapshot(
+            self, root or config['path'], dtype=dtype, keep=config.get('keep', 2)
         )
 
-        self.avg_chunk_quality = quality_avg['avg_quality'] or 0.0
+    def search(self, query, k=10, filters=None):
+        """Return the top-k chunks for a query text or vector as SearchResults."""
+        from apps.knowledge_bases.search import search
+
+        return search(self, query, k=k, filters=filters)
+
+    def hybrid_search(self, query, k=10, filters=None, **kwargs):
+        """Return a SearchResponse fusing vector and full-text retrieval."""
+        from apps.knowledge_bases.search import hybrid_search
 
-        self.save(update_fields=[
-            'document_count', 'chunk_count', 'total_tokens', 'avg_chunk_quality'
-        ])
+        return hybrid_search(self, query, k=k, filters=filters, **kwargs)
 
     def get_embedding_config(self):
         """Get the embedding configuration for this knowledge base."""
@@ -182,6 +419,41 @@ class KnowledgeBase(SharedModel, ProcessingStatusModel, MetadataModel, SoftDelet
         return config
 
 
+class KnowledgeBaseStatisticsDelta(models.Model):
+    """
+    Pending change of a knowledge base's counters.
+
+    Ingest paths append a row per batch instead of updating the knowledge base
+    row; rollup_statistics() periodically sums and deletes the rows.
+    """
+    id = models.BigAutoField(primary_key=True)
+
+    knowledge_base = models.ForeignKey(
+        KnowledgeBase,
+        on_delete=models.CASCADE,
+        related_name='statistics_deltas'
+    )
+
+    documents = models.BigIntegerField(_('Documents'), default=0)
+
+    chunks = models.BigIntegerField(_('Chunks'), default=0)
+
+    tokens = models.BigIntegerField(_('Tokens'), default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Knowledge Base Statistics Delta')
+        verbose_name_plural = _('Knowledge Base Statistics Deltas')
+        db_table = 'kb_statistics_delta'
+        indexes = [
+            models.Index(fields=['knowledge_base']),
+        ]
+
+    def __str__(self):
+        return f"{self.knowledge_base_id}: {self.documents:+d} documents, {self.chunks:+d} chunks"
+
+
 class KnowledgeBaseTag(models.Model):
     """
     Tags for categorizing knowledge bases.
@@ -0,0 +1,151 @@
+"""
+Soft delete cascade, restore and background purge of knowledge base data.
+
+Soft deleting a knowledge base stamps its live documents with the knowledge
+base's own ``deleted_at``; restore finds exactly those documents through the
+``(knowledge_base, deleted_at) WHERE is_deleted`` partial index, leaving
+documents deleted on their own before untouched.
+
+Purging removes soft deleted data for good. Partitioned tables drop the whole
+partition; otherwise rows are deleted in batches of ``batch_size`` primary keys
+so no single statement holds locks on millions of rows. Vectors held outside
+the database go through the knowledge base's vector store: a purged document's
+vectors are deleted and a purged knowledge base's collection is dropped. Progress is stored in
+``KnowledgeBase.metadata['purge']`` after every batch, so a purge can be
+watched and an interrupted one simply runs again.
+
+    python manage.py shell -c "from apps.knowledge_bases.purge import purge_deleted; purge_deleted()"
+"""
+import logging
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _mirrored_models():
+    from apps.documents.models import DocumentChunk
+    from apps.embeddings.models import DocumentEmbedding
+
+    return [DocumentEmbedding, DocumentChunk]
+
+
+def soft_delete_documents(knowledge_base):
+    """Soft delete the live documents of a soft deleted knowledge base."""
+    from apps.documents.models import Document
+
+    Document.objects.filter(knowledge_base=knowledge_base).update(
+        is_deleted=True, deleted_at=knowledge_base.deleted_at
+    )
+    for model_cls in _mirrored_models():
+        model_cls.objects.filter(
+            knowledge_base_id=knowledge_base.pk, is_deleted=False
+        ).update(is_deleted=True)
+
+
+def restore_documents(knowledge_base, deleted_at):
+    """Restore the documents soft deleted together with a knowledge base at deleted_at."""
+    from apps.documents.models import Document
+
+    documents = Document.objects.deleted_only().filter(
+        knowledge_base=knowledge_base, deleted_at=deleted_at
+    )
+    for model_cls in _mirrored_models():
+        model_cls.objects.filter(
+            knowledge_base_id=knowledge_base.pk,
+            is_deleted=True,
+            document_id__in=documents.values('pk')
+        ).update(is_deleted=False)
+    return documents.update(is_deleted=False, deleted_at=None)
+
+
+def delete_in_batches(queryset, batch_size=5000):
+    """Delete the rows of a queryset batch_size primary keys at a time; yields counts."""
+    while True:
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        with transaction.atomic():
+            deleted, _ = queryset.filter(pk__in=pks).delete()
+        yield deleted
+
+
+def record_purge_progress(knowledge_base, progress):
+    """Store purge progress on the knowledge base without touching other columns."""
+    from apps.knowledge_bases.models import KnowledgeBase
+
+    knowledge_base.set_metadata('purge', progress)
+    KnowledgeBase.objects.all_with_deleted().filter(pk=knowledge_base.pk).update(
+        metadata=knowledge_base.metadata
+    )
+
+
+def purge_knowledge_base(knowledge_base, batch_size=5000):
+    """
+    Permanently delete a knowledge base with its embeddings, chunks and
+    documents. Returns the number of rows deleted per model.
+    """
+    from apps.documents.models import Document
+
+    progress = {'started_at': timezone.now().isoformat(), 'deleted': {}}
+    record_purge_progress(knowledge_base, progress)
+
+    # A partitioned table drops its partition in one statement
+    knowledge_base.drop_partitions()
+
+    stages = [
+        (model_cls, model_cls.objects.filter(knowledge_base_id=knowledge_base.pk))
+        for model_cls in _mirrored_models()
+    ]
+    stages.append(
+        (Document, Document.objects.all_with_deleted().filter(knowledge_base=knowledge_base))
+    )
+
+    for model_cls, queryset in stages:
+        name = model_cls._meta.label
+        progress['stage'] = name
+        for deleted in delete_in_batches(queryset, batch_size):
+            progress['deleted'][name] = progress['deleted'].get(name, 0) + deleted
+            record_purge_progress(knowledge_base, progress)
+
+    # Dropped last, so a failing store leaves the knowledge base to purge again
+    knowledge_base.get_vector_store().drop_collection()
+    knowledge_base.hard_delete()
+    logger.info("Purged knowledge base %s: %s", knowledge_base.pk, progress['deleted'])
+    return progress['deleted']
+
+
+def purge_document(document, batch_size=5000):
+    """Permanently delete a document with its vectors, embeddings and chunks."""
+    document.knowledge_base.get_vector_store().delete_documents([document.pk])
+    deleted = {}
+    for model_cls in _mirrored_models():
+        queryset = model_cls.objects.filter(
+            knowledge_base_id=document.knowledge_base_id, document_id=document.pk
+        )
+        deleted[model_cls._meta.label] = sum(delete_in_batches(queryset, batch_size))
+    document.hard_delete()
+    return deleted
+
+
+def purge_deleted(older_than=timedelta(days=30), batch_size=5000):
+    """
+    Purge knowledge bases and documents soft deleted more than older_than ago.
+    Returns the number of knowledge bases and documents purged.
+    """
+    from apps.documents.models import Document
+    from apps.knowledge_bases.models import KnowledgeBase
+
+    cutoff = timezone.now() - older_than
+    knowledge_bases = documents = 0
+
+    for knowledge_base in KnowledgeBase.objects.deleted_only().filter(deleted_at__lt=cutoff):
+        purge_knowledge_base(knowledge_base, batch_size=batch_size)
+        knowledge_bases += 1
+
+    for document in Document.objects.deleted_only().filter(deleted_at__lt=cutoff).iterator():
+        purge_document(document, batch_size=batch_size)
+        documents += 1
+
+    return {'knowledge_bases': knowledge_bases, 'documents': documents}
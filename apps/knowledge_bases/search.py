@@ -0,0 +1,388 @@
+"""
+Retrieval services for knowledge bases.
+
+``search()`` is pure vector retrieval. ``hybrid_search()`` runs vector and
+lexical (PostgreSQL full-text) retrieval, fuses both rankings with reciprocal
+rank fusion and reports the latency of every stage.
+
+Both consult the semantic cache (apps/embeddings/semantic_cache.py) first:
+a query close enough to an earlier one with the same parameters reuses its
+hits while the knowledge base content is unchanged.
+
+``asearch()`` and ``ahybrid_search()`` are the async variants used by the API.
+Database work runs in worker threads (``thread_sensitive=False``), so the
+vector and lexical lookups of a hybrid search run concurrently and the event
+loop only waits on I/O.
+"""
+import asyncio
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import reduce
+from operator import or_
+from django.db.models import F, Q, Value
+from apps.knowledge_bases.vector_stores import VectorHit
+
+# ts_rank normalisation: divide by 1 + log(document length), then scale to 0-1
+LEXICAL_RANK_NORMALIZATION = 1 | 32
+
+LEXICAL_FILTER_LOOKUPS = {
+    'document_id': 'document_id',
+    'file_type': 'document__file_type',
+    'language': 'document__language',
+}
+
+
+@dataclass
+class SearchResult:
+    """A retrieved chunk and its score (higher is better)."""
+    chunk: object
+    score: float
+    scores: dict = field(default_factory=dict)
+
+
+@dataclass
+class SearchResponse:
+    """Results of a hybrid search with per-stage latencies in milliseconds."""
+    results: list
+    timings: dict
+
+
+def resolve_hits(hits, knowledge_base_id):
+    """
+    Load the DocumentChunks behind vector store hits in one query, keeping hit
+    order. The knowledge base predicate lets partitioned tables prune to its
+    partition.
+    """
+    from apps.core.db import get_retrieval_alias
+    from apps.documents.models import DocumentChunk
+
+    if not hits:
+        return []
+
+    condition = reduce(or_, (
+        Q(document_id=hit.document_id, chunk_index=hit.chunk_index) for hit in hits
+    ))
+    chunks = {
+        (str(chunk.document_id), chunk.chunk_index): chunk
+        for chunk in DocumentChunk.objects.using(get_retrieval_alias())
+        .filter(condition, knowledge_base_id=knowledge_base_id, is_deleted=False)
+        .select_related('document')
+    }
+
+    results = []
+    for hit in hits:
+        chunk = chunks.get((str(hit.document_id), hit.chunk_index))
+        if chunk is not None:
+            results.append(SearchResult(chunk=chunk, score=hit.score))
+    return results
+
+
+def embed_query(knowledge_base, query, embedding_model=None, use_database=True):
+    """
+    Return the vector for a query text (through the query cache) or pass a
+    vector through. Without use_database the cache's QueryEmbedding layer is
+    skipped, for stores that serve searches without the database.
+    """
+    from apps.embeddings.cache import get_query_cache
+
+    if isinstance(query, str):
+        return get_query_cache().get_or_embed(
+            embedding_model or knowledge_base.get_embedding_model(), query, use_database
+        )
+    return query
+
+
+def get_cached_hits(knowledge_base, store, vector, kind, params):
+    """Hits and stage scores of a semantically equivalent earlier query, or None."""
+    from apps.embeddings.semantic_cache import get_semantic_cache
+
+    if not store.uses_database:
+        return None
+    payload = get_semantic_cache().get(
+        knowledge_base, store.embedding_model, vector, kind, params
+    )
+    if payload is None:
+        return None
+
+    hits = [VectorHit(*hit) for hit in payload['hits']]
+    stage_scores = defaultdict(dict)
+    for hit, scores in zip(hits, payload.get('scores', [])):
+        for stage, score in scores.items():
+            stage_scores[stage][(str(hit.document_id), hit.chunk_index)] = score
+    return hits, stage_scores
+
+
+def cache_hits(knowledge_base, store, query, vector, kind, params, hits, stage_scores=None):
+    """Store hits in the semantic cache; the knowledge base was loaded before retrieval."""
+    from apps.embeddings.semantic_cache import get_semantic_cache
+
+    if not store.uses_database:
+        return
+    payload = {'hits': [
+        [str(hit.document_id), hit.chunk_index, float(hit.score)] for hit in hits
+    ]}
+    if stage_scores is not None:
+        keys = [(str(hit.document_id), hit.chunk_index) for hit in hits]
+        payload['scores'] = [
+            {stage: float(scores[key]) for stage, scores in stage_scores.items() if key in scores}
+            for key in keys
+        ]
+    get_semantic_cache().set(
+        knowledge_base, store.embedding_model, query, vector, kind, params, payload
+    )
+
+
+def search(knowledge_base, query, k=10, filters=None):
+    """
+    Return the top-k chunks of a knowledge base for a query.
+    ``query`` is either text, embedded with the knowledge base's model, or a vector.
+    """
+    store = knowledge_base.get_vector_store()
+    vector = embed_query(knowledge_base, query, store.embedding_model, store.uses_database)
+    params = {'k': k, 'filters': filters}
+    cached = get_cached_hits(knowledge_base, store, vector, 'search', params)
+    if cached is not None:
+        return store.resolve_hits(cached[0])
+
+    hits = store.search(vector, k=k, filters=filters)
+    cache_hits(knowledge_base, store, query, vector, 'search', params, hits)
+    return store.resolve_hits(hits)
+
+
+def lexical_search(knowledge_base, text, k=10, filters=None):
+    """
+    Rank chunks by full-text relevance using the GIN-indexed search_vector.
+
+    PostgreSQL has no BM25; ts_rank with length normalisation and keyword
+    weighting (keywords 'A', content 'B') is the closest built-in equivalent.
+    """
+    from django.contrib.postgres.search import SearchQuery, SearchRank
+    from apps.core.db import get_retrieval_alias
+    from apps.documents.models import DocumentChunk, TEXT_SEARCH_CONFIG
+
+    query = SearchQuery(text, config=TEXT_SEARCH_CONFIG, search_type='websearch')
+    queryset = DocumentChunk.objects.using(get_retrieval_alias()).filter(
+        knowledge_base_id=knowledge_base.id,
+        is_deleted=False,
+        search_vector=query
+    )
+    for name, value in (filters or {}).items():
+        if name not in LEXICAL_FILTER_LOOKUPS:
+            raise ValueError(f"Unsupported search filter: {name}")
+        lookup = LEXICAL_FILTER_LOOKUPS[name]
+        if isinstance(value, (list, tuple, set)):
+            queryset = queryset.filter(**{f"{lookup}__in": value})
+        else:
+            queryset = queryset.filter(**{lookup: value})
+
+    rows = queryset.annotate(
+        rank=SearchRank(
+            F('search_vector'), query,
+            normalization=Value(LEXICAL_RANK_NORMALIZATION)
+        )
+    ).order_by('-rank').values_list('document_id', 'chunk_index', 'rank')[:k]
+
+    return [VectorHit(document_id, chunk_index, rank) for document_id, chunk_index, rank in rows]
+
+
+def reciprocal_rank_fusion(rankings, k=60, weights=None):
+    """
+    Fuse several best-first hit lists into one list of (key, score) pairs.
+    Each list contributes weight / (k + rank) for every key it contains.
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        for rank, hit in enumerate(ranking, start=1):
+            scores[(str(hit.document_id), hit.chunk_index)] += weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def _elapsed_ms(started):
+    return (time.perf_counter() - started) * 1000
+
+
+def _fuse(vector_hits, lexical_hits, k, rrf_k, weights):
+    """Fuse vector and lexical hits; returns the top-k hits and per-stage scores."""
+    fused = reciprocal_rank_fusion([vector_hits, lexical_hits], k=rrf_k, weights=list(weights))[:k]
+    stage_scores = {
+        'vector': {(str(hit.document_id), hit.chunk_index): hit.score for hit in vector_hits},
+        'lexical': {(str(hit.document_id), hit.chunk_index): hit.score for hit in lexical_hits},
+    }
+    return [VectorHit(key[0], key[1], score) for key, score in fused], stage_scores
+
+
+def _attach_stage_scores(results, stage_scores):
+    for result in results:
+        key = (str(result.chunk.document_id), result.chunk.chunk_index)
+        result.scores = {
+            stage: scores[key] for stage, scores in stage_scores.items() if key in scores
+        }
+    return results
+
+
+def _hybrid_params(query, k, filters, candidates, rrf_k, weights):
+    """
+    Semantic cache parameters of a hybrid search. The lexical leg ranks by the
+    query's words, which a near-identical embedding does not pin down, so
+    entries only match the same normalized query text.
+    """
+    from apps.embeddings.cache import normalize_query
+
+    return {
+        'query': normalize_query(query), 'k': k, 'filters': filters,
+        'candidates': candidates, 'rrf_k': rrf_k, 'weights': list(weights),
+    }
+
+
+def hybrid_search(knowledge_base, query, k=10, filters=None, candidates=None,
+                  rrf_k=60, weights=(1.0, 1.0)):
+    """
+    Combine vector and lexical retrieval with reciprocal rank fusion.
+
+    Each stage retrieves ``candidates`` hits (4 * k by default) before fusion.
+    Returns a SearchResponse whose timings hold 'embed', 'cache', 'vector',
+    'lexical', 'fusion', 'resolve' and 'total' latencies in milliseconds;
+    semantic cache hits skip 'vector', 'lexical' and 'fusion'.
+
+    The lexical stage always queries PostgreSQL's full-text index, so with
+    a memory-mapped store only vector search() runs without the database.
+    """
+    candidates = candidates or k * 4
+    timings = {}
+    total_started = time.perf_counter()
+
+    store = knowledge_base.get_vector_store()
+    started = time.perf_counter()
+    vector = embed_query(knowledge_base, query, store.embedding_model, store.uses_database)
+    timings['embed'] = _elapsed_ms(started)
+
+    params = _hybrid_params(query, k, filters, candidates, rrf_k, weights)
+    started = time.perf_counter()
+    cached = get_cached_hits(knowledge_base, store, vector, 'hybrid', params)
+    timings['cache'] = _elapsed_ms(started)
+
+    if cached is not None:
+        fused, stage_scores = cached
+    else:
+        started = time.perf_counter()
+        vector_hits = store.search(vector, k=candidates, filters=filters)
+        timings['vector'] = _elapsed_ms(started)
+
+        started = time.perf_counter()
+        lexical_hits = lexical_search(knowledge_base, query, k=candidates, filters=filters)
+        timings['lexical'] = _elapsed_ms(started)
+
+        started = time.perf_counter()
+        fused, stage_scores = _fuse(vector_hits, lexical_hits, k, rrf_k, weights)
+        timings['fusion'] = _elapsed_ms(started)
+        cache_hits(knowledge_base, store, query, vector, 'hybrid', params, fused, stage_scores)
+
+    started = time.perf_counter()
+    results = _attach_stage_scores(store.resolve_hits(fused), stage_scores)
+    timings['resolve'] = _elapsed_ms(started)
+
+    timings['total'] = _elapsed_ms(total_started)
+    return SearchResponse(results=results, timings=timings)
+
+
+def _run_sync(func):
+    from apps.core.db import db_sync_to_async
+
+    return db_sync_to_async(func)
+
+
+async def _timed(timings, stage, awaitable):
+    started = time.perf_counter()
+    result = await awaitable
+    timings[stage] = _elapsed_ms(started)
+    return result
+
+
+def _load_vector_store(knowledge_base):
+    """Vector store with its embedding model (and any snapshot it maps) loaded."""
+    store = knowledge_base.get_vector_store()
+    if store.uses_database:
+        store.embedding_model = knowledge_base.get_embedding_model()
+    else:
+        store.embedding_model
+    return store
+
+
+async def _aget_vector_store(knowledge_base):
+    """Vector store loaded off the event loop; mmap stores open their snapshot there."""
+    return await _run_sync(_load_vector_store)(knowledge_base)
+
+
+async def aembed_query(knowledge_base, query, embedding_model=None, use_database=True):
+    """Async embed_query()."""
+    from apps.embeddings.cache import get_query_cache
+
+    if not isinstance(query, str):
+        return query
+    if embedding_model is None:
+        embedding_model = await _run_sync(knowledge_base.get_embedding_model)()
+    return await get_query_cache().aget_or_embed(embedding_model, query, use_database)
+
+
+async def asearch(knowledge_base, query, k=10, filters=None):
+    """Async search()."""
+    store = await _aget_vector_store(knowledge_base)
+    vector = await aembed_query(
+        knowledge_base, query, store.embedding_model, store.uses_database
+    )
+    params = {'k': k, 'filters': filters}
+    cached = await _run_sync(get_cached_hits)(knowledge_base, store, vector, 'search', params)
+    if cached is not None:
+        return await _run_sync(store.resolve_hits)(cached[0])
+
+    hits = await _run_sync(store.search)(vector, k=k, filters=filters)
+    await _run_sync(cache_hits)(knowledge_base, store, query, vector, 'search', params, hits)
+    return await _run_sync(store.resolve_hits)(hits)
+
+
+async def ahybrid_search(knowledge_base, query, k=10, filters=None, candidates=None,
+                         rrf_k=60, weights=(1.0, 1.0)):
+    """
+    Async hybrid_search(). The vector and lexical lookups run concurrently, so
+    'vector' and 'lexical' timings overlap and 'total' is less than their sum.
+    """
+    candidates = candidates or k * 4
+    timings = {}
+    total_started = time.perf_counter()
+
+    store = await _aget_vector_store(knowledge_base)
+    vector = await _timed(timings, 'embed', aembed_query(
+        knowledge_base, query, store.embedding_model, store.uses_database
+    ))
+
+    params = _hybrid_params(query, k, filters, candidates, rrf_k, weights)
+    cached = await _timed(timings, 'cache', _run_sync(get_cached_hits)(
+        knowledge_base, store, vector, 'hybrid', params
+    ))
+
+    if cached is not None:
+        fused, stage_scores = cached
+    else:
+        vector_hits, lexical_hits = await asyncio.gather(
+            _timed(timings, 'vector', _run_sync(store.search)(
+                vector, k=candidates, filters=filters
+            )),
+            _timed(timings, 'lexical', _run_sync(lexical_search)(
+                knowledge_base, query, k=candidates, filters=filters
+            )),
+        )
+
+        started = time.perf_counter()
+        fused, stage_scores = _fuse(vector_hits, lexical_hits, k, rrf_k, weights)
+        timings['fusion'] = _elapsed_ms(started)
+        await _run_sync(cache_hits)(
+            knowledge_base, store, query, vector, 'hybrid', params, fused, stage_scores
+        )
+
+    results = await _timed(timings, 'resolve', _run_sync(store.resolve_hits)(fused))
+    _attach_stage_scores(results, stage_scores)
+
+    timings['total'] = _elapsed_ms(total_started)
+    return SearchResponse(results=results, timings=timings)
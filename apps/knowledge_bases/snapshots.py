@@ -0,0 +1,346 @@
+"""
+Memory-mapped snapshots of a knowledge base's chunks and vectors.
+
+``export_snapshot()`` writes everything needed to answer vector searches into
+one directory per version:
+
+    <root>/kb_<id>/CURRENT               name of the live version
+    <root>/kb_<id>/<version>/
+        manifest.json                    model, metric, dtype, row count, documents
+        vectors.f32 | vectors.i8         contiguous (rows, dimension) matrix
+        scales.f32                       per-row int8 scale (int8 only)
+        norms.f32                        per-row squared norm (l2 only)
+        documents.u32, chunks.u32        document ordinal and chunk_index per row
+        text.bin, text_offsets.u64       UTF-8 chunk text and (rows + 1) offsets
+
+Rows are ordered by (document, chunk_index) and cosine vectors are normalised
+at export, so search is a blocked matrix product and hits are resolved to
+text by binary search, without any database query. The OS page cache shares
+the mapped files across worker processes, and opening a snapshot only reads
+its manifest.
+
+A new export becomes live by atomically replacing CURRENT, so readers keep
+answering from the previous version until they reopen. The database stays the
+source of truth: re-export after ingesting.
+"""
+import json
+import os
+import shutil
+import threading
+import uuid
+from django.utils import timezone
+
+FORMAT_VERSION = 1
+
+# Rows scored per matrix product, bounding temporary memory
+SEARCH_BLOCK_ROWS = 65536
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def snapshot_root(knowledge_base, root):
+    """Directory holding every snapshot version of a knowledge base."""
+    return os.path.join(root, f"kb_{knowledge_base.id}")
+
+
+def current_version(path):
+    """Directory of the live snapshot version, or None when nothing was exported."""
+    try:
+        with open(os.path.join(path, 'CURRENT'), encoding='utf-8') as current:
+            return os.path.join(path, current.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def export_snapshot(knowledge_base, root, dtype='float32', batch_size=2000, keep=2):
+    """
+    Export the live chunks and vectors of a knowledge base into a new snapshot
+    version and make it current. Returns the version directory.
+    """
+    import numpy as np
+    from apps.documents.models import Document
+    from apps.embeddings.models import DocumentEmbedding
+    from apps.embeddings.quantization import VECTOR_FIELDS, decode
+
+    if dtype not in ('float32', 'int8'):
+        raise ValueError(f"Unsupported snapshot dtype {dtype}")
+
+    embedding_model = knowledge_base.get_embedding_model()
+    metric = embedding_model.distance_metric
+    path = snapshot_root(knowledge_base, root)
+    version = f"{timezone.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    directory = os.path.join(path, version)
+    os.makedirs(directory)
+
+    documents = {
+        document_id: {'id': str(document_id), 'title': title, 'file_type': file_type,
+                      'language': language}
+        for document_id, title, file_type, language in Document.objects.filter(
+            knowledge_base=knowledge_base
+        ).values_list('id', 'title', 'file_type', 'language')
+    }
+    ordinals = {}
+
+    queryset = DocumentEmbedding.objects.filter(
+        knowledge_base_id=knowledge_base.id,
+        embedding_model=embedding_model,
+        is_deleted=False
+    ).order_by('document_id', 'chunk_index')
+
+    files = {
+        name: open(os.path.join(directory, name), 'wb')
+        for name in ('vectors.i8' if dtype == 'int8' else 'vectors.f32',
+                     'documents.u32', 'chunks.u32', 'text.bin', 'text_offsets.u64')
+    }
+    if dtype == 'int8':
+        files['scales.f32'] = open(os.path.join(directory, 'scales.f32'), 'wb')
+    if metric == 'l2':
+        files['norms.f32'] = open(os.path.join(directory, 'norms.f32'), 'wb')
+
+    rows, text_offset, last = 0, 0, None
+    try:
+        np.zeros(1, dtype=np.uint64).tofile(files['text_offsets.u64'])
+        while True:
+            page = queryset
+            if last is not None:
+                page = page.filter(document_id__gte=last[0]).exclude(
+                    document_id=last[0], chunk_index__lte=last[1]
+                )
+            batch = list(page.values_list(
+                'document_id', 'chunk_index', 'text_content', *VECTOR_FIELDS
+            )[:batch_size])
+            if not batch:
+                break
+            last = batch[-1][:2]
+
+            vectors = []
+            for row in batch:
+                vector = decode(dict(zip(VECTOR_FIELDS, row[3:])))
+                if vector is None:
+                    raise ValueError(
+                        f"{embedding_model} stores only sign bits; snapshots need "
+                        f"keep_full_precision or a float16/int8 storage type"
+                    )
+                vectors.append(vector)
+            matrix = np.stack(vectors).astype(np.float32)
+
+            if metric == 'cosine':
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                matrix /= np.where(norms == 0, 1.0, norms)
+            if metric == 'l2':
+                np.einsum('ij,ij->i', matrix, matrix).astype(np.float32).tofile(files['norms.f32'])
+            if dtype == 'int8':
+                peaks = np.abs(matrix).max(axis=1)
+                scales = np.where(peaks == 0, 1.0, peaks / 127).astype(np.float32)
+                np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8).tofile(
+                    files['vectors.i8']
+                )
+                scales.tofile(files['scales.f32'])
+            else:
+                matrix.tofile(files['vectors.f32'])
+
+            document_ordinals = [
+                ordinals.setdefault(document_id, len(ordinals)) for document_id, *_ in batch
+            ]
+            np.asarray(document_ordinals, dtype=np.uint32).tofile(files['documents.u32'])
+            np.asarray([row[1] for row in batch], dtype=np.uint32).tofile(files['chunks.u32'])
+
+            offsets = []
+            for row in batch:
+                encoded = (row[2] or '').encode('utf-8')
+                files['text.bin'].write(encoded)
+                text_offset += len(encoded)
+                offsets.append(text_offset)
+            np.asarray(offsets, dtype=np.uint64).tofile(files['text_offsets.u64'])
+            rows += len(batch)
+    except BaseException:
+        for file in files.values():
+            file.close()
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    for file in files.values():
+        file.close()
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'knowledge_base_id': str(knowledge_base.id),
+        'exported_at': timezone.now().isoformat(),
+        'embedding_model': {
+            'id': str(embedding_model.pk),
+            'name': embedding_model.name,
+            'provider': embedding_model.provider,
+            'model_id': embedding_model.model_id,
+            'dimension': embedding_model.dimension,
+            'max_tokens': embedding_model.max_tokens,
+            'distance_metric': metric,
+            'config': embedding_model.config,
+        },
+        'dtype': dtype,
+        'rows': rows,
+        # Rows of a document are contiguous, in ordinal order
+        'documents': [documents[document_id] for document_id in ordinals],
+    }
+    with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file)
+
+    current = os.path.join(path, f"CURRENT.{version}")
+    with open(current, 'w', encoding='utf-8') as file:
+        file.write(version)
+    os.replace(current, os.path.join(path, 'CURRENT'))
+    prune_snapshots(path, keep=keep)
+    return directory
+
+
+def prune_snapshots(path, keep=2):
+    """Delete all but the newest ``keep`` versions, never the current one."""
+    current = current_version(path)
+    versions = sorted(
+        entry for entry in os.listdir(path)
+        if os.path.isdir(os.path.join(path, entry))
+    )
+    for version in versions[:-keep] if keep else versions:
+        directory = os.path.join(path, version)
+        if directory != current:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class MmapIndex:
+    """
+    Read-only searcher over one snapshot version, backed by np.memmap.
+    """
+
+    def __init__(self, directory):
+        import numpy as np
+
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as file:
+            self.manifest = json.load(file)
+        if self.manifest['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {self.manifest['format_version']}")
+
+        self.rows = self.manifest['rows']
+        self.dimension = self.manifest['embedding_model']['dimension']
+        self.metric = self.manifest['embedding_model']['distance_metric']
+        self.dtype = self.manifest['dtype']
+        self.documents = self.manifest['documents']
+        self.document_ordinals = {
+            document['id']: ordinal for ordinal, document in enumerate(self.documents)
+        }
+
+        def mapped(name, dtype, shape):
+            if not self.rows:
+                return np.zeros(shape, dtype=dtype)
+            return np.memmap(os.path.join(directory, name), dtype=dtype, mode='r', shape=shape)
+
+        if self.dtype == 'int8':
+            self.vectors = mapped('vectors.i8', np.int8, (self.rows, self.dimension))
+            self.scales = mapped('scales.f32', np.float32, (self.rows,))
+        else:
+            self.vectors = mapped('vectors.f32', np.float32, (self.rows, self.dimension))
+        self.norms = mapped('norms.f32', np.float32, (self.rows,)) if self.metric == 'l2' else None
+        self.row_documents = mapped('documents.u32', np.uint32, (self.rows,))
+        self.chunk_indexes = mapped('chunks.u32', np.uint32, (self.rows,))
+        self.text_offsets = mapped('text_offsets.u64', np.uint64, (self.rows + 1,))
+        self._text = None
+
+    def filter_mask(self, filters):
+        """Boolean row mask for document_id / file_type / language filters, or None."""
+        import numpy as np
+
+        if not filters:
+            return None
+        allowed = []
+        for ordinal, document in enumerate(self.documents):
+            if all(
+                str(document[field]) in (
+                    {str(item) for item in value}
+                    if isinstance(value, (list, tuple, set)) else {str(value)}
+                )
+                for field, value in filters.items()
+            ):
+                allowed.append(ordinal)
+        return np.isin(self.row_documents, np.asarray(allowed, dtype=np.uint32))
+
+    def scores(self, vector):
+        """Similarity of every row to a query vector (higher is better)."""
+        import numpy as np
+
+        query = np.asarray(vector, dtype=np.float32)
+        if self.metric == 'cosine':
+            norm = np.linalg.norm(query)
+            query = query / (norm or 1.0)
+
+        scores = np.empty(self.rows, dtype=np.float32)
+        for start in range(0, self.rows, SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, self.rows)
+            block = self.vectors[start:end].astype(np.float32, copy=False) @ query
+            if self.dtype == 'int8':
+                block *= self.scales[start:end]
+            scores[start:end] = block
+
+        if self.metric == 'l2':
+            # -||x - q|| from the stored squared norms
+            return -np.sqrt(np.maximum(self.norms - 2 * scores + query @ query, 0))
+        return scores
+
+    def search(self, vector, k=10, filters=None):
+        """Top-k (row, score) pairs, best first."""
+        import numpy as np
+
+        if not self.rows:
+            return []
+        scores = self.scores(vector)
+        mask = self.filter_mask(filters)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+
+        k = min(k, self.rows)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top if np.isfinite(scores[row])]
+
+    def find_row(self, document_id, chunk_index):
+        """Row of a chunk, or None when it is not in the snapshot."""
+        import numpy as np
+
+        ordinal = self.document_ordinals.get(str(document_id))
+        if ordinal is None:
+            return None
+        start = int(np.searchsorted(self.row_documents, ordinal, side='left'))
+        end = int(np.searchsorted(self.row_documents, ordinal, side='right'))
+        position = start + int(np.searchsorted(self.chunk_indexes[start:end], chunk_index))
+        if position < end and self.chunk_indexes[position] == chunk_index:
+            return position
+        return None
+
+    def text(self, row):
+        """Chunk text of a row."""
+        import numpy as np
+
+        if self._text is None:
+            self._text = np.memmap(os.path.join(self.directory, 'text.bin'), dtype=np.uint8, mode='r')
+        start, end = int(self.text_offsets[row]), int(self.text_offsets[row + 1])
+        return bytes(self._text[start:end]).decode('utf-8')
+
+    def document(self, row):
+        """Document metadata of a row."""
+        return self.documents[int(self.row_documents[row])]
+
+    def chunk_index(self, row):
+        return int(self.chunk_indexes[row])
+
+
+def open_snapshot(path):
+    """
+    Return the MmapIndex of the current version under ``path``, or None.
+    Indexes are shared per process and reopened when CURRENT changes.
+    """
+    directory = current_version(path)
+    if directory is None:
+        return None
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None or index.directory != directory:
+            index = _indexes[path] = MmapIndex(directory)
+        return index
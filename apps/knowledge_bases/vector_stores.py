@@ -0,0 +1,636 @@
+"""
+Vector store backends for knowledge base retrieval.
+
+Every backend stores one vector per document chunk, keyed like DocumentEmbedding
+by ``(document_id, chunk_index)``, and answers top-k queries with scores where
+higher is better. The backend class for each ``vector_store_type`` comes from
+``settings.VECTOR_STORE_CONFIG[<type>]['backend']``, so tests can point both
+types at NumpyVectorStore, and read-only deployments can serve every type from
+memory-mapped snapshots with MmapVectorStore.
+"""
+import threading
+from collections import namedtuple
+from django.db import connections, transaction
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+VectorHit = namedtuple('VectorHit', ['document_id', 'chunk_index', 'score'])
+
+
+def distance_to_score(metric, distance):
+    """Convert a pgvector distance into a similarity score (higher is better)."""
+    if metric == 'cosine':
+        return 1.0 - distance
+    # L2 distance grows with dissimilarity; MaxInnerProduct returns the negated product
+    return -distance
+
+
+def get_vector_store(knowledge_base):
+    """Instantiate the vector store backend configured for a knowledge base."""
+    config = knowledge_base.get_vector_store_config()
+    backend = import_string(config['backend'])
+    return backend(knowledge_base, config)
+
+
+class VectorStore:
+    """
+    Interface implemented by every vector store backend.
+
+    Filters are a dict restricted to FILTER_FIELDS; list values match any of
+    the given values.
+    """
+    FILTER_FIELDS = ('document_id', 'file_type', 'language')
+
+    # Whether search needs the EmbeddingModel row (and resolve_hits the chunks) from the database
+    uses_database = True
+
+    def __init__(self, knowledge_base, config):
+        self.knowledge_base = knowledge_base
+        self.config = config
+        self.collection_name = config['collection_name']
+        self.dimension = config['dimension']
+
+    @cached_property
+    def embedding_model(self):
+        """The EmbeddingModel whose vectors this store holds."""
+        return self.knowledge_base.get_embedding_model()
+
+    def validate_filters(self, filters):
+        """Reject filters the backends cannot evaluate."""
+        unknown = set(filters or {}) - set(self.FILTER_FIELDS)
+        if unknown:
+            raise ValueError(f"Unsupported search filters: {', '.join(sorted(unknown))}")
+        return filters or {}
+
+    @staticmethod
+    def get_payload(chunk):
+        """Return the filterable payload stored alongside a chunk's vector."""
+        return {
+            'document_id': str(chunk.document_id),
+            'chunk_index': chunk.chunk_index,
+            'file_type': chunk.document.file_type,
+            'language': chunk.document.language,
+        }
+
+    def upsert(self, chunks, vectors):
+        """Insert or replace the vectors of the given chunks."""
+        raise NotImplementedError
+
+    def delete_documents(self, document_ids):
+        """Remove every vector belonging to the given documents."""
+        raise NotImplementedError
+
+    def delete_chunks(self, document_id, chunk_indexes):
+        """Remove the vectors of the given chunk indexes of a document."""
+        raise NotImplementedError
+
+    def drop_collection(self):
+        """Remove the whole collection of a purged knowledge base."""
+        raise NotImplementedError
+
+    def move_chunks(self, moved):
+        """
+        Re-key vectors of re-chunked documents. ``moved`` is a list of
+        (old chunk_index, chunk) pairs, each chunk carrying its new index.
+        """
+        raise NotImplementedError
+
+    def search(self, vector, k=10, filters=None):
+        """Return up to k VectorHits ordered by descending score."""
+        raise NotImplementedError
+
+    def resolve_hits(self, hits):
+        """Return SearchResults for hits, loading their chunks in one query."""
+        from apps.knowledge_bases.search import resolve_hits
+
+        return resolve_hits(hits, self.knowledge_base.id)
+
+
+class PgVectorStore(VectorStore):
+    """
+    Vector store backed by DocumentEmbedding rows and pgvector ANN indexes.
+    """
+    FILTER_LOOKUPS = {
+        'document_id': 'document_id',
+        'file_type': 'document__file_type',
+        'language': 'document__language',
+    }
+
+    def get_queryset(self):
+        from apps.embeddings.models import DocumentEmbedding
+
+        return DocumentEmbedding.objects.filter(
+            knowledge_base_id=self.knowledge_base.id,
+            embedding_model=self.embedding_model,
+            is_deleted=False
+        )
+
+    def upsert(self, chunks, vectors):
+        from apps.embeddings.models import DocumentEmbedding
+        from apps.embeddings.quantization import VECTOR_FIELDS
+        from apps.core.models import StatusChoices
+
+        embeddings = []
+        for chunk, vector in zip(chunks, vectors):
+            embedding = DocumentEmbedding(
+                document_id=chunk.document_id,
+                knowledge_base_id=self.knowledge_base.id,
+                chunk_index=chunk.chunk_index,
+                text_content=chunk.content,
+                embedding_model=self.embedding_model,
+                token_count=chunk.token_count,
+                status=StatusChoices.COMPLETED
+            )
+            embedding.set_vector(vector, self.embedding_model)
+            embeddings.append(embedding)
+        DocumentEmbedding.objects.bulk_create(
+            embeddings,
+            update_conflicts=True,
+            unique_fields=['knowledge_base', 'document', 'chunk_index', 'embedding_model'],
+            update_fields=['text_content', *VECTOR_FIELDS, 'token_count', 'status']
+        )
+
+    def delete_documents(self, document_ids):
+        self.get_queryset().filter(document_id__in=document_ids).delete()
+
+    def get_document_queryset(self, document_id):
+        """Every embedding row of a document, whatever its model or deletion state."""
+        from apps.embeddings.models import DocumentEmbedding
+
+        return DocumentEmbedding.objects.filter(
+            knowledge_base_id=self.knowledge_base.id, document_id=document_id
+        )
+
+    def delete_chunks(self, document_id, chunk_indexes):
+        if chunk_indexes:
+            self.get_document_queryset(document_id).filter(chunk_index__in=chunk_indexes).delete()
+
+    def drop_collection(self):
+        # Rows are purged in batches (or with their partition) by apps/knowledge_bases/purge.py
+        pass
+
+    def move_chunks(self, moved):
+        from apps.documents.rechunk import renumber
+
+        if moved:
+            renumber(
+                self.get_document_queryset(moved[0][1].document_id),
+                {old_index: chunk.chunk_index for old_index, chunk in moved}
+            )
+
+    def search(self, vector, k=10, filters=None):
+        """
+        Top-k search through the model's ANN index. Compact storage types
+        fetch extra candidates and re-rank them at higher precision.
+        """
+        from apps.core.db import get_retrieval_alias
+        from apps.embeddings import quantization
+        from apps.embeddings.indexes import apply_search_params, distance_expression
+
+        embedding_model = self.embedding_model
+        storage_type = embedding_model.storage_type
+        rescore_field = quantization.rescore_field(embedding_model)
+        alias = get_retrieval_alias()
+        queryset = self.get_queryset().using(alias)
+        for field, value in self.validate_filters(filters).items():
+            lookup = self.FILTER_LOOKUPS[field]
+            if isinstance(value, (list, tuple, set)):
+                queryset = queryset.filter(**{f"{lookup}__in": value})
+            else:
+                queryset = queryset.filter(**{lookup: value})
+
+        columns = ['document_id', 'chunk_index', rescore_field or 'distance']
+        queryset = queryset.annotate(
+            distance=distance_expression(embedding_model, vector, storage_type=storage_type)
+        ).order_by('distance').values_list(*columns)[:quantization.candidate_count(embedding_model, k)]
+
+        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+            apply_search_params(cursor, embedding_model)
+            rows = list(queryset)
+
+        if rescore_field:
+            return [VectorHit(*hit) for hit in quantization.rescore(embedding_model, vector, rows, k)]
+        if storage_type == 'binary':
+            # Hamming distance over sign bits, as a similarity in [0, 1]
+            return [
+                VectorHit(document_id, chunk_index, 1.0 - distance / embedding_model.dimension)
+                for document_id, chunk_index, distance in rows
+            ]
+        metric = embedding_model.distance_metric
+        return [
+            VectorHit(document_id, chunk_index, distance_to_score(metric, distance))
+            for document_id, chunk_index, distance in rows
+        ]
+
+
+class QdrantVectorStore(VectorStore):
+    """
+    Vector store backed by a Qdrant collection named after the knowledge base.
+    """
+    DISTANCES = {
+        'cosine': 'Cosine',
+        'l2': 'Euclid',
+        'inner_product': 'Dot',
+    }
+
+    @cached_property
+    def client(self):
+        from qdrant_client import QdrantClient
+
+        return QdrantClient(
+            url=self.config.get('url'),
+            api_key=self.config.get('api_key'),
+            timeout=self.config.get('timeout', 10)
+        )
+
+    def get_quantization_config(self):
+        """Qdrant's equivalent of the embedding model's storage_type, or None."""
+        from qdrant_client import models as qdrant
+
+        storage_type = self.embedding_model.storage_type
+        if storage_type == 'int8':
+            return qdrant.ScalarQuantization(
+                scalar=qdrant.ScalarQuantizationConfig(type=qdrant.ScalarType.INT8, always_ram=True)
+            )
+        if storage_type == 'binary':
+            return qdrant.BinaryQuantization(
+                binary=qdrant.BinaryQuantizationConfig(always_ram=True)
+            )
+        return None
+
+    def ensure_collection(self):
+        """Create the collection on first use."""
+        from qdrant_client import models as qdrant
+
+        if not self.client.collection_exists(self.collection_name):
+            storage_type = self.embedding_model.storage_type
+            self.client.create_collection(
+                collection_name=self.collection_name,
+                vectors_config=qdrant.VectorParams(
+                    size=self.dimension,
+                    distance=qdrant.Distance(
+                        self.DISTANCES[self.embedding_model.distance_metric]
+                    ),
+                    datatype=qdrant.Datatype.FLOAT16 if storage_type == 'float16' else None,
+                    # Quantised collections keep originals on disk for rescoring
+                    on_disk=storage_type in ('int8', 'binary') or None
+                ),
+                quantization_config=self.get_quantization_config()
+            )
+            for field in self.FILTER_FIELDS:
+                self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field,
+                    field_schema=qdrant.PayloadSchemaType.KEYWORD
+                )
+
+    def build_filter(self, filters):
+        from qdrant_client import models as qdrant
+
+        conditions = []
+        for field, value in self.validate_filters(filters).items():
+            if isinstance(value, (list, tuple, set)):
+                match = qdrant.MatchAny(any=[str(item) for item in value])
+            else:
+                match = qdrant.MatchValue(value=str(value))
+            conditions.append(qdrant.FieldCondition(key=field, match=match))
+        return qdrant.Filter(must=conditions) if conditions else None
+
+    def upsert(self, chunks, vectors):
+        from qdrant_client import models as qdrant
+
+        self.ensure_collection()
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[
+                qdrant.PointStruct(
+                    id=str(chunk.id),
+                    vector=[float(value) for value in vector],
+                    payload=self.get_payload(chunk)
+                )
+                for chunk, vector in zip(chunks, vectors)
+            ]
+        )
+
+    def delete_documents(self, document_ids):
+        from qdrant_client import models as qdrant
+
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=qdrant.FilterSelector(
+                filter=self.build_filter({'document_id': list(document_ids)})
+            )
+        )
+
+    def delete_chunks(self, document_id, chunk_indexes):
+        from qdrant_client import models as qdrant
+
+        if not chunk_indexes:
+            return
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=qdrant.FilterSelector(filter=qdrant.Filter(must=[
+                qdrant.FieldCondition(key='document_id', match=qdrant.MatchValue(value=str(document_id))),
+                qdrant.FieldCondition(key='chunk_index', match=qdrant.MatchAny(any=list(chunk_indexes))),
+            ]))
+        )
+
+    def drop_collection(self):
+        if self.client.collection_exists(self.collection_name):
+            self.client.delete_collection(self.collection_name)
+
+    def move_chunks(self, moved):
+        from qdrant_client import models as qdrant
+
+        # Points are keyed by chunk id, which survives re-chunking; only the payload moves
+        if moved:
+            self.client.batch_update_points(
+                collection_name=self.collection_name,
+                update_operations=[
+                    qdrant.SetPayloadOperation(set_payload=qdrant.SetPayload(
+                        payload={'chunk_index': chunk.chunk_index}, points=[str(chunk.id)]
+                    ))
+                    for _, chunk in moved
+                ]
+            )
+
+    def search(self, vector, k=10, filters=None):
+        from qdrant_client import models as qdrant
+        from apps.embeddings.quantization import DEFAULT_RESCORE_FACTOR
+
+        search_params = None
+        if self.embedding_model.storage_type in ('int8', 'binary'):
+            search_params = qdrant.SearchParams(quantization=qdrant.QuantizationSearchParams(
+                rescore=True,
+                oversampling=self.embedding_model.config.get('rescore_factor', DEFAULT_RESCORE_FACTOR)
+            ))
+        response = self.client.query_points(
+            collection_name=self.collection_name,
+            query=[float(value) for value in vector],
+            query_filter=self.build_filter(filters),
+            search_params=search_params,
+            limit=k,
+            with_payload=['document_id', 'chunk_index']
+        )
+        # Qdrant returns Euclid scores as distances
+        sign = -1.0 if self.embedding_model.distance_metric == 'l2' else 1.0
+        return [
+            VectorHit(point.payload['document_id'], point.payload['chunk_index'], sign * point.score)
+            for point in response.points
+        ]
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process brute-force vector store for tests and small deployments.
+
+    Collections live in a module-level registry so every instance created for
+    the same knowledge base sees the same data, like a real external store.
+    Writers never modify a collection's lists or matrix in place: they build
+    new ones and swap them in under the lock, so a search scores the snapshot
+    it took while writes go on.
+    """
+    _collections = {}
+    _lock = threading.Lock()
+
+    def get_collection(self):
+        import numpy as np
+
+        with self._lock:
+            if self.collection_name not in self._collections:
+                self._collections[self.collection_name] = {
+                    'keys': [],
+                    'positions': {},
+                    'payloads': [],
+                    'matrix': np.empty((0, self.dimension), dtype=np.float32),
+                }
+            return self._collections[self.collection_name]
+
+    @classmethod
+    def reset(cls):
+        """Drop every in-memory collection."""
+        with cls._lock:
+            cls._collections.clear()
+
+    def upsert(self, chunks, vectors):
+        import numpy as np
+
+        collection = self.get_collection()
+        with self._lock:
+            matrix = collection['matrix']
+            keys = list(collection['keys'])
+            payloads = list(collection['payloads'])
+            positions = dict(collection['positions'])
+            new_rows, replaced = [], {}
+            for chunk, vector in zip(chunks, vectors):
+                key = (str(chunk.document_id), chunk.chunk_index)
+                row = np.asarray(vector, dtype=np.float32)
+                position = positions.get(key)
+                if position is None:
+                    positions[key] = len(keys)
+                    keys.append(key)
+                    payloads.append(self.get_payload(chunk))
+                    new_rows.append(row)
+                    continue
+
+                payloads[position] = self.get_payload(chunk)
+                if position < len(matrix):
+                    replaced[position] = row
+                else:
+                    new_rows[position - len(matrix)] = row
+
+            if replaced:
+                matrix = matrix.copy()
+                for position, row in replaced.items():
+                    matrix[position] = row
+            if new_rows:
+                matrix = np.vstack([matrix, np.stack(new_rows)])
+            collection.update(keys=keys, payloads=payloads, positions=positions, matrix=matrix)
+
+    def delete_documents(self, document_ids):
+        document_ids = {str(document_id) for document_id in document_ids}
+        self._delete_where(lambda key: key[0] in document_ids)
+
+    def delete_chunks(self, document_id, chunk_indexes):
+        keys = {(str(document_id), chunk_index) for chunk_index in chunk_indexes}
+        if keys:
+            self._delete_where(lambda key: key in keys)
+
+    def drop_collection(self):
+        with self._lock:
+            self._collections.pop(self.collection_name, None)
+
+    def _delete_where(self, predicate):
+        import numpy as np
+
+        collection = self.get_collection()
+        with self._lock:
+            keep = [
+                position for position, key in enumerate(collection['keys'])
+                if not predicate(key)
+            ]
+            collection['keys'] = [collection['keys'][position] for position in keep]
+            collection['payloads'] = [collection['payloads'][position] for position in keep]
+            collection['matrix'] = collection['matrix'][np.asarray(keep, dtype=np.intp)]
+            collection['positions'] = {
+                key: position for position, key in enumerate(collection['keys'])
+            }
+
+    def move_chunks(self, moved):
+        collection = self.get_collection()
+        with self._lock:
+            keys = list(collection['keys'])
+            payloads = list(collection['payloads'])
+            for old_index, chunk in moved:
+                position = collection['positions'].get((str(chunk.document_id), old_index))
+                if position is None:
+                    continue
+                keys[position] = (str(chunk.document_id), chunk.chunk_index)
+                payloads[position] = {**payloads[position], 'chunk_index': chunk.chunk_index}
+            collection['keys'] = keys
+            collection['payloads'] = payloads
+            collection['positions'] = {key: position for position, key in enumerate(keys)}
+
+    def score(self, matrix, vector):
+        """Score every row against the query using the model's distance metric."""
+        from apps.embeddings.quantization import similarity
+
+        return similarity(self.embedding_model.distance_metric, matrix, vector)
+
+    def search(self, vector, k=10, filters=None):
+        import numpy as np
+
+        filters = self.validate_filters(filters)
+        collection = self.get_collection()
+        with self._lock:
+            matrix = collection['matrix']
+            keys = collection['keys']
+            payloads = collection['payloads']
+
+        if not keys:
+            return []
+
+        scores = self.score(matrix, np.asarray(vector, dtype=np.float32))
+        for field, value in filters.items():
+            allowed = {str(item) for item in value} if isinstance(value, (list, tuple, set)) else {str(value)}
+            mask = np.fromiter(
+                (str(payload[field]) in allowed for payload in payloads),
+                dtype=bool,
+                count=len(payloads)
+            )
+            scores = np.where(mask, scores, -np.inf)
+
+        k = min(k, len(keys))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            VectorHit(keys[position][0], keys[position][1], float(scores[position]))
+            for position in top if np.isfinite(scores[position])
+        ]
+
+
+class MmapVectorStore(PgVectorStore):
+    """
+    Vector store serving searches from a memory-mapped snapshot (see
+    apps/knowledge_bases/snapshots.py) with no database query: the embedding
+    model comes from the snapshot manifest and hits are resolved to unsaved
+    chunks carrying the snapshot's text.
+
+    Writes, deletions and re-numbering still go to DocumentEmbedding rows;
+    ``export()`` publishes them as a new snapshot. Hybrid search still sends
+    its lexical stage to PostgreSQL. Without a snapshot, searches fall back to pgvector.
+    """
+
+    @property
+    def path(self):
+        from apps.knowledge_bases.snapshots import snapshot_root
+
+        return snapshot_root(self.knowledge_base, self.config['path'])
+
+    @cached_property
+    def index(self):
+        from apps.knowledge_bases.snapshots import open_snapshot
+
+        return open_snapshot(self.path)
+
+    @property
+    def uses_database(self):
+        return self.index is None
+
+    @cached_property
+    def embedding_model(self):
+        from apps.embeddings.models import EmbeddingModel
+
+        if self.index is None:
+            return self.knowledge_base.get_embedding_model()
+        manifest = self.index.manifest['embedding_model']
+        return EmbeddingModel(
+            id=manifest['id'],
+            name=manifest['name'],
+            provider=manifest['provider'],
+            model_id=manifest['model_id'],
+            dimension=manifest['dimension'],
+            max_tokens=manifest['max_tokens'],
+            distance_metric=manifest['distance_metric'],
+            config=manifest['config'],
+        )
+
+    def export(self, dtype=None, batch_size=2000):
+        """Write the current vectors as a new snapshot version and serve it."""
+        from apps.knowledge_bases.snapshots import export_snapshot
+
+        directory = export_snapshot(
+            self.knowledge_base,
+            self.config['path'],
+            dtype=dtype or self.config.get('dtype', 'float32'),
+            batch_size=batch_size,
+            keep=self.config.get('keep', 2)
+        )
+        self.__dict__.pop('index', None)
+        self.__dict__.pop('embedding_model', None)
+        return directory
+
+    def drop_collection(self):
+        import shutil
+
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.__dict__.pop('index', None)
+
+    def search(self, vector, k=10, filters=None):
+        if self.index is None:
+            return super().search(vector, k=k, filters=filters)
+
+        filters = self.validate_filters(filters)
+        return [
+            VectorHit(self.index.document(row)['id'], self.index.chunk_index(row), score)
+            for row, score in self.index.search(vector, k=k, filters=filters)
+        ]
+
+    def resolve_hits(self, hits):
+        from apps.documents.models import Document, DocumentChunk
+        from apps.knowledge_bases.search import SearchResult
+
+        if self.index is None:
+            return super().resolve_hits(hits)
+
+        results = []
+        for hit in hits:
+            row = self.index.find_row(hit.document_id, hit.chunk_index)
+            if row is None:
+                continue
+            metadata = self.index.document(row)
+            document = Document(
+                id=metadata['id'],
+                knowledge_base_id=self.knowledge_base.id,
+                title=metadata['title'],
+                file_type=metadata['file_type'],
+                language=metadata['language'],
+            )
+            chunk = DocumentChunk(
+                document=document,
+                knowledge_base_id=self.knowledge_base.id,
+                chunk_index=hit.chunk_index,
+                content=self.index.text(row),
+            )
+            results.append(SearchResult(chunk=chunk, score=hit.score))
+        return results
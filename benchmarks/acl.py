@@ -0,0 +1,88 @@
+"""
+Query counts of a knowledge base list page: per-row can_access() against
+accessible_to() and the per-request PermissionCache.
+
+    DJANGO_SETTINGS_MODULE=NAIRA.settings python -m benchmarks.acl --resources 500
+
+Fixtures are created inside a transaction that is rolled back at the end.
+"""
+import argparse
+import os
+import random
+import time
+
+
+def setup_django():
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'NAIRA.settings')
+    django.setup()
+
+
+def create_fixtures(resources, shared_ratio, public_ratio, seed=0):
+    """Create a reader, an owner and resources shared with or hidden from the reader."""
+    from apps.knowledge_bases.models import KnowledgeBase
+    from apps.users.models import User
+
+    rng = random.Random(seed)
+    owner = User.objects.create(username='acl-owner', email='acl-owner@example.com')
+    reader = User.objects.create(username='acl-reader', email='acl-reader@example.com')
+
+    knowledge_bases = KnowledgeBase.objects.bulk_create([
+        KnowledgeBase(
+            name=f"kb-{index}",
+            owner=reader if index % 10 == 0 else owner,
+            is_public=rng.random() < public_ratio
+        )
+        for index in range(resources)
+    ])
+    through = KnowledgeBase.shared_with.through
+    through.objects.bulk_create([
+        through(knowledgebase_id=knowledge_base.pk, user_id=reader.pk)
+        for knowledge_base in knowledge_bases
+        if rng.random() < shared_ratio
+    ])
+    return reader
+
+
+def measure(label, func):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        count = len(func())
+        elapsed = (time.perf_counter() - started) * 1000
+    print(f"{label:<28}{count:>10}{len(queries):>10}{elapsed:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--resources', type=int, default=500)
+    parser.add_argument('--shared-ratio', type=float, default=0.3)
+    parser.add_argument('--public-ratio', type=float, default=0.1)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import transaction
+    from apps.core.permissions import PermissionCache
+    from apps.knowledge_bases.models import KnowledgeBase
+
+    with transaction.atomic():
+        reader = create_fixtures(args.resources, args.shared_ratio, args.public_ratio)
+
+        print(f"{'method':<28}{'visible':>10}{'queries':>10}{'ms':>12}")
+        measure('can_access() per row', lambda: [
+            knowledge_base for knowledge_base in KnowledgeBase.objects.all()
+            if knowledge_base.can_access(reader)
+        ])
+        measure('accessible_to()', lambda: list(KnowledgeBase.objects.accessible_to(reader)))
+        measure('PermissionCache', lambda: PermissionCache(reader).filter_accessible(
+            KnowledgeBase.objects.all()
+        ))
+
+        transaction.set_rollback(True)
+
+
+if __name__ == '__main__':
+    main()
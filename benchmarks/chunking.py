@@ -0,0 +1,46 @@
+"""
+Chunking throughput per strategy on a synthetic corpus.
+
+    python -m benchmarks.chunking --size-mb 16 --chunk-size 1000 --chunk-overlap 200
+"""
+import argparse
+import time
+from apps.documents.chunking import CHUNKERS, get_chunker
+from benchmarks.corpus import generate_corpus
+
+
+def run(text, strategy, chunk_size, chunk_overlap, repeat):
+    """Return (best seconds, chunk count) for materialising every chunk."""
+    if strategy == 'token':
+        # Token budgets are in tokens; keep chunks comparable in characters
+        chunk_size, chunk_overlap = max(2, chunk_size // 4), chunk_overlap // 4
+    chunker = get_chunker(strategy, chunk_size, chunk_overlap)
+
+    best, count = float('inf'), 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = sum(1 for _ in chunker.chunks(text))
+        best = min(best, time.perf_counter() - started)
+    return best, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=float, default=8)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--chunk-overlap', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--strategy', choices=sorted(CHUNKERS), action='append')
+    args = parser.parse_args()
+
+    text = generate_corpus(args.size_mb)
+    megabytes = len(text.encode('utf-8')) / (1024 * 1024)
+    print(f"corpus: {megabytes:.1f} MB, chunk_size={args.chunk_size}, overlap={args.chunk_overlap}")
+    print(f"{'strategy':<12}{'chunks':>10}{'seconds':>10}{'MB/s':>10}")
+    for strategy in args.strategy or list(CHUNKERS):
+        seconds, count = run(text, strategy, args.chunk_size, args.chunk_overlap, args.repeat)
+        print(f"{strategy:<12}{count:>10}{seconds:>10.3f}{megabytes / seconds:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
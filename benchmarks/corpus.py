@@ -0,0 +1,28 @@
+"""
+Synthetic text corpus shared by the benchmarks.
+"""
+import random
+
+VOCABULARY = (
+    'the of and to in is that for it as with was on be by this are from or have '
+    'an they which one you were all we can her has there been if more when will '
+    'would who so no document knowledge retrieval embedding vector chunk model '
+    'query index latency throughput postgres cluster replica partition token '
+    'NAIRA-4711 XJ-220 RFC9110 Brussels Liège Ghent Antwerp café naïve résumé'
+).split()
+
+
+def generate_corpus(size_mb=8, seed=42):
+    """Return roughly size_mb megabytes of sentences grouped into paragraphs."""
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    paragraphs, length = [], 0
+    while length < target:
+        sentences = []
+        for _ in range(rng.randint(2, 8)):
+            words = rng.choices(VOCABULARY, k=rng.randint(5, 30))
+            sentences.append(' '.join(words).capitalize() + rng.choice('..!?'))
+        paragraph = ' '.join(sentences)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return '\n\n'.join(paragraphs)[:target]
@@ -0,0 +1,83 @@
+"""
+Storage size and recall@k of each vector storage type, with and without rescoring.
+
+    python -m benchmarks.quantization --vectors 20000 --dimension 768 --k 10
+"""
+import argparse
+import time
+from types import SimpleNamespace
+import numpy as np
+from apps.embeddings import quantization
+
+
+def make_vectors(count, dimension, clusters, rng):
+    """Clustered unit vectors, closer to real embeddings than uniform noise."""
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)]
+    vectors += 0.6 * rng.standard_normal((count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def top_k(scores, k):
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--vectors', type=int, default=20000)
+    parser.add_argument('--dimension', type=int, default=768)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--clusters', type=int, default=50)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--rescore-factor', type=int, default=quantization.DEFAULT_RESCORE_FACTOR)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = make_vectors(args.vectors, args.dimension, args.clusters, rng)
+    queries = make_vectors(args.queries, args.dimension, args.clusters, rng)
+    exact = [set(top_k(vectors @ query, args.k)) for query in queries]
+
+    codes = [quantization.quantize_int8(vector) for vector in vectors]
+    stored = {
+        'float32': vectors,
+        'float16': vectors.astype(np.float16).astype(np.float32),
+        'int8': np.stack([quantization.dequantize_int8(code) for code in codes]),
+    }
+    bits = np.packbits(vectors > 0, axis=1)
+
+    print(f"{args.vectors} vectors of {args.dimension} dimensions, recall@{args.k} "
+          f"over {args.queries} queries")
+    print(f"{'storage':<28}{'bytes':>8}{'ratio':>8}{'recall':>8}{'ms/query':>10}")
+    for storage_type in quantization.STORAGE_TYPES:
+        for rescored in (False, True):
+            if storage_type == 'float32' and rescored:
+                continue
+            model = SimpleNamespace(
+                storage_type=storage_type, dimension=args.dimension, distance_metric='cosine',
+                config={'keep_full_precision': rescored and storage_type != 'int8',
+                        'rescore_factor': args.rescore_factor}
+            )
+            candidates = args.k * args.rescore_factor if rescored else args.k
+            hits, started = 0, time.perf_counter()
+            for query, expected in zip(queries, exact):
+                if storage_type in ('int8', 'binary'):
+                    query_bits = np.packbits(query > 0)
+                    distances = np.unpackbits(bits ^ query_bits, axis=1).sum(axis=1)
+                    found = top_k(-distances.astype(np.float32), candidates)
+                else:
+                    found = top_k(stored[storage_type] @ query, candidates)
+                if rescored:
+                    source = stored['int8'] if storage_type == 'int8' else vectors
+                    found = found[top_k(source[found] @ query, args.k)]
+                hits += len(expected & set(found[:args.k].tolist()))
+            elapsed = (time.perf_counter() - started) * 1000 / args.queries
+
+            size = quantization.storage_bytes(model)
+            name = storage_type + (' + rescore' if rescored else '')
+            print(f"{name:<28}{size:>8}{4 * args.dimension / size:>8.1f}"
+                  f"{hits / (args.k * args.queries):>8.3f}{elapsed:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
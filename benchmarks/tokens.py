@@ -0,0 +1,64 @@
+"""
+Token counting throughput and heuristic error on a synthetic corpus.
+
+    python -m benchmarks.tokens --size-mb 4 --tokenizer hf:bert-base-uncased
+"""
+import argparse
+import time
+from apps.documents.chunking import fixed_window_spans
+from apps.documents.metrics import compute_chunk_metrics, count_words
+from benchmarks.corpus import generate_corpus
+
+
+def timed(func, repeat):
+    """Return (best seconds, result) over repeat calls."""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=float, default=4)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tokenizer', help="tokenizer spec, e.g. hf:bert-base-uncased or tiktoken:cl100k_base")
+    args = parser.parse_args()
+
+    text = generate_corpus(args.size_mb)
+    chunks = [text[start:end] for start, end in fixed_window_spans(len(text), args.chunk_size, 0)]
+    megabytes = len(text.encode('utf-8')) / (1024 * 1024)
+    print(f"corpus: {megabytes:.1f} MB, {len(chunks)} chunks of {args.chunk_size} characters")
+
+    methods = {
+        'len//4': lambda: [max(1, len(chunk) // 4) for chunk in chunks],
+        'split()': lambda: [len(chunk.split()) for chunk in chunks],
+        'count_words': lambda: [count_words(chunk) for chunk in chunks],
+        'vectorised': lambda: compute_chunk_metrics(chunks)[1].tolist(),
+    }
+    if args.tokenizer:
+        from apps.embeddings.tokenizers import load_tokenizer
+
+        tokenizer = load_tokenizer(args.tokenizer)
+        methods[tokenizer.name] = lambda: tokenizer.count(chunks)
+
+    results = {}
+    print(f"{'method':<32}{'seconds':>10}{'MB/s':>10}{'total':>12}")
+    for name, func in methods.items():
+        seconds, counts = timed(func, args.repeat)
+        results[name] = counts
+        print(f"{name:<32}{seconds:>10.3f}{megabytes / seconds:>10.1f}{sum(counts):>12}")
+
+    if args.tokenizer:
+        reference = results[tokenizer.name]
+        estimate = results['len//4']
+        errors = [abs(e - r) / r for e, r in zip(estimate, reference) if r]
+        print(f"len//4 vs {tokenizer.name}: mean error {100 * sum(errors) / len(errors):.1f}%, "
+              f"max {100 * max(errors):.1f}%")
+
+
+if __name__ == '__main__':
+    main()
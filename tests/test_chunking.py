@@ -0,0 +1,127 @@
+"""Tests for chunking strategies and their streaming adapters."""
+import random
+from django.test import SimpleTestCase
+from apps.documents.chunking import (
+    ChunkSpan, fixed_window_spans, get_chunker, iter_stream_chunker_chunks, iter_stream_chunks
+)
+
+
+def make_text(sentences=400, seed=0):
+    rng = random.Random(seed)
+    words = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta']
+    parts = []
+    for index in range(sentences):
+        sentence = ' '.join(rng.choice(words) for _ in range(rng.randint(1, 30)))
+        parts.append(sentence.capitalize() + rng.choice(['. ', '! ', '? ', '.\n\n']))
+        if index % 50 == 49:
+            # A run-on sentence longer than any chunk
+            parts.append('x' * 700 + '. ')
+    return ''.join(parts)
+
+
+def split_segments(text, sizes):
+    segments, position = [], 0
+    for size in sizes:
+        segments.append(text[position:position + size])
+        position += size
+    segments.append(text[position:])
+    return segments
+
+
+class ChunkerTests(SimpleTestCase):
+
+    def assert_covers(self, text, spans, chunk_size):
+        """Spans are ordered, within chunk_size, and leave no gap in the text."""
+        self.assertEqual(spans[0].start, 0)
+        self.assertEqual(spans[-1].end, len(text))
+        for previous, span in zip(spans, spans[1:]):
+            self.assertGreater(span.start, previous.start)
+            self.assertLessEqual(span.start, previous.end)
+        for span in spans:
+            self.assertLessEqual(span.end - span.start, chunk_size)
+
+    def test_fixed_windows(self):
+        self.assertEqual(
+            list(fixed_window_spans(25, 10, 3)),
+            [ChunkSpan(0, 10), ChunkSpan(7, 17), ChunkSpan(14, 24), ChunkSpan(21, 25)]
+        )
+        self.assertEqual(list(fixed_window_spans(0, 10, 3)), [])
+
+    def test_overlap_must_be_smaller_than_size(self):
+        for strategy in ('fixed', 'sentence', 'recursive', 'token'):
+            with self.subTest(strategy=strategy), self.assertRaises(ValueError):
+                get_chunker(strategy, chunk_size=10, chunk_overlap=10)
+        with self.assertRaises(ValueError):
+            get_chunker('paragraph')
+
+    def test_character_strategies_cover_the_text(self):
+        text = make_text()
+        for strategy in ('fixed', 'sentence', 'recursive'):
+            with self.subTest(strategy=strategy):
+                spans = list(get_chunker(strategy, 500, 100).spans(text))
+                self.assert_covers(text, spans, 500)
+
+    def test_sentence_chunks_end_on_sentence_boundaries(self):
+        text = 'One two. Three four five! Six? Seven eight nine ten. Eleven.'
+        chunks = list(get_chunker('sentence', chunk_size=25, chunk_overlap=0).chunks(text))
+        self.assertEqual(
+            [chunk for _, _, chunk in chunks],
+            ['One two. ', 'Three four five! Six? ', 'Seven eight nine ten. ', 'Eleven.']
+        )
+        self.assertEqual(''.join(chunk for _, _, chunk in chunks), text)
+
+    def test_recursive_prefers_paragraphs(self):
+        text = 'First paragraph here.\n\nSecond paragraph, a bit longer.\n\nThird.'
+        chunks = [chunk for _, _, chunk in get_chunker('recursive', 40, 0).chunks(text)]
+        self.assertEqual(
+            chunks, ['First paragraph here.\n\n', 'Second paragraph, a bit longer.\n\nThird.']
+        )
+
+    def test_token_windows(self):
+        text = ' '.join(f"w{index}" for index in range(10))
+        chunks = [chunk for _, _, chunk in get_chunker('token', 4, 1).chunks(text)]
+        self.assertEqual(chunks, ['w0 w1 w2 w3', 'w3 w4 w5 w6', 'w6 w7 w8 w9'])
+
+
+class StreamEquivalenceTests(SimpleTestCase):
+    SEGMENT_SIZES = [
+        [1] * 50 + [7, 13, 3000, 1, 250],
+        [997] * 60,
+        [4096] * 20,
+    ]
+
+    def test_fixed_windows_match_whole_text(self):
+        text = make_text()
+        expected = [
+            (span.start, span.end, text[span.start:span.end])
+            for span in fixed_window_spans(len(text), 500, 120)
+        ]
+        for sizes in self.SEGMENT_SIZES:
+            with self.subTest(sizes=sizes[:3]):
+                self.assertEqual(
+                    list(iter_stream_chunks(split_segments(text, sizes), 500, 120)), expected
+                )
+
+    def test_piece_chunkers_match_whole_text(self):
+        text = make_text()
+        for strategy, chunk_size, overlap in (
+            ('sentence', 500, 100), ('token', 64, 8), ('fixed', 500, 50)
+        ):
+            chunker = get_chunker(strategy, chunk_size, overlap)
+            expected = list(chunker.chunks(text))
+            for sizes in self.SEGMENT_SIZES:
+                with self.subTest(strategy=strategy, sizes=sizes[:3]):
+                    self.assertEqual(
+                        list(iter_stream_chunker_chunks(split_segments(text, sizes), chunker)),
+                        expected
+                    )
+
+    def test_recursive_stream_is_contiguous(self):
+        text = make_text()
+        chunker = get_chunker('recursive', 500, 100)
+        chunks = list(iter_stream_chunker_chunks(split_segments(text, [997] * 60), chunker))
+        for start, end, chunk in chunks:
+            self.assertEqual(text[start:end], chunk)
+            self.assertLessEqual(end - start, 500)
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], len(text))
@@ -0,0 +1,105 @@
+"""Tests for micro-batching of embedding requests."""
+import asyncio
+from types import SimpleNamespace
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+from apps.embeddings.clients import (
+    EmbeddingService, FakeProvider, MicroBatcher, ProviderClient
+)
+
+EMBEDDING_MODEL = SimpleNamespace(pk=1, model_id='fake', dimension=8, provider='fake', config={})
+
+
+class RecordingProvider(FakeProvider):
+    """FakeProvider recording its calls, failing on texts listed in config."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.calls = []
+
+    async def embed(self, embedding_model, texts):
+        self.calls.append(list(texts))
+        if self.config.get('unavailable'):
+            raise ConnectionError('provider unavailable')
+        if set(texts) & set(self.config.get('rejected', ())):
+            raise ValueError('input rejected')
+        return await super().embed(embedding_model, texts)
+
+
+class NullLatency:
+
+    def record(self, *args, **kwargs):
+        pass
+
+
+class MicroBatcherTests(SimpleTestCase):
+
+    def make_batcher(self, max_batch_size=4, max_wait=0.01, **config):
+        client = ProviderClient('fake', {
+            'backend': 'tests.test_clients.RecordingProvider',
+            'max_retries': 0,
+            **config,
+        }, NullLatency())
+        return MicroBatcher(client, EMBEDDING_MODEL, max_batch_size, max_wait)
+
+    @staticmethod
+    def expected(texts):
+        return [FakeProvider.vector(EMBEDDING_MODEL, text) for text in texts]
+
+    @staticmethod
+    def submit_all(batcher, requests):
+        async def run():
+            return await asyncio.gather(*[
+                batcher.submit(texts, [1] * len(texts)) for texts in requests
+            ], return_exceptions=True)
+        return asyncio.run(run())
+
+    def test_concurrent_requests_share_a_call(self):
+        batcher = self.make_batcher(max_batch_size=10)
+        results = self.submit_all(batcher, [['a'], ['b', 'c'], ['d']])
+        self.assertEqual(batcher.client.provider.calls, [['a', 'b', 'c', 'd']])
+        self.assertEqual(
+            results, [self.expected(['a']), self.expected(['b', 'c']), self.expected(['d'])]
+        )
+
+    def test_large_requests_are_split(self):
+        batcher = self.make_batcher(max_batch_size=4)
+        texts = [f"text {index}" for index in range(10)]
+        results = self.submit_all(batcher, [texts])
+        self.assertEqual([len(call) for call in batcher.client.provider.calls], [4, 4, 2])
+        self.assertEqual(results, [self.expected(texts)])
+
+    def test_rejected_input_only_fails_its_request(self):
+        batcher = self.make_batcher(max_batch_size=10, rejected=['bad'])
+        results = self.submit_all(batcher, [['a'], ['bad', 'b'], ['c']])
+        self.assertEqual(results[0], self.expected(['a']))
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], self.expected(['c']))
+
+    def test_transient_failure_is_not_bisected(self):
+        batcher = self.make_batcher(max_batch_size=10, unavailable=True)
+        results = self.submit_all(batcher, [['a'], ['b'], ['c']])
+        self.assertTrue(all(isinstance(result, ConnectionError) for result in results))
+        self.assertEqual(len(batcher.client.provider.calls), 1)
+
+    def test_cancelled_request_does_not_affect_others(self):
+        batcher = self.make_batcher(max_batch_size=10)
+
+        async def run():
+            cancelled = asyncio.ensure_future(batcher.submit(['a'], [1]))
+            kept = asyncio.ensure_future(batcher.submit(['b'], [1]))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            return await kept
+
+        self.assertEqual(asyncio.run(run()), self.expected(['b']))
+
+
+class EmbeddingServiceTests(SimpleTestCase):
+
+    def test_unconfigured_provider(self):
+        service = EmbeddingService({'providers': {}}, latency=NullLatency())
+        self.addCleanup(service.loop.call_soon_threadsafe, service.loop.stop)
+        with self.assertRaises(ImproperlyConfigured):
+            service.get_client('ollama')
+        self.assertTrue(service.is_retryable(EMBEDDING_MODEL, ValueError()))
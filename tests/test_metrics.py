@@ -0,0 +1,60 @@
+"""Tests for batch text metrics."""
+from django.test import SimpleTestCase
+from apps.documents.metrics import (
+    compute_chunk_metrics, compute_quality_scores, count_words, estimate_tokens
+)
+
+
+class WordCountingTokenizer:
+
+    def count(self, texts):
+        return [len(text.split()) * 2 for text in texts]
+
+
+class ComputeChunkMetricsTests(SimpleTestCase):
+    TEXTS = [
+        'Hello world',
+        '  leading and trailing  ',
+        '',
+        'tabs\tand\nnewlines\r\nmixed',
+        'non\xa0breaking\u2003em\u3000ideographic spaces',
+        'single',
+        '\n\n\n',
+        'caf\xe9 na\xefve \U0001f600 emoji',
+    ]
+
+    def test_word_counts_match_str_split(self):
+        char_counts, word_counts, _ = compute_chunk_metrics(self.TEXTS)
+        self.assertEqual(char_counts.tolist(), [len(text) for text in self.TEXTS])
+        self.assertEqual(word_counts.tolist(), [len(text.split()) for text in self.TEXTS])
+        self.assertEqual(
+            [count_words(text) for text in self.TEXTS], [len(text.split()) for text in self.TEXTS]
+        )
+
+    def test_tokens_are_estimated_without_tokenizer(self):
+        _, _, token_counts = compute_chunk_metrics(self.TEXTS)
+        self.assertEqual(token_counts.tolist(), [estimate_tokens(len(text)) for text in self.TEXTS])
+
+    def test_tokens_come_from_tokenizer(self):
+        _, _, token_counts = compute_chunk_metrics(self.TEXTS, WordCountingTokenizer())
+        self.assertEqual(token_counts.tolist(), [len(text.split()) * 2 for text in self.TEXTS])
+
+    def test_empty_batch(self):
+        char_counts, word_counts, token_counts = compute_chunk_metrics([])
+        self.assertEqual(
+            (char_counts.tolist(), word_counts.tolist(), token_counts.tolist()), ([], [], [])
+        )
+
+
+class ComputeQualityScoresTests(SimpleTestCase):
+
+    def test_prose_scores_above_noise(self):
+        prose = 'The quick brown fox jumps over the lazy dog. ' * 5
+        scores = compute_quality_scores(
+            [prose, '#$%& *@!? ~~|| ^^', prose[:20], 'a' * 200, ''], target_chars=200
+        )
+        self.assertAlmostEqual(scores[0], 1.0)
+        self.assertEqual(scores[1], 0.0)
+        self.assertLess(scores[2], scores[0])
+        self.assertEqual(scores[3], 0.0)
+        self.assertEqual(scores[4], 0.0)
@@ -0,0 +1,95 @@
+"""Tests for compact vector storage and candidate rescoring."""
+import numpy as np
+from types import SimpleNamespace
+from django.test import SimpleTestCase
+from apps.embeddings.quantization import (
+    candidate_count, decode, dequantize_int8, encode, quantize_binary, quantize_int8,
+    rescore, rescore_field, similarity, storage_bytes
+)
+
+
+def make_model(storage_type='float32', distance_metric='cosine', dimension=4, **config):
+    return SimpleNamespace(
+        storage_type=storage_type, distance_metric=distance_metric, dimension=dimension,
+        config=config
+    )
+
+
+class QuantizationTests(SimpleTestCase):
+
+    def test_int8_round_trip(self):
+        vector = np.random.default_rng(0).normal(size=64).astype(np.float32)
+        data = quantize_int8(vector)
+        self.assertEqual(len(data), 4 + 64)
+        restored = dequantize_int8(data)
+        self.assertLess(np.abs(restored - vector).max(), np.abs(vector).max() / 127)
+
+    def test_int8_of_zero_vector(self):
+        self.assertEqual(dequantize_int8(quantize_int8([0.0, 0.0])).tolist(), [0.0, 0.0])
+
+    def test_binary(self):
+        self.assertEqual(quantize_binary([0.5, -1.0, 0.0, 2.0]), '1001')
+
+    def test_encode_fills_the_storage_type_columns(self):
+        vector = [0.5, -1.0, 0.25, 2.0]
+        values = encode(make_model('int8'), vector)
+        self.assertEqual(
+            [field for field, value in values.items() if value is not None],
+            ['embedding_int8', 'embedding_bits']
+        )
+        values = encode(make_model('binary', keep_full_precision=True), vector)
+        self.assertEqual(values['embedding_vector'], vector)
+        self.assertEqual(values['embedding_bits'], '1011')
+        self.assertEqual(decode(values).tolist(), vector)
+        self.assertIsNone(decode(encode(make_model('binary'), vector)))
+
+    def test_storage_bytes(self):
+        self.assertEqual(storage_bytes(make_model('float32', dimension=768)), 3072)
+        self.assertEqual(storage_bytes(make_model('float16', dimension=768)), 1536)
+        self.assertEqual(storage_bytes(make_model('binary', dimension=768)), 96)
+        self.assertEqual(
+            storage_bytes(make_model('binary', dimension=768, keep_full_precision=True)), 96 + 3072
+        )
+
+
+class RescoreTests(SimpleTestCase):
+
+    def test_rescore_field(self):
+        self.assertIsNone(rescore_field(make_model('float32')))
+        self.assertEqual(rescore_field(make_model('int8')), 'embedding_int8')
+        self.assertIsNone(rescore_field(make_model('binary')))
+        self.assertEqual(
+            rescore_field(make_model('binary', keep_full_precision=True)), 'embedding_vector'
+        )
+
+    def test_candidate_count(self):
+        self.assertEqual(candidate_count(make_model('float32'), 10), 10)
+        self.assertEqual(candidate_count(make_model('int8'), 10), 40)
+        self.assertEqual(candidate_count(make_model('int8', rescore_factor=2), 10), 20)
+
+    def test_similarity_metrics(self):
+        matrix = np.array([[3.0, 4.0], [1.0, 0.0]], dtype=np.float32)
+        vector = np.array([1.0, 0.0], dtype=np.float32)
+        np.testing.assert_allclose(similarity('cosine', matrix, vector), [0.6, 1.0])
+        np.testing.assert_allclose(similarity('inner_product', matrix, vector), [3.0, 1.0])
+        np.testing.assert_allclose(similarity('l2', matrix, vector), [-np.sqrt(20), 0.0])
+
+    def test_rescore_reorders_candidates_by_exact_similarity(self):
+        model = make_model('int8')
+        query = [1.0, 0.0, 0.0, 0.0]
+        rows = [
+            ('d1', 0, quantize_int8([0.0, 1.0, 0.0, 0.0])),
+            ('d1', 1, quantize_int8([0.9, 0.1, 0.0, 0.0])),
+            ('d2', 0, quantize_int8([0.5, 0.5, 0.0, 0.0])),
+        ]
+        results = rescore(model, query, rows, k=2)
+        self.assertEqual([(document_id, index) for document_id, index, _ in results],
+                         [('d1', 1), ('d2', 0)])
+        self.assertGreater(results[0][2], results[1][2])
+        self.assertEqual(rescore(model, query, [], k=2), [])
+
+    def test_rescore_full_precision(self):
+        model = make_model('binary', distance_metric='inner_product', keep_full_precision=True)
+        rows = [('d1', 0, [1.0, 0.0, 0.0, 0.0]), ('d1', 1, [2.0, 0.0, 0.0, 0.0])]
+        results = rescore(model, [1.0, 0.0, 0.0, 0.0], rows, k=2)
+        self.assertEqual([(index, score) for _, index, score in results], [(1, 2.0), (0, 1.0)])
@@ -0,0 +1,103 @@
+"""Tests for the document processing queue that need no database."""
+import threading
+from types import SimpleNamespace
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from apps.core.models import StatusChoices
+from apps.documents.queue import DEFAULT_QUEUE_CONFIG, Worker, backoff_delay, enqueue
+
+HANDLERS = {
+    'succeed': 'tests.test_queue.succeed',
+    'explode': 'tests.test_queue.explode',
+}
+
+
+def succeed(task):
+    return {'done': task.pk}
+
+
+def explode(task):
+    raise RuntimeError('boom')
+
+
+def make_task(task_type='succeed', attempts=1, max_attempts=3):
+    return SimpleNamespace(
+        pk=1, task_type=task_type, attempts=attempts, max_attempts=max_attempts, parameters={}
+    )
+
+
+@override_settings(TASK_QUEUE_CONFIG={'handlers': HANDLERS})
+class EnqueueTests(SimpleTestCase):
+
+    def test_rejects_task_types_without_handler(self):
+        with self.assertRaisesMessage(ValueError, 'No handler for task types: missing'):
+            enqueue(None, 'missing')
+
+    def test_rejects_following_task_types_without_handler(self):
+        with self.assertRaisesMessage(ValueError, 'No handler for task types: later, missing'):
+            enqueue(None, 'succeed', parameters={'next': ['missing', 'explode', 'later']})
+
+
+class BackoffTests(SimpleTestCase):
+
+    @mock.patch('apps.documents.queue.random.uniform', side_effect=lambda low, high: high)
+    def test_bound_doubles_up_to_the_maximum(self, uniform):
+        config = {**DEFAULT_QUEUE_CONFIG, 'backoff_base': 5.0, 'backoff_max': 60.0}
+        self.assertEqual(
+            [backoff_delay(attempts, config) for attempts in range(1, 6)],
+            [5.0, 10.0, 20.0, 40.0, 60.0]
+        )
+
+
+class WorkerTests(SimpleTestCase):
+
+    def make_worker(self, **config):
+        return Worker(worker_id='test', config={
+            **DEFAULT_QUEUE_CONFIG, 'handlers': HANDLERS, 'heartbeat_interval': 0.01, **config
+        })
+
+    def test_only_requested_task_types_are_handled(self):
+        worker = Worker(
+            task_types=['explode'], config={**DEFAULT_QUEUE_CONFIG, 'handlers': HANDLERS}
+        )
+        self.assertEqual(list(worker.handlers), ['explode'])
+
+    def test_execute_completes_with_the_handler_result(self):
+        worker = self.make_worker()
+        with mock.patch.object(worker, 'complete', return_value=True) as complete, \
+                mock.patch.object(worker, 'heartbeat', return_value=True):
+            self.assertTrue(worker.execute(make_task()))
+        complete.assert_called_once_with(mock.ANY, {'done': 1})
+
+    def test_execute_fails_when_the_handler_raises(self):
+        worker = self.make_worker()
+        with mock.patch.object(worker, 'fail') as fail, \
+                mock.patch.object(worker, 'heartbeat', return_value=True), \
+                self.assertLogs('apps.documents.queue', 'ERROR'):
+            self.assertFalse(worker.execute(make_task('explode')))
+        self.assertIsInstance(fail.call_args.args[1], RuntimeError)
+
+    def test_failed_attempt_is_rescheduled(self):
+        worker = self.make_worker()
+        with mock.patch.object(worker, '_finish', return_value=True) as finish:
+            worker.fail(make_task(attempts=1), RuntimeError('boom'))
+        fields = finish.call_args.kwargs
+        self.assertEqual(fields['status'], StatusChoices.PENDING)
+        self.assertEqual(fields['error_details'], 'RuntimeError: boom')
+        self.assertIn('run_after', fields)
+
+    def test_last_attempt_fails_the_task(self):
+        worker = self.make_worker()
+        with mock.patch.object(worker, '_finish', return_value=True) as finish:
+            worker.fail(make_task(attempts=3), RuntimeError('boom'))
+        fields = finish.call_args.kwargs
+        self.assertEqual(fields['status'], StatusChoices.FAILED)
+        self.assertNotIn('run_after', fields)
+
+    def test_heartbeat_stops_when_the_lease_is_lost(self):
+        worker = self.make_worker()
+        done = threading.Event()
+        with mock.patch.object(worker, 'heartbeat', side_effect=[True, True, False]) as heartbeat, \
+                self.assertLogs('apps.documents.queue', 'WARNING'):
+            worker._heartbeat_loop(make_task(), done)
+        self.assertEqual(heartbeat.call_count, 3)
@@ -0,0 +1,87 @@
+"""Tests for incremental re-chunking plans."""
+from types import SimpleNamespace
+from django.db import models
+from django.test import SimpleTestCase
+from apps.documents.rechunk import INDEX_OFFSET, plan_rechunk, renumber
+
+
+def make_chunk(chunk_index, content_hash):
+    return SimpleNamespace(chunk_index=chunk_index, content_hash=content_hash)
+
+
+class RecordingQuerySet:
+    """Records filter()/update() calls made by renumber()."""
+
+    def __init__(self):
+        self.calls = []
+
+    def filter(self, **lookups):
+        self.calls.append(('filter', lookups))
+        return self
+
+    def update(self, **values):
+        self.calls.append(('update', values))
+        return 0
+
+
+class PlanRechunkTests(SimpleTestCase):
+
+    def test_unchanged_chunks_are_reused_in_place(self):
+        existing = [make_chunk(0, 'a'), make_chunk(1, 'b')]
+        reused, created, deleted = plan_rechunk(existing, [(0, 0, 10, 'a'), (1, 10, 20, 'b')])
+        self.assertEqual(
+            [(chunk.chunk_index, new[0]) for chunk, new in reused], [(0, 0), (1, 1)]
+        )
+        self.assertEqual(created, [])
+        self.assertEqual(deleted, [])
+
+    def test_insertion_shifts_reused_chunks(self):
+        existing = [make_chunk(0, 'a'), make_chunk(1, 'b'), make_chunk(2, 'c')]
+        new_chunks = [(0, 0, 5, 'a'), (1, 5, 9, 'new'), (2, 9, 14, 'b'), (3, 14, 19, 'c')]
+        reused, created, deleted = plan_rechunk(existing, new_chunks)
+        self.assertEqual(
+            [(chunk.chunk_index, new[0]) for chunk, new in reused], [(0, 0), (1, 2), (2, 3)]
+        )
+        self.assertEqual(created, [(1, 5, 9, 'new')])
+        self.assertEqual(deleted, [])
+
+    def test_changed_chunks_are_deleted(self):
+        existing = [make_chunk(0, 'a'), make_chunk(1, 'b')]
+        reused, created, deleted = plan_rechunk(existing, [(0, 0, 5, 'a'), (1, 5, 9, 'b2')])
+        self.assertEqual(len(reused), 1)
+        self.assertEqual(created, [(1, 5, 9, 'b2')])
+        self.assertEqual([chunk.chunk_index for chunk in deleted], [1])
+
+    def test_duplicate_hashes_prefer_the_same_index(self):
+        existing = [make_chunk(0, 'x'), make_chunk(1, 'x'), make_chunk(2, 'x')]
+        reused, created, deleted = plan_rechunk(existing, [(1, 0, 5, 'x'), (2, 5, 9, 'x')])
+        self.assertEqual(
+            [(chunk.chunk_index, new[0]) for chunk, new in reused], [(1, 1), (2, 2)]
+        )
+        self.assertEqual([chunk.chunk_index for chunk in deleted], [0])
+
+
+class RenumberTests(SimpleTestCase):
+
+    def test_empty_mapping_issues_no_update(self):
+        queryset = RecordingQuerySet()
+        renumber(queryset, {})
+        self.assertEqual(queryset.calls, [])
+
+    def test_rows_are_parked_above_the_offset(self):
+        queryset = RecordingQuerySet()
+        renumber(queryset, {0: 1, 1: 0})
+
+        (_, park_filter), (_, park), (_, move_filter), (_, move) = queryset.calls
+        self.assertEqual(park_filter, {'chunk_index__in': [0, 1]})
+        self.assertEqual(park['chunk_index'], models.F('chunk_index') + INDEX_OFFSET)
+        self.assertEqual(move_filter, {'chunk_index__gte': INDEX_OFFSET})
+
+        case = move['chunk_index']
+        self.assertEqual(
+            [(when.condition, when.result.value) for when in case.cases],
+            [
+                (models.Q(chunk_index=INDEX_OFFSET), 1),
+                (models.Q(chunk_index=1 + INDEX_OFFSET), 0),
+            ]
+        )
@@ -0,0 +1,44 @@
+"""Tests for reciprocal rank fusion of hybrid search stages."""
+from django.test import SimpleTestCase
+from apps.knowledge_bases.search import _fuse, reciprocal_rank_fusion
+from apps.knowledge_bases.vector_stores import VectorHit
+
+
+class ReciprocalRankFusionTests(SimpleTestCase):
+    VECTOR = [VectorHit('d1', 0, 0.9), VectorHit('d1', 1, 0.8), VectorHit('d2', 0, 0.7)]
+    LEXICAL = [VectorHit('d2', 0, 3.0), VectorHit('d1', 0, 2.0), VectorHit('d3', 5, 1.0)]
+
+    def test_scores(self):
+        fused = dict(reciprocal_rank_fusion([self.VECTOR, self.LEXICAL], k=60))
+        self.assertAlmostEqual(fused[('d1', 0)], 1 / 61 + 1 / 62)
+        self.assertAlmostEqual(fused[('d2', 0)], 1 / 63 + 1 / 61)
+        self.assertAlmostEqual(fused[('d1', 1)], 1 / 62)
+        self.assertAlmostEqual(fused[('d3', 5)], 1 / 63)
+
+    def test_hits_in_both_rankings_come_first(self):
+        keys = [key for key, _ in reciprocal_rank_fusion([self.VECTOR, self.LEXICAL])]
+        self.assertEqual(keys, [('d1', 0), ('d2', 0), ('d1', 1), ('d3', 5)])
+
+    def test_weights(self):
+        keys = [
+            key for key, _ in
+            reciprocal_rank_fusion([self.VECTOR, self.LEXICAL], weights=[0.0, 1.0])
+        ]
+        self.assertEqual(keys, [('d2', 0), ('d1', 0), ('d3', 5), ('d1', 1)])
+
+    def test_document_ids_are_compared_as_strings(self):
+        import uuid
+
+        document_id = uuid.uuid4()
+        fused = reciprocal_rank_fusion([
+            [VectorHit(document_id, 0, 1.0)], [VectorHit(str(document_id), 0, 1.0)]
+        ])
+        self.assertEqual(len(fused), 1)
+
+    def test_fuse_keeps_stage_scores(self):
+        hits, stage_scores = _fuse(self.VECTOR, self.LEXICAL, k=2, rrf_k=60, weights=(1.0, 1.0))
+        self.assertEqual(
+            [(hit.document_id, hit.chunk_index) for hit in hits], [('d1', 0), ('d2', 0)]
+        )
+        self.assertEqual(stage_scores['vector'][('d1', 0)], 0.9)
+        self.assertEqual(stage_scores['lexical'][('d2', 0)], 3.0)
@@ -0,0 +1,45 @@
+"""Tests for the semantic cache that need no database."""
+from unittest import mock
+from django.test import SimpleTestCase
+from apps.embeddings.semantic_cache import (
+    DEFAULT_SEMANTIC_CACHE_CONFIG, SemanticCache, make_params_hash
+)
+from apps.knowledge_bases.vector_stores import distance_to_score
+
+
+class SemanticCacheTests(SimpleTestCase):
+
+    def test_params_hash_ignores_key_order(self):
+        self.assertEqual(
+            make_params_hash({'k': 10, 'filters': {'language': 'en'}}),
+            make_params_hash({'filters': {'language': 'en'}, 'k': 10})
+        )
+        self.assertNotEqual(make_params_hash({'k': 10}), make_params_hash({'k': 5}))
+        self.assertEqual(make_params_hash(None), make_params_hash({}))
+
+    def test_thresholds_extend_the_defaults(self):
+        cache = SemanticCache(thresholds={'cosine': 0.9})
+        self.assertEqual(cache.thresholds['cosine'], 0.9)
+        self.assertEqual(cache.thresholds['l2'], DEFAULT_SEMANTIC_CACHE_CONFIG['thresholds']['l2'])
+
+    def test_default_thresholds_agree_across_metrics(self):
+        # Unit vectors at cosine similarity s are sqrt(2 - 2s) apart
+        thresholds = DEFAULT_SEMANTIC_CACHE_CONFIG['thresholds']
+        l2_distance = (2 - 2 * thresholds['cosine']) ** 0.5
+        self.assertAlmostEqual(distance_to_score('l2', l2_distance), thresholds['l2'], places=2)
+        self.assertGreaterEqual(distance_to_score('cosine', 0.04), thresholds['cosine'])
+        self.assertLess(distance_to_score('cosine', 0.06), thresholds['cosine'])
+
+    def test_hits_are_buffered_until_the_interval(self):
+        cache = SemanticCache(flush_interval=3600)
+        with mock.patch.object(cache, 'flush_hit_counts') as flush:
+            cache.record_hit('a')
+            cache.record_hit('a')
+            cache.record_hit('b')
+        flush.assert_not_called()
+        self.assertEqual(cache._hits, {'a': 2, 'b': 1})
+
+        cache.flush_interval = 0
+        with mock.patch.object(cache, 'flush_hit_counts') as flush:
+            cache.record_hit('a')
+        flush.assert_called_once_with()
@@ -0,0 +1,118 @@
+"""Tests for the in-memory NumpyVectorStore backend."""
+import uuid
+from types import SimpleNamespace
+from django.test import SimpleTestCase
+from apps.knowledge_bases.vector_stores import NumpyVectorStore
+
+
+def make_chunk(document_id, chunk_index, file_type='pdf', language='en'):
+    return SimpleNamespace(
+        document_id=document_id,
+        chunk_index=chunk_index,
+        document=SimpleNamespace(file_type=file_type, language=language)
+    )
+
+
+class NumpyVectorStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        NumpyVectorStore.reset()
+        self.addCleanup(NumpyVectorStore.reset)
+        knowledge_base = SimpleNamespace(
+            id=uuid.uuid4(),
+            get_embedding_model=lambda: SimpleNamespace(distance_metric='cosine')
+        )
+        self.store = NumpyVectorStore(knowledge_base, {'collection_name': 'kb', 'dimension': 3})
+        self.first, self.second = uuid.uuid4(), uuid.uuid4()
+
+    def keys(self):
+        return set(self.store.get_collection()['keys'])
+
+    def test_search_orders_by_score(self):
+        self.store.upsert(
+            [make_chunk(self.first, 0), make_chunk(self.first, 1), make_chunk(self.second, 0)],
+            [[1, 0, 0], [0, 1, 0], [0.8, 0.6, 0]]
+        )
+        hits = self.store.search([1, 0, 0], k=2)
+        self.assertEqual(
+            [(hit.document_id, hit.chunk_index) for hit in hits],
+            [(str(self.first), 0), (str(self.second), 0)]
+        )
+        self.assertAlmostEqual(hits[0].score, 1.0, places=6)
+        self.assertAlmostEqual(hits[1].score, 0.8, places=6)
+
+    def test_search_filters(self):
+        self.store.upsert(
+            [make_chunk(self.first, 0), make_chunk(self.second, 0, language='fr')],
+            [[1, 0, 0], [1, 0, 0]]
+        )
+        hits = self.store.search([1, 0, 0], k=5, filters={'language': 'fr'})
+        self.assertEqual([hit.document_id for hit in hits], [str(self.second)])
+        hits = self.store.search([1, 0, 0], k=5, filters={'document_id': [self.first]})
+        self.assertEqual([hit.document_id for hit in hits], [str(self.first)])
+        with self.assertRaises(ValueError):
+            self.store.search([1, 0, 0], filters={'title': 'x'})
+
+    def test_upsert_replaces_without_mutating_snapshots(self):
+        self.store.upsert([make_chunk(self.first, 0)], [[1, 0, 0]])
+        snapshot = self.store.get_collection()['matrix']
+
+        self.store.upsert(
+            [make_chunk(self.first, 0), make_chunk(self.first, 1)],
+            [[0, 1, 0], [0, 0, 1]]
+        )
+        collection = self.store.get_collection()
+        self.assertEqual(snapshot.tolist(), [[1, 0, 0]])
+        self.assertIsNot(collection['matrix'], snapshot)
+        self.assertEqual(collection['matrix'].tolist(), [[0, 1, 0], [0, 0, 1]])
+        self.assertEqual(self.store.search([0, 1, 0], k=1)[0].chunk_index, 0)
+
+    def test_upsert_repeated_key_in_one_batch(self):
+        self.store.upsert(
+            [make_chunk(self.first, 0), make_chunk(self.first, 0)],
+            [[1, 0, 0], [0, 1, 0]]
+        )
+        self.assertEqual(self.store.get_collection()['matrix'].tolist(), [[0, 1, 0]])
+
+    def test_delete_chunks(self):
+        self.store.upsert(
+            [make_chunk(self.first, index) for index in range(3)] + [make_chunk(self.second, 1)],
+            [[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 0]]
+        )
+        snapshot = self.store.get_collection()['matrix']
+        self.store.delete_chunks(self.first, [0, 2])
+
+        collection = self.store.get_collection()
+        self.assertEqual(self.keys(), {(str(self.first), 1), (str(self.second), 1)})
+        self.assertEqual(collection['matrix'].tolist(), [[0, 1, 0], [1, 1, 0]])
+        self.assertEqual(
+            collection['positions'],
+            {key: position for position, key in enumerate(collection['keys'])}
+        )
+        self.assertEqual(len(snapshot), 4)
+
+    def test_delete_documents(self):
+        self.store.upsert(
+            [make_chunk(self.first, 0), make_chunk(self.second, 0)],
+            [[1, 0, 0], [0, 1, 0]]
+        )
+        self.store.delete_documents([self.first])
+        self.assertEqual(self.keys(), {(str(self.second), 0)})
+
+    def test_move_chunks(self):
+        self.store.upsert(
+            [make_chunk(self.first, 0), make_chunk(self.first, 1)],
+            [[1, 0, 0], [0, 1, 0]]
+        )
+        # Swap the two chunks, as renumbering after a re-chunk can
+        self.store.move_chunks([(0, make_chunk(self.first, 1)), (1, make_chunk(self.first, 0))])
+
+        hits = self.store.search([1, 0, 0], k=1)
+        self.assertEqual(hits[0].chunk_index, 1)
+        payloads = self.store.get_collection()['payloads']
+        self.assertEqual([payload['chunk_index'] for payload in payloads], [1, 0])
+
+    def test_drop_collection(self):
+        self.store.upsert([make_chunk(self.first, 0)], [[1, 0, 0]])
+        self.store.drop_collection()
+        self.assertEqual(self.store.search([1, 0, 0]), [])